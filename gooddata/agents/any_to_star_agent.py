@@ -1,10 +1,28 @@
+import asyncio
+import itertools
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from enum import Enum
-from time import time
+from typing import AsyncIterator, Iterator
 
+from gooddata_sdk import CatalogDeclarativeTable
 from gooddata_sdk.catalog.data_source.declarative_model.physical_model.pdm import CatalogScanResultPdm
 
+from gooddata.agents.libs.cache import get_cache
 from gooddata.agents.libs.gd_openai import GoodDataOpenAICommon
-from gooddata.tools import TMP_DIR, create_dir
+from gooddata.agents.libs.llm_cache import hash_payload
+from gooddata.agents.libs.star_schema import (
+    DEFAULT_CHUNK_COLUMNS,
+    DEFAULT_MAX_WORKERS,
+    DimensionMerger,
+    TableChunk,
+    cluster_tables,
+    dimension_name,
+)
+from gooddata.tools import TMP_DIR
+
+STAR_SCHEMA_CACHE_NAME = "star_schema_chunks"
+STAR_SCHEMA_CACHE_PATH = TMP_DIR / "star_schema_cache.pickle"
+STAR_SCHEMA_CACHE_MAX_ENTRIES = 1024
 
 
 class AnyToStarResultType(Enum):
@@ -13,48 +31,86 @@ class AnyToStarResultType(Enum):
 
 
 class GoodDataAnyToStarAgent(GoodDataOpenAICommon):
-    def scan_data_source(self, data_source_id: str) -> CatalogScanResultPdm:
-        # TODO - cache result
-        print(f"scan_data_source {data_source_id=} START")
-        start = time()
-        result = self.gd_sdk.sdk.catalog_data_source.scan_data_source(data_source_id)
-        duration = int((time() - start) * 1000)
-        print(f"scan_data_source {data_source_id=} duration={duration}")
-        return result
+    def __init__(
+        self, chunk_columns: int = DEFAULT_CHUNK_COLUMNS, max_workers: int = DEFAULT_MAX_WORKERS, **kwargs
+    ) -> None:
+        """The PDM is generated in chunks of at most chunk_columns source columns, max_workers at a time."""
+        super().__init__(**kwargs)
+        self.chunk_columns = chunk_columns
+        self.max_workers = max_workers
+
+    def scan_data_source(self, data_source_id: str, refresh: bool = False) -> CatalogScanResultPdm:
+        # Served from the snapshot of the last scan, unless refresh is requested
+        return self.gd_sdk.pdm_scanner().scan(data_source_id, refresh)
 
     @staticmethod
-    def generate_list_of_source_tables(pdm: CatalogScanResultPdm) -> str:
+    def generate_list_of_source_tables(tables: list[CatalogDeclarativeTable]) -> str:
         result = "The source tables are:\n"
-        # Only 5 tables for demo purposes, large prompt causes slowness
-        # TODO - train a LLM model with PDM model once and utilize it
-        i = 1
-        for table in pdm.pdm.tables:
+        for table in tables:
             column_list = ", ".join([c.name for c in table.columns])
             result += f'- "{table.path[-1]}" with columns {column_list}\n'
-            i += 1
-            if i >= 5:
-                break
-
         return result
 
-    def process(self, data_source_id: str, result_type: AnyToStarResultType) -> str:
-        pdm = self.scan_data_source(data_source_id)
+    @staticmethod
+    def generate_list_of_shared_dimensions(chunk: TableChunk) -> str:
+        if chunk.is_shared:
+            return "Generate only dimension tables for these source tables, other fact tables reference them.\n"
+        if not chunk.shared_tables:
+            return ""
+        result = "These dimension tables are generated separately, reference them, but do not generate them:\n"
+        for table in chunk.shared_tables:
+            result += f'- "{dimension_name(table)}" created from the source table "{table.path[-1]}"\n'
+        return result
 
+    def get_request(self, chunk: TableChunk, result_type: AnyToStarResultType) -> str:
         with open("prompts/any_to_star_schema.txt") as fp:
             prompt = fp.read()
-        request = (
+        return (
             prompt
             + f"""
 Question:
-{self.generate_list_of_source_tables(pdm)}
+{self.generate_list_of_source_tables(chunk.tables)}
+{self.generate_list_of_shared_dimensions(chunk)}
 Generate {result_type.value}.
 """
         )
-        create_dir(TMP_DIR)
-        with open(TMP_DIR / "any_to_star.txt", "w") as fp:
-            fp.write(request)
 
-        print("OpenAI query START")
-        result = self.ask_question(request)
-        print("OpenAI query END")
-        return result
+    def generate_chunk(self, chunk: TableChunk, result_type: AnyToStarResultType) -> str:
+        """Map step, answers are cached, unchanged parts of the PDM are not generated again."""
+        request = self.get_request(chunk, result_type)
+        cache = get_cache(
+            STAR_SCHEMA_CACHE_NAME, max_entries=STAR_SCHEMA_CACHE_MAX_ENTRIES, persist_path=STAR_SCHEMA_CACHE_PATH
+        )
+        return cache.get_or_compute(hash_payload([self.openai_model, request]), lambda: self.ask_question(request))
+
+    def iter_sections(self, pdm: CatalogScanResultPdm, result_type: AnyToStarResultType) -> Iterator[str]:
+        """
+        Generate chunks of the PDM concurrently, yield sections as they are finished.
+        Wall time is given by the largest chunk, not by the size of the PDM.
+        """
+        chunks = cluster_tables(pdm.pdm.tables, self.chunk_columns)
+        print(f"any_to_star {len(pdm.pdm.tables)} tables in {len(chunks)} chunks")
+        merger = DimensionMerger()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="any_to_star") as executor:
+            futures = {executor.submit(self.generate_chunk, chunk, result_type): chunk for chunk in chunks}
+            # Shared dimensions are merged first, so their definitions win over duplicates from other chunks
+            shared = [f for f in futures if futures[f].is_shared]
+            others = as_completed([f for f in futures if not futures[f].is_shared])
+            for future in itertools.chain(shared, others):
+                chunk = futures[future]
+                title = "Shared dimensions" if chunk.is_shared else "Source tables"
+                table_names = ", ".join(t.path[-1] for t in chunk.tables)
+                yield f"### {title}: {table_names}\n\n{merger.merge(future.result())}\n\n"
+
+    def process(self, data_source_id: str, result_type: AnyToStarResultType) -> str:
+        return "".join(self.iter_sections(self.scan_data_source(data_source_id), result_type))
+
+    async def astream(self, data_source_id: str, result_type: AnyToStarResultType) -> AsyncIterator[str]:
+        # Scan of the data source and the generation are blocking
+        pdm = await asyncio.to_thread(self.scan_data_source, data_source_id)
+        sections = self.iter_sections(pdm, result_type)
+        while (section := await asyncio.to_thread(next, sections, None)) is not None:
+            yield section
+
+    async def aprocess(self, data_source_id: str, result_type: AnyToStarResultType) -> str:
+        return "".join([token async for token in self.astream(data_source_id, result_type)])
@@ -4,32 +4,21 @@ from typing import Any, Optional
 
 import pandas as pd
 import requests
-from openapi_parser.enumeration import OperationMethod
-from openapi_parser.specification import Specification
 
+from gooddata.agents.libs.api_router import DEFAULT_ROUTING_SIZE, get_api_router
+from gooddata.agents.libs.api_spec import ApiOperation, CompiledApiSpec
+from gooddata.agents.libs.clients import get_http_session
 from gooddata.agents.libs.gd_openai import GoodDataOpenAICommon
-from gooddata.tools import TMP_DIR, create_dir
+from gooddata.agents.libs.tracing import span
 
 
 class ApiAgent(GoodDataOpenAICommon):
-    def get_open_ai_sys_msg(self, specification: Specification) -> str:
+    def get_open_ai_sys_msg(self, specification: CompiledApiSpec) -> str:
         sys_msg = f"""
 Here is the full list of {self.unique_prefix} APIs:
 """
-
-        for api_path in specification.paths:
-            if api_path.url.startswith("/api/v1/entities"):
-                for operation in api_path.operations:
-                    if (
-                        operation.method == OperationMethod.GET
-                        and operation.summary is not None
-                        and operation.summary != ""
-                    ):
-                        print(f"------ {api_path.url} -----------")
-                        sys_msg += f"""
-API path: {api_path.url}
-API description: {operation.summary}
-"""
+        # Listing of the APIs is precompiled
+        sys_msg += specification.apis_description
         sys_msg += f"""
 If you are asked for anything, what relates to the above APIs descriptions, return the corresponding API path.
 Example:
@@ -52,62 +41,16 @@ Warning: APIs for workspaces and dataSources must be filtered by "name", not by
 Question: Show me workspaces which have something to do with federal
 Answer: /api/v1/entities/workspaces?filter=name%3Dcontainsic%3Dfederal
 """
-        create_dir(TMP_DIR)
-        with open(TMP_DIR / "api.txt", "w") as fp:
-            fp.write(sys_msg)
         return sys_msg
 
     @staticmethod
-    def get_valid_apis(specification: Specification) -> dict:
-        valid_apis = {}
-        function_id = 0
-        for api_path in specification.paths:
-            if api_path.url.startswith("/api/v1/entities"):
-                valid_apis[api_path.url] = {}
-                for operation in api_path.operations:
-                    if (
-                        operation.method == OperationMethod.GET
-                        and operation.summary is not None
-                        and operation.summary != ""
-                    ):
-                        valid_apis[api_path.url][operation.method] = {
-                            "operation": operation,
-                            "openapi_function": f"function_{function_id}",
-                        }
-                        function_id += 1
-        return valid_apis
+    def get_valid_apis(specification: CompiledApiSpec) -> dict[str, dict[str, ApiOperation]]:
+        return specification.valid_apis
 
     # TODO - OpenAI limit is 64 functions, we have more APIs ;-)
-    def generate_functions(self, specification: Specification) -> list[dict]:
-        functions = []
-        for api_path, adata in self.get_valid_apis(specification).items():
-            for operation_method, odata in adata.items():
-                properties = {}
-                required = []
-                for param in odata["operation"].parameters:
-                    properties[param.name] = {
-                        # TODO - add support for other types
-                        "type": "string",
-                        "description": param.description,
-                    }
-                    if param.required:
-                        required.append(param.name)
-                functions.append(
-                    {
-                        "name": odata["openapi_function"],
-                        "description": odata["operation"].summary,
-                        "parameters": {
-                            "type": "object",
-                            "properties": properties,
-                            "required": required,
-                        },
-                    }
-                )
-        # For debug
-        create_dir(TMP_DIR)
-        with open(TMP_DIR / "api.json", "w") as fp:
-            json.dump(functions, fp)
-        return functions
+    @staticmethod
+    def generate_functions(specification: CompiledApiSpec) -> list[dict]:
+        return specification.functions
 
     @staticmethod
     def get_open_ai_raw_prompt(question: str) -> str:
@@ -134,7 +77,8 @@ Answer: /api/v1/entities/workspaces?filter=name%3Dcontainsic%3Dfederal
 
     def get(self, path: str, ok_code: int = 200) -> Optional[requests.Response]:
         kwargs = self._prepare_request(path)
-        response = requests.get(**kwargs)
+        # Pooled keep-alive connections, no TLS handshake per call
+        response = get_http_session().get(**kwargs)
         return self._resolve_return_code(response, ok_code, kwargs["url"], "RestApi.get")
 
     @staticmethod
@@ -147,12 +91,52 @@ Answer: /api/v1/entities/workspaces?filter=name%3Dcontainsic%3Dfederal
             result.append({"id": row["id"], **attributes})
         return result
 
-    def process(self, prompt: str, specification: Specification) -> pd.DataFrame:
+    def get_routed_sys_msg(self) -> str:
+        return f"""
+Call the {self.unique_prefix} API function which answers the question.
+Functions list entities, pass "workspaceId" as "{self.workspace_id}" unless the question names another workspace.
+
+When the question contains some additional contex info, pass the "filter" argument in this way:
+Question: Show me metrics related to flights
+filter: title=containsic=flight
+
+Warning: APIs for workspaces and dataSources must be filtered by "name", not by "title". Example:
+Question: Show me workspaces which have something to do with federal
+filter: name=containsic=federal
+"""
+
+    def route(self, prompt: str, specification: CompiledApiSpec, k: int = DEFAULT_ROUTING_SIZE) -> list[ApiOperation]:
+        with span("prompt.build", agent="api", workspace=self.workspace_id, k=k):
+            embeddings = self.get_llm_embeddings()
+            return get_api_router(embeddings, specification, embeddings.model).route(prompt, k)
+
+    def get_routed_api_path(self, prompt: str, specification: CompiledApiSpec) -> str:
+        """Only the top-k operations routed by embeddings are sent to the model, as functions."""
+        operations = {o.function_name: o for o in self.route(prompt, specification)}
+        completion = self.ask_chat_completion(
+            system_prompt=self.get_routed_sys_msg(),
+            user_prompt=self.get_open_ai_raw_prompt(prompt),
+            functions=[o.to_function() for o in operations.values()],
+        )
+        function_call = completion.choices[0].message.function_call
+        if function_call is None or function_call.name not in operations:
+            # The model answered with a path, as in the unrouted prompt
+            return completion.choices[0].message.content
+        arguments = json.loads(function_call.arguments or "{}")
+        return operations[function_call.name].to_url(arguments, defaults={"workspaceId": self.workspace_id})
+
+    def get_api_path(self, prompt: str, specification: CompiledApiSpec) -> str:
         completion = self.ask_chat_completion(
             system_prompt=self.get_open_ai_sys_msg(specification),
             user_prompt=self.get_open_ai_raw_prompt(prompt),
         )
-        api_path = completion.choices[0].message.content
+        return completion.choices[0].message.content
+
+    def process(self, prompt: str, specification: CompiledApiSpec, routed: bool = True) -> pd.DataFrame:
+        if routed:
+            api_path = self.get_routed_api_path(prompt, specification)
+        else:
+            api_path = self.get_api_path(prompt, specification)
         if str(api_path).startswith("Answer: "):
             api_path.replace("Answer: ", "")
         api_path = api_path.replace("{workspaceId}", self.workspace_id).replace("{dataSourceId}", "demo")
@@ -0,0 +1,119 @@
+import argparse
+import json
+import threading
+from pathlib import Path
+from typing import Optional
+
+import attr
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from gooddata.agents.libs.api_spec import ApiOperation, CompiledApiSpec
+
+# Candidate operations offered to the model as functions, far below the OpenAI limit of 64
+DEFAULT_ROUTING_SIZE = 5
+API_QUESTIONS_PATH = Path("example_questions/api.txt")
+
+
+def operation_text(operation: ApiOperation) -> str:
+    # Paths carry the entity names ("metrics", "userGroups"), summaries the intent
+    return f"{operation.summary}\n{operation.path}"
+
+
+class ApiRouter:
+    """
+    Picks operations relevant to a question by cosine similarity of embeddings.
+    Operations are embedded once per spec, CachedEmbeddings persists them across processes.
+    """
+
+    def __init__(self, embeddings: Embeddings, spec: CompiledApiSpec) -> None:
+        self.embeddings = embeddings
+        self.spec = spec
+        self.operations = spec.operations
+        vectors = np.asarray(embeddings.embed_documents([operation_text(o) for o in self.operations]), dtype=np.float32)
+        self._vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def route(self, question: str, k: int = DEFAULT_ROUTING_SIZE) -> list[ApiOperation]:
+        query = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        similarities = self._vectors @ (query / np.linalg.norm(query))
+        return [self.operations[i] for i in np.argsort(-similarities)[:k]]
+
+
+_routers: dict[tuple[str, str], ApiRouter] = {}
+_routers_lock = threading.Lock()
+
+
+def get_api_router(embeddings: Embeddings, spec: CompiledApiSpec, model: str) -> ApiRouter:
+    """Router shared in the process per spec and embedding model."""
+    key = (spec.source_hash, model)
+    with _routers_lock:
+        if key not in _routers:
+            _routers[key] = ApiRouter(embeddings, spec)
+        return _routers[key]
+
+
+@attr.s(auto_attribs=True, kw_only=True)
+class RoutingBenchmark:
+    k: int
+    total: int = 0
+    hits: int = 0
+    reciprocal_rank_sum: float = 0.0
+    misses: list[dict] = attr.Factory(list)
+
+    @property
+    def recall(self) -> float:
+        return self.hits / self.total if self.total else 0.0
+
+    @property
+    def mrr(self) -> float:
+        return self.reciprocal_rank_sum / self.total if self.total else 0.0
+
+    def as_dict(self) -> dict:
+        return {"k": self.k, "total": self.total, "recall": self.recall, "mrr": self.mrr, "misses": self.misses}
+
+
+def load_routing_questions(path: Path = API_QUESTIONS_PATH) -> list[tuple[str, str]]:
+    """Pairs (question, expected API path template) from lines "question | path"."""
+    questions = []
+    with open(path, "r") as fp:
+        for line in fp:
+            if "|" in line:
+                question, expected_path = line.rsplit("|", 1)
+                questions.append((question.strip(), expected_path.strip()))
+    return questions
+
+
+def benchmark_routing(
+    router: ApiRouter, questions: list[tuple[str, str]], k: int = DEFAULT_ROUTING_SIZE
+) -> RoutingBenchmark:
+    """Recall@k and MRR of the expected operation among the routed candidates."""
+    result = RoutingBenchmark(k=k)
+    for question, expected_path in questions:
+        paths = [o.path for o in router.route(question, k)]
+        result.total += 1
+        if expected_path in paths:
+            result.hits += 1
+            result.reciprocal_rank_sum += 1 / (paths.index(expected_path) + 1)
+        else:
+            result.misses.append({"question": question, "expected": expected_path, "routed": paths})
+    return result
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    # Needs OPENAI_API_KEY, embeddings of operations and questions are cached
+    from gooddata.agents.libs.api_spec import load_api_spec
+    from gooddata.agents.libs.gd_openai import GoodDataOpenAICommon
+
+    parser = argparse.ArgumentParser(description="Benchmark of API endpoint routing")
+    parser.add_argument("-k", type=int, default=DEFAULT_ROUTING_SIZE, help="Number of routed operations")
+    parser.add_argument("-q", "--questions", type=Path, default=API_QUESTIONS_PATH, help="Questions file")
+    args = parser.parse_args(argv)
+
+    embeddings = GoodDataOpenAICommon().get_llm_embeddings()
+    router = ApiRouter(embeddings, load_api_spec())
+    result = benchmark_routing(router, load_routing_questions(args.questions), args.k)
+    print(json.dumps(result.as_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
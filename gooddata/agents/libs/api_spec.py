@@ -0,0 +1,180 @@
+import hashlib
+import os
+import pickle
+import threading
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlencode
+
+import attr
+
+from gooddata.tools import TMP_DIR, create_dir
+
+API_SPEC_PATH = Path("gooddata/open-api-spec.json")
+API_SPEC_ARTIFACT_PATH = TMP_DIR / "open-api-spec.pickle"
+# Bump when the structure of CompiledApiSpec changes, old artifacts are recompiled
+API_SPEC_ARTIFACT_VERSION = 2
+ENTITIES_PATH_PREFIX = "/api/v1/entities"
+
+
+@attr.s(auto_attribs=True, kw_only=True)
+class ApiOperation:
+    path: str
+    method: str
+    summary: str
+    function_name: str
+    # Parameters as (name, description, required)
+    parameters: list[tuple[str, Optional[str], bool]]
+    # Names of parameters passed in the query string, path parameters are in the path template
+    query_parameters: list[str] = attr.Factory(list)
+
+    def to_url(self, arguments: dict[str, str], defaults: dict[str, str]) -> str:
+        """Concrete URL, arguments of a function call fill the path template and the query string."""
+        arguments = {**defaults, **arguments}
+        url = self.path
+        for name, value in arguments.items():
+            url = url.replace(f"{{{name}}}", str(value))
+        query = {k: v for k, v in arguments.items() if k in self.query_parameters and v not in (None, "")}
+        return f"{url}?{urlencode(query)}" if query else url
+
+    def to_function(self) -> dict:
+        properties = {}
+        required = []
+        for name, description, is_required in self.parameters:
+            properties[name] = {
+                # TODO - add support for other types
+                "type": "string",
+                "description": description,
+            }
+            if is_required:
+                required.append(name)
+        return {
+            "name": self.function_name,
+            "description": self.summary,
+            "parameters": {
+                "type": "object",
+                "properties": properties,
+                "required": required,
+            },
+        }
+
+
+@attr.s(auto_attribs=True, kw_only=True)
+class CompiledApiSpec:
+    """GET entity endpoints of the OpenAPI spec, everything ApiAgent needs precomputed."""
+
+    version: int
+    source_hash: str
+    entity_paths: list[str]
+    operations: list[ApiOperation]
+    functions: list[dict]
+    apis_description: str
+
+    @property
+    def valid_apis(self) -> dict[str, dict[str, ApiOperation]]:
+        valid_apis: dict[str, dict[str, ApiOperation]] = {path: {} for path in self.entity_paths}
+        for operation in self.operations:
+            valid_apis[operation.path][operation.method] = operation
+        return valid_apis
+
+    @property
+    def operations_by_function(self) -> dict[str, ApiOperation]:
+        return {o.function_name: o for o in self.operations}
+
+
+def hash_file(path: Path) -> str:
+    with open(path, "rb") as fp:
+        return hashlib.sha256(fp.read()).hexdigest()
+
+
+def compile_api_spec(spec_path: Path = API_SPEC_PATH) -> CompiledApiSpec:
+    """Parse the whole spec, slow (hundreds of ms), use load_api_spec to get the compiled artifact."""
+    # Only the build step needs the parser
+    from openapi_parser import parse
+    from openapi_parser.enumeration import OperationMethod, ParameterLocation
+
+    specification = parse(str(spec_path), strict_enum=False)
+    entity_paths = []
+    operations = []
+    for api_path in specification.paths:
+        if not api_path.url.startswith(ENTITIES_PATH_PREFIX):
+            continue
+        entity_paths.append(api_path.url)
+        for operation in api_path.operations:
+            if operation.method == OperationMethod.GET and operation.summary:
+                operations.append(
+                    ApiOperation(
+                        path=api_path.url,
+                        method=operation.method.value,
+                        summary=operation.summary,
+                        function_name=f"function_{len(operations)}",
+                        parameters=[(p.name, p.description, bool(p.required)) for p in operation.parameters],
+                        query_parameters=[
+                            p.name for p in operation.parameters if p.location == ParameterLocation.QUERY
+                        ],
+                    )
+                )
+    apis_description = "".join(
+        f"""
+API path: {o.path}
+API description: {o.summary}
+"""
+        for o in operations
+    )
+    return CompiledApiSpec(
+        version=API_SPEC_ARTIFACT_VERSION,
+        source_hash=hash_file(spec_path),
+        entity_paths=entity_paths,
+        operations=operations,
+        functions=[o.to_function() for o in operations],
+        apis_description=apis_description,
+    )
+
+
+def save_api_spec(compiled: CompiledApiSpec, artifact_path: Path = API_SPEC_ARTIFACT_PATH) -> None:
+    create_dir(artifact_path.parent)
+    tmp_path = f"{artifact_path}.tmp"
+    with open(tmp_path, "wb") as fp:
+        pickle.dump(compiled, fp, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, artifact_path)
+
+
+def read_api_spec(artifact_path: Path, source_hash: str) -> Optional[CompiledApiSpec]:
+    """The artifact, if it was compiled from the same spec by the same version of the compiler."""
+    if not os.path.isfile(artifact_path):
+        return None
+    try:
+        with open(artifact_path, "rb") as fp:
+            compiled = pickle.load(fp)
+    except (OSError, pickle.UnpicklingError, AttributeError, EOFError) as e:
+        print(f"Loading compiled API spec {artifact_path} failed: {e}")
+        return None
+    if getattr(compiled, "version", None) != API_SPEC_ARTIFACT_VERSION or compiled.source_hash != source_hash:
+        return None
+    return compiled
+
+
+_specs: dict[tuple[str, str], CompiledApiSpec] = {}
+_specs_lock = threading.Lock()
+
+
+def load_api_spec(spec_path: Path = API_SPEC_PATH, artifact_path: Path = API_SPEC_ARTIFACT_PATH) -> CompiledApiSpec:
+    """Compiled spec, shared in the process. Compiled and saved only if the artifact is missing or stale."""
+    with _specs_lock:
+        source_hash = hash_file(spec_path)
+        key = (str(spec_path), str(artifact_path))
+        compiled = _specs.get(key)
+        if compiled is None or compiled.source_hash != source_hash:
+            compiled = read_api_spec(artifact_path, source_hash)
+            if compiled is None:
+                print(f"Compiling API spec {spec_path} to {artifact_path}")
+                compiled = compile_api_spec(spec_path)
+                save_api_spec(compiled, artifact_path)
+            _specs[key] = compiled
+        return compiled
+
+
+if __name__ == "__main__":
+    # Build step: python -m gooddata.agents.libs.api_spec
+    save_api_spec(compile_api_spec())
+    print(f"Compiled {API_SPEC_PATH} to {API_SPEC_ARTIFACT_PATH}")
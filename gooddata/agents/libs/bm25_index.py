@@ -0,0 +1,171 @@
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Optional
+
+import attr
+from langchain_core.documents import Document
+
+from gooddata.agents.libs.index_manifest import document_hash, document_key
+from gooddata.agents.libs.vector_stores.search_filter import SearchFilter
+
+BM25_URL_TEMPLATE = "tmp/{org_id}.{db_type}.ws_{workspace_id}.bm25.json"
+# Standard Okapi BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[_.][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Lower-cased words. Identifiers like "revenue_by_month" or "date.month" are kept as a whole
+    and also split into parts, so both the exact ID and its words match.
+    """
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        parts = re.split(r"[_.]", token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+def normalize_phrase(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+@attr.s(auto_attribs=True, kw_only=True)
+class BM25Index:
+    """
+    Inverted BM25 index over page content and metadata id/title of catalog documents of a workspace.
+    Documents are stored with the index, so lexical hits are returned without touching the vector store.
+    """
+
+    path: Path
+    documents: dict[str, Document] = attr.Factory(dict)
+    hashes: dict[str, str] = attr.Factory(dict)
+    postings: dict[str, dict[str, int]] = attr.Factory(lambda: defaultdict(dict))
+    lengths: dict[str, int] = attr.Factory(dict)
+    # Normalized id/title -> document keys, for exact lookups
+    phrases: dict[str, set[str]] = attr.Factory(lambda: defaultdict(set))
+
+    @classmethod
+    def load(cls, path: Path) -> "BM25Index":
+        index = cls(path=path)
+        if os.path.isfile(path):
+            with open(path, "r") as fp:
+                content = json.load(fp)
+            for key, item in content["documents"].items():
+                index._add(key, Document(page_content=item["page_content"], metadata=item["metadata"]), item["hash"])
+        return index
+
+    @property
+    def avg_length(self) -> float:
+        return sum(self.lengths.values()) / len(self.lengths) if self.lengths else 0.0
+
+    @staticmethod
+    def _document_text(document: Document) -> str:
+        metadata = document.metadata
+        return f"{metadata.get('id', '')} {metadata.get('title', '')} {document.page_content}"
+
+    @staticmethod
+    def _document_phrases(document: Document) -> set[str]:
+        return {normalize_phrase(str(document.metadata[k])) for k in ("id", "title") if document.metadata.get(k)}
+
+    def _add(self, key: str, document: Document, document_hash_value: str) -> None:
+        tokens = tokenize(self._document_text(document))
+        for term, tf in Counter(tokens).items():
+            self.postings[term][key] = tf
+        for phrase in self._document_phrases(document):
+            self.phrases[phrase].add(key)
+        self.lengths[key] = len(tokens)
+        self.documents[key] = document
+        self.hashes[key] = document_hash_value
+
+    def _remove(self, key: str) -> None:
+        document = self.documents.pop(key)
+        self.hashes.pop(key)
+        self.lengths.pop(key)
+        for term in set(tokenize(self._document_text(document))):
+            self.postings[term].pop(key, None)
+            if not self.postings[term]:
+                del self.postings[term]
+        for phrase in self._document_phrases(document):
+            self.phrases[phrase].discard(key)
+            if not self.phrases[phrase]:
+                del self.phrases[phrase]
+
+    def sync(self, documents: list[Document]) -> bool:
+        """Incrementally update the index to contain exactly documents. Returns True if anything changed."""
+        current_keys = set()
+        changed = False
+        for document in documents:
+            key = document_key(document)
+            current_keys.add(key)
+            document_hash_value = document_hash(document)
+            if self.hashes.get(key) == document_hash_value:
+                continue
+            if key in self.documents:
+                self._remove(key)
+            self._add(key, document, document_hash_value)
+            changed = True
+        for key in [k for k in self.documents if k not in current_keys]:
+            self._remove(key)
+            changed = True
+        return changed
+
+    def exact_match(self, query: str, search_filter: Optional[SearchFilter] = None) -> list[Document]:
+        """Documents whose ID or title equals the whole query (case and whitespace insensitive)."""
+        keys = sorted(self.phrases.get(normalize_phrase(query.strip("\"'` ")), ()))
+        return [
+            self.documents[key]
+            for key in keys
+            if search_filter is None or search_filter.matches(self.documents[key].metadata)
+        ]
+
+    def search(self, query: str, k: int, search_filter: Optional[SearchFilter] = None) -> list[tuple[Document, float]]:
+        scores: dict[str, float] = defaultdict(float)
+        count = len(self.documents)
+        avg_length = self.avg_length or 1.0
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for key, tf in postings.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[key] / avg_length)
+                scores[key] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        result = []
+        for key, score in ranked:
+            document = self.documents[key]
+            if search_filter is not None and not search_filter.matches(document.metadata):
+                continue
+            result.append((document, score))
+            if len(result) == k:
+                break
+        return result
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        documents = {
+            key: {"page_content": d.page_content, "metadata": d.metadata, "hash": self.hashes[key]}
+            for key, d in self.documents.items()
+        }
+        with open(tmp_path, "w") as fp:
+            json.dump({"documents": documents}, fp)
+        os.replace(tmp_path, self.path)
+
+    def delete(self) -> None:
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+        self.documents.clear()
+        self.hashes.clear()
+        self.postings.clear()
+        self.lengths.clear()
+        self.phrases.clear()
@@ -0,0 +1,170 @@
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from time import time
+from typing import Any, Callable, Hashable, Optional
+
+import attr
+
+DEFAULT_MAX_ENTRIES = 1024
+
+
+@attr.s(auto_attribs=True, kw_only=True)
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class _Flight:
+    """Computation of a missing value, concurrent callers wait for it instead of computing it again."""
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class TTLCache:
+    """
+    Thread-safe in-process cache with LRU eviction, optional TTL and optional persistence.
+    get_or_compute() deduplicates concurrent misses of the same key (single-flight).
+    With persist_path, entries are pickled to the file on every change and loaded on start,
+    so they survive process restarts. Keys and values must be picklable in that case.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl: Optional[float] = None,
+        persist_path: Optional[Path] = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.persist_path = persist_path
+        self.stats = CacheStats()
+        # key -> (expires_at, value), ordered from the least recently used
+        self._entries: OrderedDict[Hashable, tuple[Optional[float], Any]] = OrderedDict()
+        self._flights: dict[Hashable, _Flight] = {}
+        self._lock = threading.RLock()
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._get_entry(key) is not None
+
+    def _get_entry(self, key: Hashable) -> Optional[tuple[Optional[float], Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, _ = entry
+        if expires_at is not None and expires_at <= time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._get_entry(key)
+            if entry is None:
+                self.stats.misses += 1
+                return default
+            self.stats.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = ttl if ttl is not None else self.ttl
+        with self._lock:
+            self._entries[key] = (time() + ttl if ttl is not None else None, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+            self._save()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        with self._lock:
+            entry = self._get_entry(key)
+            if entry is not None:
+                self.stats.hits += 1
+                return entry[1]
+            self.stats.misses += 1
+            flight = self._flights.get(key)
+            owner = flight is None
+            if owner:
+                flight = self._flights[key] = _Flight()
+        if not owner:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = compute()
+            self.set(key, flight.value, ttl)
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.event.set()
+
+    def invalidate(self, predicate: Optional[Callable[[Hashable], bool]] = None) -> int:
+        """Drop entries whose key matches predicate, or all entries. Returns number of dropped entries."""
+        with self._lock:
+            keys = [k for k in self._entries if predicate is None or predicate(k)]
+            for key in keys:
+                del self._entries[key]
+            self._save()
+            return len(keys)
+
+    def _load(self) -> None:
+        if self.persist_path is None or not os.path.isfile(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, "rb") as fp:
+                self._entries = pickle.load(fp)
+        except Exception as e:
+            # Corrupted or incompatible file, it is only a cache
+            print(f"Loading cache from {self.persist_path} failed: {e}")
+
+    def _save(self) -> None:
+        if self.persist_path is None:
+            return
+        os.makedirs(os.path.dirname(self.persist_path) or ".", exist_ok=True)
+        tmp_path = f"{self.persist_path}.tmp"
+        with open(tmp_path, "wb") as fp:
+            pickle.dump(self._entries, fp)
+        os.replace(tmp_path, self.persist_path)
+
+
+_caches: dict[str, TTLCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(name: str, **kwargs) -> TTLCache:
+    """
+    Process-wide named cache. Streamlit re-creates apps and agents on every interaction,
+    caches must outlive them. kwargs are passed to TTLCache when the cache is created,
+    requesting an existing cache with a different configuration raises ValueError.
+    """
+    with _caches_lock:
+        if name not in _caches:
+            _caches[name] = TTLCache(**kwargs)
+        cache = _caches[name]
+        mismatch = {k: v for k, v in kwargs.items() if getattr(cache, k) != v}
+        if mismatch:
+            raise ValueError(f"Cache {name} already exists with a different configuration: {mismatch}")
+        return cache
@@ -0,0 +1,206 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from pathlib import Path
+from typing import Iterator, Optional
+
+import attr
+from gooddata_sdk import CatalogDeclarativeAnalytics, CatalogDeclarativeModel
+from langchain_core.documents import Document
+
+from gooddata.agents.libs.rag_langchain import PRODUCT_NAME
+from gooddata.agents.libs.tracing import span
+from gooddata.agents.libs.utils import DEBUG_PATH
+from gooddata.agents.sdk_wrapper import GoodDataSdkWrapper
+
+# Values of "object_type" in document metadata
+OBJECT_TYPES = ["dataset", "fact", "attribute", "metric", "visualization", "dashboard", "date dataset"]
+
+
+class DebugMode(Enum):
+    OFF = "off"
+    # All documents in a single file, one JSON per line
+    JSONL = "jsonl"
+
+
+@attr.s(auto_attribs=True, kw_only=True)
+class GoodDataCatalog:
+    documents: list[Document]
+    ldm: CatalogDeclarativeModel
+    adm: CatalogDeclarativeAnalytics
+
+
+def create_document(
+    workspace_id: str,
+    object_type: str,
+    main_object: any,
+    dependent_object: any = None,
+) -> Document:
+    content = f"This section describes {PRODUCT_NAME} {object_type}.\n"
+    content += f"""This {object_type} has ID "{main_object.id}" and title "{main_object.title}".\n"""
+    if dependent_object is not None:
+        content += (
+            f"""This {object_type} is a part of the standard dataset """
+            + f"""with ID "{dependent_object.id}" and title "{dependent_object.title}".\n"""
+        )
+    return Document(
+        page_content=content,
+        metadata={
+            "workspace_id": workspace_id,
+            "object_type": object_type,
+            "id": main_object.id,
+            "title": main_object.title,
+        },
+    )
+
+
+def generate_description_of_visualization(metrics: list, facts: list, attributes: list) -> str:
+    metrics_text = "\n".join([f"- Metric with ID {m['id']}" for m in metrics])
+    fact_text = "\n".join([f"- Fact with ID {f['id']} and aggregation function {f['agg_function']}" for f in facts])
+    attributes_text = "\n".join([f"- Attribute with ID {a}" for a in attributes])
+
+    result = ""
+    if metrics_text is not None and metrics_text != "":
+        result += f"""
+This visualization contains the following metrics:
+{metrics_text}\n"""
+    if fact_text is not None and fact_text != "":
+        result += f"""
+This visualization contains the following facts:
+{fact_text}\n"""
+    if attributes_text is not None and attributes_text != "":
+        result += f"""
+This visualization contains the following attributes:
+{attributes_text}\n"""
+
+    return result
+
+
+def iter_ldm_documents(workspace_id: str, ldm: CatalogDeclarativeModel) -> Iterator[Document]:
+    for dataset in ldm.ldm.datasets:
+        yield create_document(workspace_id, "dataset", dataset)
+        for fact in dataset.facts:
+            yield create_document(workspace_id, "fact", fact, dataset)
+        for attribute in dataset.attributes:
+            document = create_document(workspace_id, "attribute", attribute, dataset)
+            if len(attribute.labels) > 0:
+                label_list = "\n".join(
+                    [f"""- Label with ID {label.id} has title {label.title}""" for label in attribute.labels]
+                )
+                document.page_content += f"""
+                The attribute also contains the following labels:
+                {label_list}
+                """
+            yield document
+
+    # Date datasets are special. We want to create attributes from them,
+    # because that is exactly what is used in report executions.
+    for date_dataset in ldm.ldm.date_instances:
+        yield create_document(workspace_id, "date dataset", date_dataset)
+        for granularity in date_dataset.granularities:
+            date_attribute_id = f"{date_dataset.id}.{granularity}"
+            date_attribute_title = f"{date_dataset.title} {granularity}"
+            yield Document(
+                page_content=f"""
+This {{document}} describes GoodData Phoenix date attribute.
+This date attribute has ID "{date_attribute_id}" and title "{date_attribute_title}".
+This date attribute is a part of the date dataset with ID "{date_dataset.id}" and title "{date_dataset.title}".
+""",
+                metadata={
+                    "workspace_id": workspace_id,
+                    "object_type": "attribute",
+                    "id": date_attribute_id,
+                    "title": date_attribute_title,
+                },
+            )
+
+
+def iter_adm_documents(workspace_id: str, adm: CatalogDeclarativeAnalytics) -> Iterator[Document]:
+    for metric in adm.analytics.metrics:
+        yield create_document(workspace_id, "metric", metric)
+
+    for visualization in adm.analytics.visualization_objects:
+        document = create_document(workspace_id, "visualization", visualization)
+        metrics = []
+        attributes = []
+        facts = []
+        for bucket in visualization.content["buckets"]:
+            for item in bucket["items"]:
+                if "measure" in item:
+                    measure_def = item["measure"]["definition"].get("measureDefinition")
+                    if not measure_def:
+                        print(f"WARNING: Unknown measure def in visualization: id={visualization.id}")
+                    else:
+                        if measure_def["item"]["identifier"]["type"] == "fact":
+                            facts.append(
+                                {
+                                    "id": measure_def["item"]["identifier"]["id"],
+                                    "agg_function": measure_def["aggregation"],
+                                }
+                            )
+                        else:
+                            metrics.append({"id": measure_def["item"]["identifier"]["id"]})
+                elif "attribute" in item:
+                    attributes.append(item["attribute"]["displayForm"]["identifier"]["id"])
+        document.page_content += generate_description_of_visualization(metrics, facts, attributes)
+        yield document
+
+    for dashboard in adm.analytics.analytical_dashboards:
+        # TODO - add details about the dashboard just like above in the visualization
+        yield create_document(workspace_id, "dashboard", dashboard)
+
+
+class GoodDataCatalogBuilder:
+    """
+    Builds RAG documents from the declarative LDM and ADM of a workspace.
+    Both models are fetched concurrently and documents are yielded as soon as the model they come from is loaded,
+    so indexing can start before the whole catalog is materialized: pass iter_documents() to init_vector_store().
+    build() materializes all documents, for callers which need them more than once.
+    """
+
+    def __init__(
+        self,
+        gd_sdk: GoodDataSdkWrapper,
+        workspace_id: str,
+        debug_mode: DebugMode = DebugMode.OFF,
+        debug_path: Path = Path("catalog"),
+    ) -> None:
+        self.gd_sdk = gd_sdk
+        self.workspace_id = workspace_id
+        self.debug_mode = debug_mode
+        self.debug_path = debug_path
+        self.ldm: Optional[CatalogDeclarativeModel] = None
+        self.adm: Optional[CatalogDeclarativeAnalytics] = None
+
+    @property
+    def debug_file_path(self) -> Path:
+        return DEBUG_PATH / self.debug_path / f"documents_{self.workspace_id}.jsonl"
+
+    def iter_documents(self) -> Iterator[Document]:
+        content_service = self.gd_sdk.sdk.catalog_workspace_content
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="catalog") as executor:
+            adm_future = executor.submit(content_service.get_declarative_analytics_model, self.workspace_id)
+            ldm_future = executor.submit(content_service.get_declarative_ldm, self.workspace_id)
+            # Spans cover only the wait, the fetch of the other model overlaps
+            with span("catalog.fetch", workspace=self.workspace_id, model="ldm"):
+                self.ldm = ldm_future.result()
+            yield from self._debug(iter_ldm_documents(self.workspace_id, self.ldm), mode="w")
+            with span("catalog.fetch", workspace=self.workspace_id, model="adm"):
+                self.adm = adm_future.result()
+            yield from self._debug(iter_adm_documents(self.workspace_id, self.adm), mode="a")
+
+    def _debug(self, documents: Iterator[Document], mode: str) -> Iterator[Document]:
+        if self.debug_mode == DebugMode.OFF:
+            yield from documents
+            return
+        self.debug_file_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.debug_file_path, mode) as fp:
+            for document in documents:
+                fp.write(json.dumps({"metadata": document.metadata, "page_content": document.page_content}) + "\n")
+                yield document
+
+    def build(self) -> GoodDataCatalog:
+        with span("catalog.build", workspace=self.workspace_id) as catalog_span:
+            documents = list(self.iter_documents())
+            catalog_span.set_attribute("documents", len(documents))
+        return GoodDataCatalog(documents=documents, ldm=self.ldm, adm=self.adm)
@@ -0,0 +1,81 @@
+from typing import Optional
+
+import attr
+from langchain_core.documents import Document
+
+from gooddata.agents.libs.catalog import GoodDataCatalogBuilder
+from gooddata.agents.libs.rag_langchain import GoodDataRAGCommon, RetrievalMode, VectorDB
+from gooddata.agents.libs.vector_stores.search_filter import SearchFilter
+from gooddata.agents.sdk_wrapper import GoodDataSdkWrapper
+
+# Number of metrics and of attributes offered to the model, independent of the workspace size
+DEFAULT_SCOPE_SIZE = 20
+
+
+@attr.s(auto_attribs=True, kw_only=True)
+class CatalogScope:
+    """Metrics and attributes (ID, title) an LLM may use to answer a question."""
+
+    metrics: list[tuple[str, str]]
+    attributes: list[tuple[str, str]]
+
+    @property
+    def metric_ids(self) -> list[str]:
+        return [m[0] for m in self.metrics]
+
+    @property
+    def attribute_ids(self) -> list[str]:
+        return [a[0] for a in self.attributes]
+
+
+class CatalogRetriever:
+    """
+    Picks metrics and attributes relevant to a question from the vector store of the workspace,
+    so prompts do not grow with the size of the workspace.
+    """
+
+    def __init__(
+        self,
+        gd_sdk: GoodDataSdkWrapper,
+        org_id: str,
+        workspace_id: str,
+        openai_api_key: Optional[str] = None,
+        openai_organization: Optional[str] = None,
+        vector_db: VectorDB = VectorDB.DUCKDB,
+        scope_size: int = DEFAULT_SCOPE_SIZE,
+    ) -> None:
+        self.gd_sdk = gd_sdk
+        self.workspace_id = workspace_id
+        self.rag = GoodDataRAGCommon(
+            org_id=org_id,
+            workspace_id=workspace_id,
+            vector_db=vector_db,
+            openai_api_key=openai_api_key,
+            openai_organization=openai_organization,
+            max_search_results=scope_size,
+            # Questions often name metrics and attributes literally
+            retrieval_mode=RetrievalMode.HYBRID,
+        )
+        self._vector_store = None
+
+    def get_documents(self) -> list[Document]:
+        return self.gd_sdk.catalog_cache.get_or_compute(
+            (self.gd_sdk.catalog_cache_prefix, self.workspace_id, "documents"),
+            lambda: GoodDataCatalogBuilder(self.gd_sdk, self.workspace_id).build().documents,
+        )
+
+    @property
+    def vector_store(self):
+        if self._vector_store is None:
+            self._vector_store = self.rag.init_vector_store(self.get_documents())
+        return self._vector_store
+
+    def get_retriever(self, search_filter: Optional[SearchFilter] = None):
+        return self.rag.get_rag_retriever(self.vector_store, search_filter)
+
+    def search(self, question: str, object_type: str) -> list[tuple[str, str]]:
+        documents = self.rag.similarity_search(self.vector_store, question, SearchFilter(object_types=[object_type]))
+        return [(d.metadata["id"], d.metadata["title"]) for d in documents]
+
+    def get_scope(self, question: str) -> CatalogScope:
+        return CatalogScope(metrics=self.search(question, "metric"), attributes=self.search(question, "attribute"))
@@ -0,0 +1,125 @@
+import asyncio
+from typing import Any, AsyncIterator, Callable, Optional
+
+import attr
+
+# Statuses with which the server asks clients to slow down
+THROTTLING_STATUSES = (429, 503)
+
+
+@attr.s(auto_attribs=True, kw_only=True)
+class BackoffPolicy:
+    """Polling is fast while the answer is being generated and slows down when nothing changes."""
+
+    initial_interval: float = 0.25
+    max_interval: float = 4.0
+    multiplier: float = 2.0
+    timeout: float = 300.0
+
+    def next_interval(self, interval: float) -> float:
+        return min(interval * self.multiplier, self.max_interval)
+
+
+def retry_after(e: Exception) -> Optional[float]:
+    """Seconds to wait suggested by the server, None if the exception is not throttling."""
+    if getattr(e, "status", None) not in THROTTLING_STATUSES:
+        return None
+    headers = getattr(e, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        # Missing or HTTP-date value, the caller falls back to its own interval
+        return 0.0
+
+
+class ChatHistoryTracker:
+    """
+    Merges deltas of the chat history into a list of interactions (updated in place).
+    Only interactions after the last finished one are requested again.
+    """
+
+    def __init__(self, interactions: list[dict], last_interaction_id: int = 0) -> None:
+        self.interactions = interactions
+        self.last_interaction_id = last_interaction_id
+        self._positions = {int(i["chatHistoryInteractionId"]): pos for pos, i in enumerate(interactions)}
+
+    @property
+    def finished(self) -> bool:
+        return bool(self.interactions) and self.interactions[-1]["interactionFinished"]
+
+    def apply(self, interactions: list[dict]) -> list[dict]:
+        """Merge a delta, return interactions which are new or changed."""
+        changed = []
+        for interaction in interactions:
+            interaction_id = int(interaction["chatHistoryInteractionId"])
+            position = self._positions.get(interaction_id)
+            if position is None:
+                self._positions[interaction_id] = len(self.interactions)
+                self.interactions.append(interaction)
+                changed.append(interaction)
+            elif self.interactions[position] != interaction:
+                self.interactions[position] = interaction
+                changed.append(interaction)
+            if interaction["interactionFinished"]:
+                self.last_interaction_id = max(self.last_interaction_id, interaction_id)
+        return changed
+
+
+class ChatInteractionDriver:
+    """
+    Submits a question and concurrently polls the chat history until the answer is finished.
+    Works with any blocking callables, e.g. GoodDataSdk compute service or a local fake of the chat API.
+    """
+
+    def __init__(
+        self,
+        ask: Callable[[str], Any],
+        get_history: Callable[[int], Any],
+        tracker: ChatHistoryTracker,
+        policy: Optional[BackoffPolicy] = None,
+    ) -> None:
+        self.ask = ask
+        self.get_history = get_history
+        self.tracker = tracker
+        self.policy = policy or BackoffPolicy()
+
+    async def arun(self, question: str) -> AsyncIterator[list[dict]]:
+        """Yield new or changed interactions as they appear in the chat history."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.policy.timeout
+        initial_count = len(self.tracker.interactions)
+        submit = asyncio.ensure_future(asyncio.to_thread(self.ask, question))
+        interval = self.policy.initial_interval
+        try:
+            while True:
+                submitted = submit.done()
+                try:
+                    history = await asyncio.to_thread(self.get_history, self.tracker.last_interaction_id)
+                except Exception as e:
+                    hint = retry_after(e)
+                    if hint is None:
+                        raise
+                    interval = max(hint, self.policy.next_interval(interval))
+                else:
+                    changed = self.tracker.apply(history["interactions"])
+                    if changed:
+                        interval = self.policy.initial_interval
+                        yield changed
+                    else:
+                        interval = self.policy.next_interval(interval)
+                    new_interactions = len(self.tracker.interactions) > initial_count
+                    if self.tracker.finished and (submitted or new_interactions):
+                        return
+                if submitted:
+                    # Surface errors of the question itself
+                    submit.result()
+                if loop.time() + interval > deadline:
+                    print(f"Chat interaction not finished in {self.policy.timeout}s, polling stopped")
+                    return
+                if submitted:
+                    await asyncio.sleep(interval)
+                else:
+                    # The answer is complete when the question returns, poll right away then
+                    await asyncio.wait({submit}, timeout=interval)
+        finally:
+            submit.cancel()
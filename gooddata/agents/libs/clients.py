@@ -0,0 +1,84 @@
+import asyncio
+import threading
+import weakref
+from typing import Optional
+
+import httpx
+import requests
+from openai import AsyncOpenAI, OpenAI
+from requests.adapters import HTTPAdapter
+
+# Pool limits per client, Streamlit serves several sessions from one process
+HTTP_MAX_CONNECTIONS = 32
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 16
+HTTP_KEEPALIVE_EXPIRY = 60.0
+# Defaults of the OpenAI SDK
+OPENAI_TIMEOUT = httpx.Timeout(timeout=600.0, connect=5.0)
+
+ClientKey = tuple[Optional[str], Optional[str], Optional[str]]
+
+_lock = threading.Lock()
+_openai_clients: dict[ClientKey, OpenAI] = {}
+# httpx async connections are bound to the event loop which created them
+_async_openai_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[ClientKey, AsyncOpenAI]]" = (
+    weakref.WeakKeyDictionary()
+)
+_http_session: Optional[requests.Session] = None
+
+
+def http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def get_openai_client(
+    api_key: Optional[str] = None, organization: Optional[str] = None, base_url: Optional[str] = None
+) -> OpenAI:
+    """
+    Process-wide OpenAI client per (api_key, organization, base_url).
+    Clients are thread-safe, sharing them reuses pooled keep-alive connections across agents and Streamlit reruns.
+    """
+    key = (api_key, organization, base_url)
+    with _lock:
+        if key not in _openai_clients:
+            _openai_clients[key] = OpenAI(
+                api_key=api_key,
+                organization=organization,
+                base_url=base_url,
+                http_client=httpx.Client(limits=http_limits(), timeout=OPENAI_TIMEOUT, follow_redirects=True),
+            )
+        return _openai_clients[key]
+
+
+def get_async_openai_client(
+    api_key: Optional[str] = None, organization: Optional[str] = None, base_url: Optional[str] = None
+) -> AsyncOpenAI:
+    """Like get_openai_client, one client per running event loop. Must be called from a coroutine."""
+    loop = asyncio.get_running_loop()
+    key = (api_key, organization, base_url)
+    with _lock:
+        clients = _async_openai_clients.setdefault(loop, {})
+        if key not in clients:
+            clients[key] = AsyncOpenAI(
+                api_key=api_key,
+                organization=organization,
+                base_url=base_url,
+                http_client=httpx.AsyncClient(limits=http_limits(), timeout=OPENAI_TIMEOUT, follow_redirects=True),
+            )
+        return clients[key]
+
+
+def get_http_session() -> requests.Session:
+    """Process-wide requests session with a connection pool, for plain REST calls."""
+    global _http_session
+    with _lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS, pool_maxsize=HTTP_MAX_CONNECTIONS)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _http_session = session
+        return _http_session
@@ -0,0 +1,212 @@
+import hashlib
+import threading
+from pathlib import Path
+from time import time_ns
+from typing import Optional
+
+import attr
+import duckdb
+from langchain_core.embeddings import Embeddings
+
+from gooddata.agents.libs.cache import TTLCache, get_cache
+from gooddata.agents.libs.tracing import span
+from gooddata.agents.libs.utils import connect_cache_db
+from gooddata.tools import TMP_DIR
+
+EMBEDDING_CACHE_PATH = TMP_DIR / "embedding_cache.duckdb"
+EMBEDDING_CACHE_TABLE = "embedding_cache"
+DEFAULT_MAX_ENTRIES = 500_000
+# Limit size of lists bound into SQL statements
+LOOKUP_BATCH_SIZE = 1000
+QUERY_MODEL_SUFFIX = "#query"
+# In-memory tier in front of the persistent cache for query embeddings, they are on the search latency path
+QUERY_CACHE_NAME = "query_embeddings"
+QUERY_CACHE_MAX_ENTRIES = 4096
+QUERY_CACHE_TTL = 3600
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+@attr.s(auto_attribs=True, kw_only=True)
+class EmbeddingCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class EmbeddingCache:
+    """
+    Persistent store of embeddings keyed by (model, normalized text hash).
+    Bounded by max_entries, least recently used entries are evicted first.
+    Use get_embedding_cache() to share one instance (and one DB connection) per file in the process.
+    """
+
+    def __init__(self, db_path: Path = EMBEDDING_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.stats = EmbeddingCacheStats()
+        self._lock = threading.Lock()
+        self._db: Optional[duckdb.DuckDBPyConnection] = None
+
+    @property
+    def _conn(self) -> duckdb.DuckDBPyConnection:
+        # Opened on first use under the lock of the cache, agents which never use the cache do not lock the file
+        if self._db is None:
+            self._db = connect_cache_db(self.db_path)
+            self._db.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {EMBEDDING_CACHE_TABLE} (
+                    model VARCHAR,
+                    text_hash VARCHAR,
+                    embedding FLOAT[],
+                    last_used BIGINT,
+                    PRIMARY KEY (model, text_hash)
+                );
+                """
+            )
+        return self._db
+
+    def get_many(self, model: str, hashes: list[str]) -> dict[str, list[float]]:
+        result = {}
+        now = time_ns()
+        with self._lock:
+            for i in range(0, len(hashes), LOOKUP_BATCH_SIZE):
+                batch = hashes[i : i + LOOKUP_BATCH_SIZE]
+                rows = self._conn.execute(
+                    f"""
+                    SELECT text_hash, embedding FROM {EMBEDDING_CACHE_TABLE}
+                    WHERE model = ? AND text_hash IN (SELECT unnest(?::VARCHAR[]));
+                    """,
+                    [model, batch],
+                ).fetchall()
+                result.update({row[0]: row[1] for row in rows})
+                self._conn.execute(
+                    f"""
+                    UPDATE {EMBEDDING_CACHE_TABLE} SET last_used = ?
+                    WHERE model = ? AND text_hash IN (SELECT unnest(?::VARCHAR[]));
+                    """,
+                    [now, model, [h for h in batch if h in result]],
+                )
+        return result
+
+    def put_many(self, model: str, embeddings: dict[str, list[float]]) -> None:
+        if not embeddings:
+            return
+        now = time_ns()
+        items = list(embeddings.items())
+        with self._lock:
+            for i in range(0, len(items), LOOKUP_BATCH_SIZE):
+                batch = items[i : i + LOOKUP_BATCH_SIZE]
+                self._conn.execute(
+                    f"""
+                    INSERT OR REPLACE INTO {EMBEDDING_CACHE_TABLE}
+                    SELECT ?, unnest(?::VARCHAR[]), unnest(?::FLOAT[][]), ?;
+                    """,
+                    [model, [h for h, _ in batch], [e for _, e in batch], now],
+                )
+            self._evict()
+
+    def _evict(self) -> None:
+        count = self._conn.execute(f"SELECT count(*) FROM {EMBEDDING_CACHE_TABLE};").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                f"""
+                DELETE FROM {EMBEDDING_CACHE_TABLE} WHERE rowid IN (
+                    SELECT rowid FROM {EMBEDDING_CACHE_TABLE} ORDER BY last_used LIMIT ?
+                );
+                """,
+                [overflow],
+            )
+            self.stats.evictions += overflow
+
+    def record(self, hits: int, misses: int) -> None:
+        with self._lock:
+            self.stats.hits += hits
+            self.stats.misses += misses
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {EMBEDDING_CACHE_TABLE};")
+
+    def close(self) -> None:
+        """Release the DB file, the cache opens it again on the next use."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+_caches: dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_query_cache() -> TTLCache:
+    """In-memory cache of query embeddings, questions are often repeated."""
+    return get_cache(QUERY_CACHE_NAME, max_entries=QUERY_CACHE_MAX_ENTRIES, ttl=QUERY_CACHE_TTL)
+
+
+def get_embedding_cache(db_path: Path = EMBEDDING_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES) -> EmbeddingCache:
+    with _caches_lock:
+        if str(db_path) not in _caches:
+            _caches[str(db_path)] = EmbeddingCache(db_path, max_entries)
+        return _caches[str(db_path)]
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper which embeds only texts not found in the cache.
+    Works with any LangChain Embeddings, e.g. DeterministicFakeEmbedding for tests without network.
+    """
+
+    def __init__(self, embedding: Embeddings, model: str, cache: Optional[EmbeddingCache] = None) -> None:
+        self.embedding = embedding
+        self.model = model
+        self.cache = cache or get_embedding_cache()
+
+    @property
+    def stats(self) -> EmbeddingCacheStats:
+        return self.cache.stats
+
+    def missing_texts(self, texts: list[str]) -> list[str]:
+        """Texts which are not cached yet, once each, the model would be asked only for these."""
+        missing = {text_hash(t): t for t in texts}
+        found = self.cache.get_many(self.model, list(missing))
+        return [t for h, t in missing.items() if h not in found]
+
+    def _embed_cached(self, texts: list[str], model: str, embed_func) -> list[list[float]]:
+        with span("embedding", model=model, texts=len(texts)) as embedding_span:
+            hashes = [text_hash(t) for t in texts]
+            unique_hashes = list(dict.fromkeys(hashes))
+            found = self.cache.get_many(model, unique_hashes)
+            missing = {h: t for h, t in zip(hashes, texts) if h not in found}
+            self.cache.record(hits=len(unique_hashes) - len(missing), misses=len(missing))
+            embedding_span.set_attributes(cache_hits=len(unique_hashes) - len(missing), cache_misses=len(missing))
+            if missing:
+                with span("embedding.request", model=model, texts=len(missing)):
+                    new_embeddings = dict(zip(missing.keys(), embed_func(list(missing.values()))))
+                self.cache.put_many(model, new_embeddings)
+                found.update(new_embeddings)
+            return [found[h] for h in hashes]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._embed_cached(texts, self.model, self.embedding.embed_documents)
+
+    def embed_query(self, text: str) -> list[float]:
+        # Some models embed queries differently than documents, keep them apart
+        model = self.model + QUERY_MODEL_SUFFIX
+        return get_query_cache().get_or_compute(
+            (model, text_hash(text)),
+            lambda: self._embed_cached([text], model, lambda texts: [self.embedding.embed_query(texts[0])])[0],
+        )
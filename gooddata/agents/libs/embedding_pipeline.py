@@ -0,0 +1,199 @@
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextvars import copy_context
+from time import monotonic, sleep
+from typing import Callable, Iterable, Iterator, Optional
+
+import openai
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from gooddata.agents.libs.embedding_cache import CachedEmbeddings
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_BATCH_TOKENS = 50_000
+# OpenAI accepts at most 2048 inputs per embedding request
+DEFAULT_MAX_BATCH_SIZE = 1000
+DEFAULT_TOKENS_PER_MINUTE = 1_000_000
+DEFAULT_REQUESTS_PER_MINUTE = 3_000
+DEFAULT_MAX_RETRIES = 6
+INITIAL_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+TRANSIENT_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text, good enough for budgeting, no need to call a tokenizer
+    return max(1, len(text) // 4)
+
+
+def token_batches(
+    documents: Iterable[Document],
+    max_batch_tokens: int = DEFAULT_MAX_BATCH_TOKENS,
+    max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+) -> Iterator[list[Document]]:
+    """Lazily split documents into batches limited by estimated token count and number of documents."""
+    batch = []
+    batch_tokens = 0
+    for document in documents:
+        tokens = estimate_tokens(document.page_content)
+        if batch and (batch_tokens + tokens > max_batch_tokens or len(batch) >= max_batch_size):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append(document)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """
+    Token bucket limiting both tokens and requests per minute, shared by all pipeline workers.
+    When the API rate-limits us anyway, all workers pause and the budget is halved,
+    then it slowly recovers with every successful request.
+    """
+
+    def __init__(self, tokens_per_minute: int, requests_per_minute: int) -> None:
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_minute = requests_per_minute
+        self.rate_factor = 1.0
+        self._tokens = float(tokens_per_minute)
+        self._requests = float(requests_per_minute)
+        self._updated = monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed_minutes = (now - self._updated) / 60
+        self._updated = now
+        self._tokens = min(
+            self.tokens_per_minute, self._tokens + elapsed_minutes * self.tokens_per_minute * self.rate_factor
+        )
+        self._requests = min(
+            self.requests_per_minute, self._requests + elapsed_minutes * self.requests_per_minute * self.rate_factor
+        )
+
+    def acquire(self, tokens: int) -> None:
+        # A single batch larger than the whole budget must still be able to pass
+        tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                now = monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self._tokens >= tokens and self._requests >= 1:
+                    self._tokens -= tokens
+                    self._requests -= 1
+                    return
+                token_wait = (tokens - self._tokens) / (self.tokens_per_minute * self.rate_factor) * 60
+                request_wait = (1 - self._requests) / (self.requests_per_minute * self.rate_factor) * 60
+                wait_time = max(self._paused_until - now, token_wait, request_wait, 0.01)
+            sleep(min(wait_time, MAX_BACKOFF))
+
+    def on_rate_limit(self, pause: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, monotonic() + pause)
+            self.rate_factor = max(0.1, self.rate_factor / 2)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.rate_factor = min(1.0, self.rate_factor * 1.05)
+
+
+class EmbeddingPipeline:
+    """
+    Embeds documents in token-budgeted batches on a bounded thread pool.
+    Finished batches are handed to write_batch in the calling thread as soon as they complete,
+    so vector stores do not have to be thread-safe and only a few batches are held in memory at once.
+
+    The pipeline only computes embeddings, write_batch is expected to get them from the shared embedding cache
+    (see CachedEmbeddings), because LangChain vector stores do not accept precomputed vectors.
+    """
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        max_batch_tokens: int = DEFAULT_MAX_BATCH_TOKENS,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        tokens_per_minute: int = DEFAULT_TOKENS_PER_MINUTE,
+        requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+    ) -> None:
+        self.embedding = embedding
+        self.concurrency = concurrency
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_retries = max_retries
+        self.rate_limiter = RateLimiter(tokens_per_minute, requests_per_minute)
+
+    def uncached_texts(self, batch: list[Document]) -> list[str]:
+        texts = [d.page_content for d in batch]
+        if isinstance(self.embedding, CachedEmbeddings):
+            return self.embedding.missing_texts(texts)
+        return texts
+
+    def embed_batch(self, batch: list[Document]) -> list[Document]:
+        # Cached texts cost no request, they must not use up the rate limit budget
+        texts = self.uncached_texts(batch)
+        if not texts:
+            return batch
+        tokens = sum(estimate_tokens(t) for t in texts)
+        backoff = INITIAL_BACKOFF
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire(tokens)
+            try:
+                self.embedding.embed_documents(texts)
+                self.rate_limiter.on_success()
+                return batch
+            except TRANSIENT_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                pause = retry_after_seconds(e) or backoff
+                print(f"Embedding batch of {len(batch)} documents failed ({type(e).__name__}), retry in {pause:.1f}s")
+                if isinstance(e, openai.RateLimitError):
+                    self.rate_limiter.on_rate_limit(pause)
+                else:
+                    sleep(pause)
+                backoff = min(backoff * 2, MAX_BACKOFF)
+
+    def run(self, documents: Iterable[Document], write_batch: Callable[[list[Document]], None]) -> int:
+        """Embed documents and write them batch by batch. Returns number of written documents."""
+        written = 0
+        # Bound number of batches in flight, documents can be a lazy generator of an arbitrary size
+        max_in_flight = self.concurrency * 2
+        in_flight: set[Future] = set()
+
+        def write_done(done: set[Future]) -> None:
+            nonlocal written
+            for future in done:
+                batch = future.result()
+                write_batch(batch)
+                written += len(batch)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="embedding") as executor:
+            for batch in token_batches(documents, self.max_batch_tokens, self.max_batch_size):
+                if len(in_flight) >= max_in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    write_done(done)
+                # Spans of workers are nested under the span of the caller
+                in_flight.add(executor.submit(copy_context().run, self.embed_batch, batch))
+            while in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                write_done(done)
+        return written
@@ -0,0 +1,235 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from time import time
+from typing import Any, Optional
+
+import attr
+import pandas as pd
+
+from gooddata.agents.libs.cache import CacheStats
+from gooddata.tools import TMP_DIR
+
+EXECUTION_CACHE_DIR = TMP_DIR / "execution_cache"
+EXECUTION_CACHE_INDEX = "index.json"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Data in the workspace changes, results must not live forever
+DEFAULT_TTL = 3600
+
+
+def to_canonical(value: Any) -> Any:
+    """JSON-compatible form of SDK objects (ExecutionDefinition, Attribute, SimpleMetric, ...)."""
+    if hasattr(value, "as_api_model"):
+        value = value.as_api_model()
+    if hasattr(value, "to_dict"):
+        value = value.to_dict()
+    if isinstance(value, dict):
+        return {str(k): to_canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_canonical(v) for v in value]
+    return value
+
+
+def execution_key(scope: str, workspace_id: str, definition: Any) -> str:
+    """Hash of the canonical execution definition, equal definitions built in different ways share results."""
+    payload = json.dumps([scope, workspace_id, to_canonical(definition)], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@attr.s(auto_attribs=True, kw_only=True)
+class ExecutionCacheEntry:
+    file_name: str
+    size: int
+    created_at: float
+    result_id: Optional[str] = None
+
+
+class ExecutionCache:
+    """
+    Data frames of executions stored as Parquet files, indexed by execution key and by result ID.
+    Bounded by total size of the files, least recently used entries are evicted first.
+    The index is persisted next to the files, cached results survive restarts.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path = EXECUTION_CACHE_DIR,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        ttl: Optional[float] = DEFAULT_TTL,
+    ) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._lock = threading.RLock()
+        # Ordered from the least recently used
+        self._entries: OrderedDict[str, ExecutionCacheEntry] = OrderedDict()
+        self._result_ids: dict[str, str] = {}
+        self._load_index()
+
+    @property
+    def index_path(self) -> Path:
+        return self.cache_dir / EXECUTION_CACHE_INDEX
+
+    @property
+    def size(self) -> int:
+        return sum(e.size for e in self._entries.values())
+
+    def _load_index(self) -> None:
+        if not os.path.isfile(self.index_path):
+            return
+        try:
+            with open(self.index_path, "r") as fp:
+                content = json.load(fp)
+        except (OSError, ValueError) as e:
+            print(f"Loading execution cache index {self.index_path} failed: {e}")
+            return
+        for key, entry in content["entries"]:
+            entry = ExecutionCacheEntry(**entry)
+            if os.path.isfile(self.cache_dir / entry.file_name):
+                self._entries[key] = entry
+                if entry.result_id:
+                    self._result_ids[entry.result_id] = key
+
+    def _save_index(self) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as fp:
+            json.dump({"entries": [(key, attr.asdict(entry)) for key, entry in self._entries.items()]}, fp)
+        os.replace(tmp_path, self.index_path)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._result_ids.pop(entry.result_id, None)
+        try:
+            os.remove(self.cache_dir / entry.file_name)
+        except FileNotFoundError:
+            pass
+
+    def _get_entry(self, key: str) -> Optional[ExecutionCacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self.ttl is not None and entry.created_at + self.ttl <= time():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, key: str) -> Optional[tuple[pd.DataFrame, Optional[str]]]:
+        """Data frame and result ID of the execution, if cached."""
+        with self._lock:
+            entry = self._get_entry(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            self.stats.hits += 1
+            return pd.read_parquet(self.cache_dir / entry.file_name), entry.result_id
+
+    def get_path(self, key: str) -> Optional[tuple[Path, Optional[str]]]:
+        """Parquet file and result ID of the execution, for readers which do not need the whole data frame."""
+        with self._lock:
+            entry = self._get_entry(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            self.stats.hits += 1
+            return self.cache_dir / entry.file_name, entry.result_id
+
+    def get_by_result_id(self, result_id: str) -> Optional[pd.DataFrame]:
+        with self._lock:
+            key = self._result_ids.get(result_id)
+        if key is None:
+            self.stats.misses += 1
+            return None
+        cached = self.get(key)
+        return cached[0] if cached is not None else None
+
+    def tmp_path(self, key: str) -> Path:
+        """Path to write a file to, before it is registered by put_file."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        return self.cache_dir / f"{key}.{threading.get_ident()}.tmp"
+
+    def put(self, key: str, df: pd.DataFrame, result_id: Optional[str] = None) -> None:
+        tmp_path = self.tmp_path(key)
+        df.to_parquet(tmp_path)
+        self.put_file(key, tmp_path, result_id)
+
+    def put_file(self, key: str, path: Path, result_id: Optional[str] = None) -> None:
+        """Register a Parquet file written by the caller, the file is moved into the cache."""
+        file_name = f"{key}.parquet"
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            os.replace(path, self.cache_dir / file_name)
+            size = os.path.getsize(self.cache_dir / file_name)
+            self._entries[key] = ExecutionCacheEntry(
+                file_name=file_name, size=size, created_at=time(), result_id=result_id
+            )
+            if result_id:
+                self._result_ids[result_id] = key
+            total = self.size
+            while total > self.max_bytes and len(self._entries) > 1:
+                oldest_key = next(iter(self._entries))
+                total -= self._entries[oldest_key].size
+                self._remove(oldest_key)
+                self.stats.evictions += 1
+            self._save_index()
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+            self._save_index()
+
+
+_caches: dict[str, ExecutionCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_execution_cache(cache_dir: Path = EXECUTION_CACHE_DIR) -> ExecutionCache:
+    with _caches_lock:
+        if str(cache_dir) not in _caches:
+            _caches[str(cache_dir)] = ExecutionCache(cache_dir)
+        return _caches[str(cache_dir)]
+
+
+class CachedExecutionFrames:
+    """
+    Front of gooddata_pandas DataFrameFactory serving repeated executions from ExecutionCache.
+    Works with any object providing for_items/for_exec_def/for_exec_result_id, e.g. a stub of GoodPandas frames.
+    """
+
+    def __init__(self, frames: Any, scope: str, workspace_id: str, cache: Optional[ExecutionCache] = None) -> None:
+        self.frames = frames
+        self.scope = scope
+        self.workspace_id = workspace_id
+        self.cache = cache or get_execution_cache()
+
+    def for_items(self, items: dict[str, Any], auto_index: bool = True) -> pd.DataFrame:
+        key = execution_key(self.scope, self.workspace_id, {"items": items, "auto_index": auto_index})
+        if (cached := self.cache.get(key)) is not None:
+            return cached[0]
+        df = self.frames.for_items(items=items, auto_index=auto_index)
+        self.cache.put(key, df)
+        return df
+
+    def for_exec_def(self, exec_def: Any) -> tuple[pd.DataFrame, Optional[str]]:
+        """Data frame and result ID, the result can be read again by for_exec_result_id without an execution."""
+        key = execution_key(self.scope, self.workspace_id, exec_def)
+        if (cached := self.cache.get(key)) is not None:
+            return cached
+        df, df_metadata = self.frames.for_exec_def(exec_def)
+        result_id = df_metadata.execution_response.result_id
+        self.cache.put(key, df, result_id)
+        return df, result_id
+
+    def for_exec_result_id(self, result_id: str) -> pd.DataFrame:
+        if (df := self.cache.get_by_result_id(result_id)) is not None:
+            return df
+        df, _ = self.frames.for_exec_result_id(result_id=result_id)
+        self.cache.put(execution_key(self.scope, self.workspace_id, {"result_id": result_id}), df, result_id)
+        return df
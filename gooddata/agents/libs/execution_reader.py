@@ -0,0 +1,157 @@
+import os
+from typing import Any, Iterator, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from gooddata_sdk import ExecutionDefinition, GoodDataSdk
+from gooddata_sdk.compute.model.execution import Execution, ExecutionResult
+
+from gooddata.agents.libs.execution_cache import ExecutionCache, execution_key, get_execution_cache
+from gooddata.agents.libs.tracing import span
+
+# Rows (dimension 0) per page
+DEFAULT_PAGE_SIZE = 1000
+# Metrics are in dimension 1, all of them fit into one page
+MAX_COLUMNS = 1000
+
+
+def dimension_local_ids(dimension: Any) -> list[str]:
+    """Local IDs of attributes or metrics in a dimension of the execution response, in the result order."""
+    local_ids = []
+    for header in dimension["headers"]:
+        if "attributeHeader" in header:
+            local_ids.append(header["attributeHeader"]["localIdentifier"])
+        elif "measureGroupHeaders" in header:
+            local_ids.extend(m["localIdentifier"] for m in header["measureGroupHeaders"])
+    return local_ids
+
+
+class PagedExecutionReader:
+    """
+    Reads a two-dimensional execution result (attributes in rows, metrics in columns) page by page.
+    Each page becomes one pyarrow.RecordBatch built column by column from the raw page,
+    so memory is bounded by the page size while iterating.
+    Results read completely are stored in ExecutionCache as Parquet and later read back in batches.
+    """
+
+    def __init__(
+        self,
+        sdk: GoodDataSdk,
+        workspace_id: str,
+        exec_def: ExecutionDefinition,
+        scope: str,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        column_names: Optional[dict[str, str]] = None,
+        cache: Optional[ExecutionCache] = None,
+    ) -> None:
+        """column_names maps local IDs to column names, local IDs are used by default."""
+        self.sdk = sdk
+        self.workspace_id = workspace_id
+        self.exec_def = exec_def
+        self.page_size = page_size
+        self.column_names = column_names or {}
+        self.cache = cache or get_execution_cache()
+        self.cache_key = execution_key(
+            scope, workspace_id, {"paged": exec_def, "column_names": sorted(self.column_names.items())}
+        )
+        self._execution: Optional[Execution] = None
+        self._table: Optional[pa.Table] = None
+        # Rows of the whole result, known once the first page is read
+        self.total_rows: Optional[int] = None
+        # Set by read_all when it stopped at max_rows before the last page
+        self.truncated = False
+
+    @property
+    def execution(self) -> Execution:
+        if self._execution is None:
+            self._execution = self.sdk.compute.for_exec_def(self.workspace_id, self.exec_def)
+        return self._execution
+
+    @property
+    def result_id(self) -> Optional[str]:
+        if (cached := self.cache.get_path(self.cache_key)) is not None:
+            return cached[1]
+        return self.execution.result_id
+
+    def _column_name(self, local_id: str) -> str:
+        return self.column_names.get(local_id, local_id)
+
+    def page_to_batch(self, result: ExecutionResult) -> pa.RecordBatch:
+        dimensions = self.execution.dimensions
+        arrays = []
+        names = []
+        for header_idx, local_id in enumerate(dimension_local_ids(dimensions[0])):
+            arrays.append(pa.array(result.get_all_header_values(0, header_idx), type=pa.string()))
+            names.append(self._column_name(local_id))
+        rows = result.data
+        # Without metrics, there is no second dimension
+        metric_local_ids = dimension_local_ids(dimensions[1]) if len(dimensions) > 1 else []
+        for column_idx, local_id in enumerate(metric_local_ids):
+            arrays.append(pa.array([row[column_idx] for row in rows], type=pa.float64()))
+            names.append(self._column_name(local_id))
+        return pa.RecordBatch.from_arrays(arrays, names=names)
+
+    def _iter_pages(self) -> Iterator[pa.RecordBatch]:
+        offset = 0
+        while True:
+            with span("report.read_page", workspace=self.workspace_id, offset=offset) as page_span:
+                dimension_count = len(self.execution.dimensions)
+                result = self.execution.read_result(
+                    limit=[self.page_size, MAX_COLUMNS][:dimension_count], offset=[offset, 0][:dimension_count]
+                )
+                page_span.set_attribute("rows", len(result.data))
+            self.total_rows = result.paging_total[0]
+            yield self.page_to_batch(result)
+            if result.is_complete(0):
+                return
+            offset = result.next_page_start(0)
+
+    def __iter__(self) -> Iterator[pa.RecordBatch]:
+        if self._table is not None:
+            yield from self._table.to_batches(max_chunksize=self.page_size)
+            return
+        if (cached := self.cache.get_path(self.cache_key)) is not None:
+            parquet_file = pq.ParquetFile(cached[0])
+            self.total_rows = parquet_file.metadata.num_rows
+            yield from parquet_file.iter_batches(batch_size=self.page_size)
+            return
+
+        # Pages are written to Parquet as they arrive, the file is registered in the cache once complete
+        tmp_path = self.cache.tmp_path(self.cache_key)
+        writer: Optional[pq.ParquetWriter] = None
+        try:
+            for batch in self._iter_pages():
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp_path, batch.schema)
+                writer.write_batch(batch)
+                yield batch
+            writer.close()
+            writer = None
+            self.cache.put_file(self.cache_key, tmp_path, self.execution.result_id)
+        finally:
+            if writer is not None:
+                writer.close()
+            if os.path.isfile(tmp_path):
+                os.remove(tmp_path)
+
+    def read_all(self, max_rows: Optional[int] = None) -> pa.Table:
+        """
+        Table of all pages (up to max_rows, rounded up to whole pages), concatenated on the first call.
+        truncated tells whether rows were left out because of max_rows.
+        """
+        if self._table is not None:
+            return self._table
+        batches = []
+        rows = 0
+        batch_iterator = iter(self)
+        for batch in batch_iterator:
+            batches.append(batch)
+            rows += batch.num_rows
+            # The last page completes the result even past max_rows, so that it is cached
+            if max_rows is not None and rows >= max_rows and rows != self.total_rows:
+                # Partial results are not cached
+                batch_iterator.close()
+                self.truncated = True
+                return pa.Table.from_batches(batches)
+        self._table = pa.Table.from_batches(batches) if batches else pa.table({})
+        return self._table
@@ -1,15 +1,34 @@
 import os
 from enum import Enum
-from typing import Optional
+from time import time
+from typing import AsyncIterator, Optional
 
+import attr
 from dotenv import load_dotenv
 from langchain.chains import ConversationChain
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from openai import OpenAI
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletion
 
-from gooddata.agents.libs.utils import timeit
+from gooddata.agents.libs.clients import get_async_openai_client, get_openai_client
+from gooddata.agents.libs.embedding_cache import CachedEmbeddings
+from gooddata.agents.libs.llm_cache import LLMResponseCache, get_llm_cache, hash_payload
+from gooddata.agents.libs.tracing import end_span, get_tracer, span, start_span, traced
 from gooddata.agents.sdk_wrapper import GoodDataSdkWrapper
 
+LLM_TOKENS_METRIC = "gooddata_llm_tokens_total"
+
+
+def record_usage(llm_span, completion: ChatCompletion) -> None:
+    """Token usage as span attributes and per-model counters."""
+    if not llm_span.is_recording or completion.usage is None:
+        return
+    usage = completion.usage
+    llm_span.set_attributes(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+    metrics = get_tracer().metrics
+    metrics.increment(LLM_TOKENS_METRIC, usage.prompt_tokens, model=completion.model, kind="prompt")
+    metrics.increment(LLM_TOKENS_METRIC, usage.completion_tokens, model=completion.model, kind="completion")
+
 
 class AIMethod(Enum):
     RAW = "raw"
@@ -33,23 +52,29 @@ class GoodDataOpenAICommon:
         temperature: int = 0,
         workspace_id: str = None,
         org_id: str = None,
+        response_cache: bool = True,
+        semantic_cache_threshold: Optional[float] = None,
     ) -> None:
         load_dotenv()
         self.openai_model = openai_model
         self.openai_api_key = openai_api_key or os.getenv("OPENAI_API_KEY")
         self.openai_organization = openai_organization or os.getenv("OPENAI_ORGANIZATION")
-        self.openai_client = OpenAI(
-            api_key=openai_api_key,
-            organization=openai_organization,
-        )
+        # Shared by all agents with the same credentials
+        self.openai_client = get_openai_client(self.openai_api_key, self.openai_organization)
         self.temperature = temperature
         self.workspace_id = workspace_id
         self.org_id = org_id
 
         self.unique_prefix = f"GOODDATA_PHOENIX::{self.workspace_id}"
         self.gd_sdk = gd_sdk
-
-        self.chain = self.get_conversation_chain()
+        # Only deterministic requests are cached, other temperatures ask for varied answers
+        self.response_cache: Optional[LLMResponseCache] = (
+            get_llm_cache() if response_cache and temperature == 0 else None
+        )
+        # Reuse answers to user prompts with at least this cosine similarity, None disables the semantic tier
+        self.semantic_cache_threshold = semantic_cache_threshold
+        self._prompt_embeddings = None
+        self._chain: Optional[ConversationChain] = None
 
     @property
     def openai_kwargs(self) -> dict:
@@ -63,36 +88,61 @@ class GoodDataOpenAICommon:
         return kwargs
 
     def get_chat_llm_model(self):
-        return ChatOpenAI(**self.openai_kwargs)
+        # Sync calls reuse the pooled client, LangChain creates the async one (it is bound to an event loop)
+        return ChatOpenAI(**self.openai_kwargs, client=self.openai_client.chat.completions)
 
-    def get_llm_embeddings(self):
-        return OpenAIEmbeddings(
+    def get_llm_embeddings(self, cached: bool = True):
+        embeddings = OpenAIEmbeddings(
             openai_api_key=self.openai_api_key,
             openai_organization=self.openai_organization,
+            client=self.openai_client.embeddings,
         )
+        if cached:
+            # Same texts are shared by many workspaces and re-embedded on every rebuild of a vector store
+            return CachedEmbeddings(embeddings, model=embeddings.model)
+        return embeddings
 
     def get_conversation_chain(self) -> ConversationChain:
-        llm = ChatOpenAI(**self.openai_kwargs)
+        llm = self.get_chat_llm_model()
 
         chain = ConversationChain(llm=llm)
         return chain
 
-    @timeit
+    @property
+    def chain(self) -> ConversationChain:
+        # Created on first use, most agents never converse
+        if self._chain is None:
+            self._chain = self.get_conversation_chain()
+        return self._chain
+
+    @traced
     def ask_question(self, request: str) -> str:
+        # A fresh chain, the memory of self.chain must not leak into independent questions
         chain = self.get_conversation_chain()
         result = chain.run(input=request)
         return result
 
-    @timeit
-    def ask_chat_completion(
+    async def astream_question(self, request: str) -> AsyncIterator[str]:
+        """Streaming counterpart of ask_question, yields tokens as they arrive."""
+        # ConversationChain streams only the final result, the chat model streams tokens
+        prompt = self.chain.prompt.format(input=request, history="")
+        async for chunk in self.get_chat_llm_model().astream(prompt):
+            yield chunk.content
+
+    def get_async_openai_client(self) -> AsyncOpenAI:
+        return get_async_openai_client(self.openai_api_key, self.openai_organization)
+
+    def get_chat_completion_kwargs(
         self,
         system_prompt: str,
         user_prompt: str,
         functions: Optional[list[dict]] = None,
         function_name: Optional[str] = None,
-    ):
+    ) -> dict:
         kwargs = {
             "model": self.openai_model,
+            # Also part of the cache key, only deterministic requests may be cached
+            "temperature": self.temperature,
             "messages": [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt},
@@ -102,7 +152,135 @@ class GoodDataOpenAICommon:
             kwargs["functions"] = functions
         if function_name:
             kwargs["function_call"] = {"name": function_name}
+        return kwargs
+
+    def ask_chat_completion(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        functions: Optional[list[dict]] = None,
+        function_name: Optional[str] = None,
+    ):
+        kwargs = self.get_chat_completion_kwargs(system_prompt, user_prompt, functions, function_name)
+        with span("llm.chat_completion", model=self.openai_model, workspace=self.workspace_id) as llm_span:
+            lookup = self.lookup_response_cache(kwargs, system_prompt, user_prompt)
+            llm_span.set_attribute("cache_hit", lookup is not None and lookup.completion is not None)
+            if lookup is not None and lookup.completion is not None:
+                return lookup.completion
 
-        completion = self.openai_client.chat.completions.create(**kwargs)
-        print(f"Tokens: {completion.usage}")
+            completion = self.openai_client.chat.completions.create(**kwargs)
+            record_usage(llm_span, completion)
+        self.store_response(lookup, completion)
         return completion
+
+    async def aask_chat_completion(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        functions: Optional[list[dict]] = None,
+        function_name: Optional[str] = None,
+    ) -> ChatCompletion:
+        kwargs = self.get_chat_completion_kwargs(system_prompt, user_prompt, functions, function_name)
+        with span("llm.chat_completion", model=self.openai_model, workspace=self.workspace_id) as llm_span:
+            lookup = self.lookup_response_cache(kwargs, system_prompt, user_prompt)
+            llm_span.set_attribute("cache_hit", lookup is not None and lookup.completion is not None)
+            if lookup is not None and lookup.completion is not None:
+                return lookup.completion
+
+            completion = await self.get_async_openai_client().chat.completions.create(**kwargs)
+            record_usage(llm_span, completion)
+        self.store_response(lookup, completion)
+        return completion
+
+    async def astream_chat_completion(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        """Yields content tokens as they arrive. A cached response is yielded at once."""
+        kwargs = self.get_chat_completion_kwargs(system_prompt, user_prompt)
+        # Not a context manager, each step of the generator may run in a different context
+        llm_span = start_span("llm.chat_completion", model=self.openai_model, workspace=self.workspace_id, stream=True)
+        try:
+            lookup = self.lookup_response_cache(kwargs, system_prompt, user_prompt)
+            llm_span.set_attribute("cache_hit", lookup is not None and lookup.completion is not None)
+            if lookup is not None and lookup.completion is not None:
+                yield lookup.completion.choices[0].message.content
+                return
+
+            stream = await self.get_async_openai_client().chat.completions.create(**kwargs, stream=True)
+            parts = []
+            completion_id, finish_reason = "", None
+            async for chunk in stream:
+                completion_id = chunk.id
+                if not chunk.choices:
+                    continue
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
+                if token := chunk.choices[0].delta.content:
+                    parts.append(token)
+                    yield token
+            llm_span.set_attribute("completion_chunks", len(parts))
+        finally:
+            end_span(llm_span)
+
+        # Streamed responses are cached in the same shape as non-streamed ones
+        completion = ChatCompletion(
+            id=completion_id,
+            object="chat.completion",
+            created=int(time()),
+            model=self.openai_model,
+            choices=[
+                {
+                    "index": 0,
+                    "finish_reason": finish_reason or "stop",
+                    "message": {"role": "assistant", "content": "".join(parts)},
+                }
+            ],
+        )
+        self.store_response(lookup, completion)
+
+    def lookup_response_cache(
+        self, kwargs: dict, system_prompt: str, user_prompt: str
+    ) -> Optional["ResponseCacheLookup"]:
+        """None if the cache is disabled, otherwise the lookup with the cached completion, if found."""
+        if self.response_cache is None:
+            return None
+        request_hash = hash_payload(kwargs)
+        # Everything except the user prompt must match for a semantic hit
+        context_hash = hash_payload(
+            {
+                "model": kwargs["model"],
+                "temperature": kwargs["temperature"],
+                "system_prompt": system_prompt,
+                "functions": kwargs.get("functions"),
+                "function_call": kwargs.get("function_call"),
+            }
+        )
+        lookup = ResponseCacheLookup(request_hash=request_hash, context_hash=context_hash)
+        if (response := self.response_cache.get_exact(request_hash)) is not None:
+            lookup.completion = ChatCompletion.model_validate(response)
+            return lookup
+
+        if self.semantic_cache_threshold is not None:
+            if self._prompt_embeddings is None:
+                self._prompt_embeddings = self.get_llm_embeddings()
+            lookup.prompt_embedding = self._prompt_embeddings.embed_query(user_prompt)
+            response = self.response_cache.get_semantic(
+                context_hash, lookup.prompt_embedding, self.semantic_cache_threshold
+            )
+            if response is not None:
+                lookup.completion = ChatCompletion.model_validate(response)
+                return lookup
+
+        self.response_cache.record_miss()
+        return lookup
+
+    def store_response(self, lookup: Optional["ResponseCacheLookup"], completion: ChatCompletion) -> None:
+        if lookup is not None:
+            self.response_cache.put(
+                lookup.request_hash, lookup.context_hash, completion.model_dump(), lookup.prompt_embedding
+            )
+
+
+@attr.s(auto_attribs=True, kw_only=True)
+class ResponseCacheLookup:
+    request_hash: str
+    context_hash: str
+    prompt_embedding: Optional[list[float]] = None
+    completion: Optional[ChatCompletion] = None
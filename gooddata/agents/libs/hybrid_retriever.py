@@ -0,0 +1,63 @@
+from typing import Any, Optional
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from gooddata.agents.libs.bm25_index import BM25Index
+from gooddata.agents.libs.tracing import span
+from gooddata.agents.libs.vector_stores.search_filter import SearchFilter
+
+# Constant of reciprocal rank fusion, dampens the weight of top ranks
+RRF_K = 60
+# Each ranking contributes this many candidates per requested result
+CANDIDATES_FACTOR = 2
+
+
+def fusion_key(document: Document) -> tuple[str, str]:
+    # Vector stores may add score keys or drop workspace_id (shared table), object type + ID is stable
+    # LanceDB keeps document metadata in a nested struct next to its own columns
+    metadata = document.metadata.get("metadata", document.metadata)
+    return metadata.get("object_type", ""), metadata.get("id", "")
+
+
+def reciprocal_rank_fusion(rankings: list[list[Document]], k: int, rrf_k: int = RRF_K) -> list[Document]:
+    scores: dict[tuple[str, str], float] = {}
+    documents: dict[tuple[str, str], Document] = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking):
+            key = fusion_key(document)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank + 1)
+            # The first ranking (lexical) carries documents with clean metadata
+            documents.setdefault(key, document)
+    ranked = sorted(scores, key=lambda key: scores[key], reverse=True)
+    return [documents[key] for key in ranked[:k]]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Fuses BM25 and vector similarity rankings with reciprocal rank fusion.
+    Queries equal to an object ID or title are answered from the BM25 index only, without an embedding call.
+    """
+
+    vector_store: Any
+    lexical_index: BM25Index
+    k: int = 4
+    search_filter: Optional[SearchFilter] = None
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        with span("hybrid_search", k=self.k) as search_span:
+            if exact := self.lexical_index.exact_match(query, self.search_filter):
+                search_span.set_attribute("exact_match", True)
+                return exact[: self.k]
+            candidates = self.k * CANDIDATES_FACTOR
+            with span("lexical_search", k=candidates):
+                lexical = [d for d, _ in self.lexical_index.search(query, candidates, self.search_filter)]
+            search_kwargs = {}
+            if self.search_filter is not None and not self.search_filter.is_empty:
+                search_kwargs["filter"] = self.search_filter
+            vector = self.vector_store.similarity_search(query, k=candidates, **search_kwargs)
+            return reciprocal_rank_fusion([lexical, vector], self.k)
@@ -0,0 +1,241 @@
+import fcntl
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+import attr
+from langchain_core.documents import Document
+
+CONTENT_HASH_KEY = "content_hash"
+MANIFEST_URL_TEMPLATE = "tmp/{org_id}.{db_type}.{table_name}.manifest.json"
+
+
+def document_key(document: Document) -> str:
+    """Stable identity of a catalog document, used as the row ID in vector tables."""
+    metadata = document.metadata
+    return f"{metadata['workspace_id']}/{metadata['object_type']}/{metadata['id']}"
+
+
+def document_hash(document: Document) -> str:
+    """Hash of everything which is embedded or returned with the document."""
+    metadata = {k: v for k, v in document.metadata.items() if k != CONTENT_HASH_KEY}
+    payload = json.dumps({"content": document.page_content, "metadata": metadata}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@attr.s(auto_attribs=True, kw_only=True)
+class IndexDiff:
+    to_upsert: list[Document]
+    to_delete: list[str]
+    unchanged: int = 0
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.to_upsert and not self.to_delete
+
+
+@attr.s(auto_attribs=True, kw_only=True)
+class IndexManifest:
+    """
+    Sidecar file tracking which documents (and which version of them) are stored in a vector table.
+    Vector tables are expensive to scan (every row carries the vector),
+    so the incremental sync compares catalog documents against this manifest instead.
+    """
+
+    path: Path
+    documents: dict[str, str] = attr.Factory(dict)
+    exists: bool = False
+
+    @classmethod
+    def load(cls, path: Path) -> "IndexManifest":
+        if not os.path.isfile(path):
+            return cls(path=path)
+        with open(path, "r") as fp:
+            content = json.load(fp)
+        return cls(path=path, documents=content["documents"], exists=True)
+
+    @property
+    def version(self) -> str:
+        """Changes whenever any document is added, changed or removed."""
+        payload = json.dumps(sorted(self.documents.items()))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    def diff(self, documents: Iterable[Document]) -> IndexDiff:
+        """Documents are iterated once, only new and changed ones are kept."""
+        current_keys = set()
+        to_upsert = []
+        for document in documents:
+            key = document_key(document)
+            current_keys.add(key)
+            if self.documents.get(key) != document_hash(document):
+                to_upsert.append(document)
+        to_delete = [key for key in self.documents if key not in current_keys]
+        return IndexDiff(to_upsert=to_upsert, to_delete=to_delete, unchanged=len(current_keys) - len(to_upsert))
+
+    def apply(self, diff: IndexDiff) -> None:
+        for key in diff.to_delete:
+            self.documents.pop(key, None)
+        for document in diff.to_upsert:
+            self.documents[document_key(document)] = document_hash(document)
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as fp:
+            json.dump({"version": self.version, "documents": self.documents}, fp)
+        os.replace(tmp_path, self.path)
+        self.exists = True
+
+    def delete(self) -> None:
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+        self.documents = {}
+        self.exists = False
+
+
+def strip_workspace(document: Document) -> Document:
+    """Copy of the document without workspace_id, identical objects of different workspaces become equal."""
+    metadata = {k: v for k, v in document.metadata.items() if k != "workspace_id"}
+    return Document(page_content=document.page_content, metadata=metadata)
+
+
+def shared_document_key(document: Document) -> str:
+    """Row ID in the org-level shared table, the same for identical documents of all workspaces."""
+    metadata = document.metadata
+    return f"{metadata['object_type']}/{metadata['id']}/{document_hash(strip_workspace(document))[:16]}"
+
+
+def slots_to_bits(slots: set[int]) -> int:
+    bitmap = bytearray((max(slots, default=0) >> 3) + 1)
+    for slot in slots:
+        bitmap[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(bitmap, "little")
+
+
+def bits_to_slots(bits: int) -> list[int]:
+    bitmap = bits.to_bytes((bits.bit_length() + 7) >> 3, "little")
+    return [(i << 3) + bit for i, byte in enumerate(bitmap) if byte for bit in range(8) if byte >> bit & 1]
+
+
+@attr.s(auto_attribs=True, kw_only=True)
+class SharedIndexDiff:
+    to_upsert: list[Document]
+    to_delete: list[str]
+    # Rows already in the table, which the workspace started or stopped referencing
+    joined: list[str] = attr.Factory(list)
+    left: list[str] = attr.Factory(list)
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.to_upsert and not self.to_delete
+
+
+@attr.s(auto_attribs=True, kw_only=True)
+class SharedIndexManifest:
+    """
+    Manifest of the org-level table shared by all workspaces.
+    Each distinct document is stored once, in a slot. Workspace membership is a bitset over slots
+    (Python int, stored as hex), so hundreds of workspaces with near-identical catalogs cost a few KB each.
+    A document is deleted from the table when no workspace references it anymore.
+    Workspaces are synced by concurrent processes, the manifest must be changed only under lock().
+    """
+
+    path: Path
+    keys: list[Optional[str]] = attr.Factory(list)
+    memberships: dict[str, int] = attr.Factory(dict)
+    exists: bool = False
+
+    @classmethod
+    def load(cls, path: Path) -> "SharedIndexManifest":
+        if not os.path.isfile(path):
+            return cls(path=path)
+        with open(path, "r") as fp:
+            content = json.load(fp)
+        memberships = {ws: int(bits, 16) for ws, bits in content["memberships"].items()}
+        return cls(path=path, keys=content["keys"], memberships=memberships, exists=True)
+
+    @staticmethod
+    @contextmanager
+    def lock(path: Path) -> Iterator[None]:
+        """Exclusive lock of the manifest (and the table) across processes, held from load to save."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(f"{path}.lock", "w") as fp:
+            fcntl.flock(fp, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fp, fcntl.LOCK_UN)
+
+    @property
+    def slots(self) -> dict[str, int]:
+        return {key: slot for slot, key in enumerate(self.keys) if key is not None}
+
+    def workspace_keys(self, workspace_id: str) -> list[str]:
+        return [self.keys[slot] for slot in bits_to_slots(self.memberships.get(workspace_id, 0))]
+
+    def workspace_version(self, workspace_id: str) -> str:
+        payload = json.dumps(sorted(self.workspace_keys(workspace_id)))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    def sync_workspace(self, workspace_id: str, documents: Iterable[Document]) -> SharedIndexDiff:
+        """
+        Update membership of the workspace, returns documents new in the table, keys no longer referenced
+        and changes of the workspace membership of other rows.
+        """
+        slots = self.slots
+        # Reuse slots of deleted documents, lowest first
+        free_slots = [slot for slot, key in enumerate(self.keys) if key is None][::-1]
+        workspace_slots = set()
+        to_upsert = []
+        new_slots = set()
+        for document in documents:
+            key = shared_document_key(document)
+            if key not in slots:
+                if free_slots:
+                    slots[key] = free_slots.pop()
+                    self.keys[slots[key]] = key
+                else:
+                    slots[key] = len(self.keys)
+                    self.keys.append(key)
+                new_slots.add(slots[key])
+                to_upsert.append(strip_workspace(document))
+            workspace_slots.add(slots[key])
+
+        new_bits = slots_to_bits(workspace_slots)
+        old_bits = self.memberships.get(workspace_id, 0)
+        removed_bits = old_bits & ~new_bits
+        if new_bits:
+            self.memberships[workspace_id] = new_bits
+        else:
+            self.memberships.pop(workspace_id, None)
+        joined = [self.keys[slot] for slot in bits_to_slots(new_bits & ~old_bits) if slot not in new_slots]
+        left = []
+        to_delete = []
+        if removed_bits:
+            referenced_bits = 0
+            for bits in self.memberships.values():
+                referenced_bits |= bits
+            left = [self.keys[slot] for slot in bits_to_slots(removed_bits & referenced_bits)]
+            for slot in bits_to_slots(removed_bits & ~referenced_bits):
+                to_delete.append(self.keys[slot])
+                self.keys[slot] = None
+        return SharedIndexDiff(to_upsert=to_upsert, to_delete=to_delete, joined=joined, left=left)
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        memberships = {ws: format(bits, "x") for ws, bits in self.memberships.items()}
+        with open(tmp_path, "w") as fp:
+            json.dump({"keys": self.keys, "memberships": memberships}, fp)
+        os.replace(tmp_path, self.path)
+        self.exists = True
+
+    def delete(self) -> None:
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+        self.keys = []
+        self.memberships = {}
+        self.exists = False
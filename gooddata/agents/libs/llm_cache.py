@@ -0,0 +1,167 @@
+import hashlib
+import json
+import threading
+from pathlib import Path
+from time import time_ns
+from typing import Any, Optional
+
+import attr
+import duckdb
+
+from gooddata.agents.libs.utils import connect_cache_db
+from gooddata.tools import TMP_DIR
+
+LLM_CACHE_PATH = TMP_DIR / "llm_cache.duckdb"
+LLM_CACHE_TABLE = "llm_response_cache"
+DEFAULT_MAX_ENTRIES = 10_000
+# Answers depend on the catalog, which changes over time
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_SEMANTIC_THRESHOLD = 0.95
+
+
+def hash_payload(payload: Any) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+@attr.s(auto_attribs=True, kw_only=True)
+class LLMCacheStats:
+    exact_hits: int = 0
+    semantic_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        hits = self.exact_hits + self.semantic_hits
+        total = hits + self.misses
+        return hits / total if total else 0.0
+
+
+class LLMResponseCache:
+    """
+    Persistent store of chat completion responses with two lookup tiers:
+    - exact: hash of the whole request (model, messages, functions, function_call)
+    - semantic: a response to a similar user prompt in the same context,
+      i.e. the same model, system prompt, functions and function_call
+    Bounded by max_entries (least recently used are evicted first) and ttl.
+    Use get_llm_cache() to share one instance (and one DB connection) per file in the process.
+    """
+
+    def __init__(
+        self,
+        db_path: Path = LLM_CACHE_PATH,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl: Optional[int] = DEFAULT_TTL,
+    ) -> None:
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = LLMCacheStats()
+        self._lock = threading.Lock()
+        self._db: Optional[duckdb.DuckDBPyConnection] = None
+
+    @property
+    def _conn(self) -> duckdb.DuckDBPyConnection:
+        # Opened on first use under the lock of the cache, agents which never use the cache do not lock the file
+        if self._db is None:
+            self._db = connect_cache_db(self.db_path)
+            self._db.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {LLM_CACHE_TABLE} (
+                    request_hash VARCHAR PRIMARY KEY,
+                    context_hash VARCHAR,
+                    prompt_embedding FLOAT[],
+                    response VARCHAR,
+                    created_at BIGINT,
+                    last_used BIGINT
+                );
+                """
+            )
+        return self._db
+
+    @property
+    def _min_created_at(self) -> int:
+        return time_ns() - self.ttl * 1_000_000_000 if self.ttl is not None else 0
+
+    def get_exact(self, request_hash: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT response FROM {LLM_CACHE_TABLE} WHERE request_hash = ? AND created_at >= ?;",
+                [request_hash, self._min_created_at],
+            ).fetchone()
+            if row is None:
+                return None
+            self._touch(request_hash)
+            self.stats.exact_hits += 1
+            return json.loads(row[0])
+
+    def get_semantic(self, context_hash: str, prompt_embedding: list[float], threshold: float) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                f"""
+                SELECT request_hash, response, list_cosine_similarity(prompt_embedding, ?::FLOAT[]) AS similarity
+                FROM {LLM_CACHE_TABLE}
+                WHERE context_hash = ? AND prompt_embedding IS NOT NULL AND created_at >= ?
+                ORDER BY similarity DESC
+                LIMIT 1;
+                """,
+                [prompt_embedding, context_hash, self._min_created_at],
+            ).fetchone()
+            if row is None or row[2] is None or row[2] < threshold:
+                return None
+            self._touch(row[0])
+            self.stats.semantic_hits += 1
+            return json.loads(row[1])
+
+    def put(
+        self, request_hash: str, context_hash: str, response: dict, prompt_embedding: Optional[list[float]] = None
+    ) -> None:
+        now = time_ns()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {LLM_CACHE_TABLE} VALUES (?, ?, ?::FLOAT[], ?, ?, ?);",
+                [request_hash, context_hash, prompt_embedding, json.dumps(response), now, now],
+            )
+            self._evict()
+
+    def record_miss(self) -> None:
+        with self._lock:
+            self.stats.misses += 1
+
+    def _touch(self, request_hash: str) -> None:
+        self._conn.execute(
+            f"UPDATE {LLM_CACHE_TABLE} SET last_used = ? WHERE request_hash = ?;", [time_ns(), request_hash]
+        )
+
+    def _evict(self) -> None:
+        expired = self._conn.execute(
+            f"DELETE FROM {LLM_CACHE_TABLE} WHERE created_at < ? RETURNING request_hash;", [self._min_created_at]
+        ).fetchall()
+        self.stats.evictions += len(expired)
+        count = self._conn.execute(f"SELECT count(*) FROM {LLM_CACHE_TABLE};").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                f"""
+                DELETE FROM {LLM_CACHE_TABLE} WHERE rowid IN (
+                    SELECT rowid FROM {LLM_CACHE_TABLE} ORDER BY last_used LIMIT ?
+                );
+                """,
+                [overflow],
+            )
+            self.stats.evictions += overflow
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {LLM_CACHE_TABLE};")
+
+
+_caches: dict[str, LLMResponseCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_llm_cache(db_path: Path = LLM_CACHE_PATH) -> LLMResponseCache:
+    with _caches_lock:
+        if str(db_path) not in _caches:
+            _caches[str(db_path)] = LLMResponseCache(db_path)
+        return _caches[str(db_path)]
@@ -0,0 +1,122 @@
+import itertools
+import threading
+from typing import Optional
+
+import attr
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from gooddata.agents.libs.llm_cache import hash_payload
+
+# Examples in the prompt, the most similar to the question
+DEFAULT_EXAMPLE_COUNT = 4
+
+# Never changes, the stable prefix of all MAQL prompts lets the provider cache it
+MAQL_PREAMBLE = """
+You are a data engineer writing metrics also known as measures in MAQL language.
+You exclusively use the following description of MAQL language.
+
+Metrics always start with keyword SELECT.
+You have translate entities specified by natural language with corresponding IDs of entities.
+All IDs must be specified as {{<type>/<id>}}, where <type> identifies type of entity and <id> the ID of entity.
+"""
+
+# Introduces the examples of each topic
+MAQL_EXAMPLE_HEADINGS = {
+    "basic": "Examples:",
+    "filter": (
+        "Now, I teach you how to apply filters. "
+        'Warning: the entity type for attributes must be here specified as "label".\nExamples:'
+    ),
+    "previous_period": (
+        "Now I teach you how to create metrics calculating values for previous period of time.\nExamples:"
+    ),
+}
+
+
+@attr.s(auto_attribs=True, kw_only=True)
+class MaqlExample:
+    question: str
+    answer: str
+    topic: str = "basic"
+
+    def __str__(self) -> str:
+        return f"Question: {self.question}\nAnswer: {self.answer}\n"
+
+
+MAQL_EXAMPLES = [
+    MaqlExample(question="Give me count of customers", answer="SELECT COUNT({{attribute/customer_id}})"),
+    MaqlExample(question="Give me average price", answer="SELECT AVG({{fact/price}})"),
+    MaqlExample(question="Give me count of flights", answer="SELECT SUM({{metric/flight_count}})"),
+    MaqlExample(
+        question="Sum of flight count where manufacturer is AIRBUS",
+        answer='SELECT SUM({{metric/flight_count}}) WHERE {{label/manufacturer}} = "AIRBUS"',
+        topic="filter",
+    ),
+    MaqlExample(
+        question="Sum of flight count where manufacturer is like AIR",
+        answer='SELECT SUM({{metric/flight_count}}) WHERE {{label/manufacturer}} LIKE "%AIR%"',
+        topic="filter",
+    ),
+    MaqlExample(
+        question="Calculate revenue for previous quarter",
+        answer="SELECT {{metric/revenue}} FOR Previous({{attribute/quarter}})",
+        topic="previous_period",
+    ),
+    MaqlExample(
+        question="Calculate revenue three years before now",
+        answer="SELECT {{metric/revenue}} FOR Previous({{attribute/year}}, 3)",
+        topic="previous_period",
+    ),
+]
+
+
+def catalog_version(facts: list, attributes: list, metrics: list) -> str:
+    """Changes whenever an entity is added, removed or renamed."""
+    return hash_payload([facts, attributes, metrics])
+
+
+def format_entities(
+    facts: list[tuple[str, str]], attributes: list[tuple[str, str]], metrics: list[tuple[str, str]]
+) -> str:
+    facts_text = "Facts:\n" + "\n".join([f"- Fact with ID {f[0]} is described as '{f[1]}'" for f in facts])
+    attributes_text = "Attributes:\n" + "\n".join(
+        [f"- Attribute with ID {a[0]} is described as '{a[1]}'" for a in attributes]
+    )
+    metrics_text = "Metrics:\n" + "\n".join([f"- Metric with ID {m[0]} is described as '{m[1]}'" for m in metrics])
+    return f"{facts_text}\n\n{attributes_text}\n\n{metrics_text}"
+
+
+def format_examples(examples: list[MaqlExample]) -> str:
+    """Examples of each topic follow its heading, examples are expected to be grouped by topic."""
+    sections = []
+    for topic, topic_examples in itertools.groupby(examples, key=lambda e: e.topic):
+        sections.append(MAQL_EXAMPLE_HEADINGS[topic] + "\n" + "\n".join(str(e) for e in topic_examples))
+    return "\n".join(sections)
+
+
+class MaqlExampleSelector:
+    """Few-shot examples most similar to the question, examples are embedded once."""
+
+    def __init__(self, embeddings: Embeddings, examples: Optional[list[MaqlExample]] = None) -> None:
+        self.embeddings = embeddings
+        self.examples = examples if examples is not None else MAQL_EXAMPLES
+        vectors = np.asarray(embeddings.embed_documents([e.question for e in self.examples]), dtype=np.float32)
+        self._vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def select(self, question: str, k: int = DEFAULT_EXAMPLE_COUNT) -> list[MaqlExample]:
+        query = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        similarities = self._vectors @ (query / np.linalg.norm(query))
+        # The original order keeps related examples next to each other
+        return [self.examples[i] for i in sorted(np.argsort(-similarities)[:k])]
+
+
+_selectors: dict[str, MaqlExampleSelector] = {}
+_selectors_lock = threading.Lock()
+
+
+def get_example_selector(embeddings: Embeddings, model: str) -> MaqlExampleSelector:
+    with _selectors_lock:
+        if model not in _selectors:
+            _selectors[model] = MaqlExampleSelector(embeddings)
+        return _selectors[model]
@@ -0,0 +1,190 @@
+import hashlib
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from time import time
+from typing import Optional
+
+import attr
+from gooddata_sdk import (
+    CatalogDeclarativeTable,
+    CatalogDeclarativeTables,
+    CatalogScanModelRequest,
+    GoodDataSdk,
+    ScanSqlRequest,
+)
+from gooddata_sdk.catalog.data_source.declarative_model.physical_model.pdm import CatalogScanResultPdm
+
+from gooddata.agents.libs.cache import TTLCache, get_cache
+from gooddata.tools import TMP_DIR
+
+PDM_CACHE_NAME = "pdm_snapshots"
+PDM_CACHE_PATH = TMP_DIR / "pdm_cache.pickle"
+PDM_CACHE_MAX_ENTRIES = 64
+# Older snapshots are served immediately and refreshed in the background
+PDM_REFRESH_INTERVAL = 600
+# One row per schema with a hash of its table and column names and types, cheap even on big warehouses.
+# Variants are tried in order, STRING_AGG (PostgreSQL, Vertica, ...) and LISTAGG (Snowflake).
+# Data sources supporting none of them are always scanned in full.
+FINGERPRINT_COLUMNS = "table_name || '.' || column_name || ':' || data_type"
+FINGERPRINT_SQLS = [
+    f"""
+SELECT table_schema, COUNT(*), MD5(STRING_AGG({FINGERPRINT_COLUMNS}, ',' ORDER BY table_name, column_name))
+FROM information_schema.columns
+GROUP BY table_schema
+""",
+    f"""
+SELECT table_schema, COUNT(*), MD5(LISTAGG({FINGERPRINT_COLUMNS}, ',') WITHIN GROUP (ORDER BY table_name, column_name))
+FROM information_schema.columns
+GROUP BY table_schema
+""",
+]
+
+
+@attr.s(auto_attribs=True, kw_only=True)
+class PdmSnapshot:
+    pdm: CatalogScanResultPdm
+    # Schema -> fingerprint of its tables and columns, None if the data source does not support fingerprints
+    fingerprints: Optional[dict[str, str]]
+    created_at: float
+
+    @property
+    def age(self) -> float:
+        return time() - self.created_at
+
+
+@attr.s(auto_attribs=True, kw_only=True)
+class PdmDiff:
+    added: list[str] = attr.Factory(list)
+    removed: list[str] = attr.Factory(list)
+    changed: list[str] = attr.Factory(list)
+
+    def __str__(self) -> str:
+        return f"added={self.added} removed={self.removed} changed={self.changed}"
+
+
+def table_name(table: CatalogDeclarativeTable) -> str:
+    return ".".join(table.path)
+
+
+def table_signature(table: CatalogDeclarativeTable) -> list[tuple[str, str]]:
+    return [(c.name, c.data_type) for c in table.columns]
+
+
+def diff_tables(old: list[CatalogDeclarativeTable], new: list[CatalogDeclarativeTable]) -> PdmDiff:
+    """Compare table and column lists of two scans."""
+    old_tables = {table_name(t): table_signature(t) for t in old}
+    new_tables = {table_name(t): table_signature(t) for t in new}
+    return PdmDiff(
+        added=sorted(new_tables.keys() - old_tables.keys()),
+        removed=sorted(old_tables.keys() - new_tables.keys()),
+        changed=sorted(n for n in new_tables.keys() & old_tables.keys() if new_tables[n] != old_tables[n]),
+    )
+
+
+class PdmScanner:
+    """
+    Scans of data sources stored as persistent snapshots, repeated requests do not scan at all.
+    Refresh compares per-schema fingerprints of information_schema and scans only schemas which changed.
+    """
+
+    def __init__(self, sdk: GoodDataSdk, scope: str, cache: Optional[TTLCache] = None) -> None:
+        self.sdk = sdk
+        self.scope = scope
+        # An empty TTLCache is falsy
+        if cache is None:
+            cache = get_cache(PDM_CACHE_NAME, max_entries=PDM_CACHE_MAX_ENTRIES, persist_path=PDM_CACHE_PATH)
+        self.cache = cache
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdm_refresh")
+        self._refreshes: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, data_source_id: str) -> tuple[str, str]:
+        return self.scope, data_source_id
+
+    def get_snapshot(self, data_source_id: str) -> Optional[PdmSnapshot]:
+        return self.cache.get(self._key(data_source_id))
+
+    def fingerprint(self, data_source_id: str) -> Optional[dict[str, str]]:
+        errors = []
+        for sql in FINGERPRINT_SQLS:
+            try:
+                response = self.sdk.catalog_data_source.scan_sql(data_source_id, ScanSqlRequest(sql=sql))
+            except Exception as e:
+                errors.append(str(e))
+                continue
+            return {
+                str(row[0]): hashlib.sha256("|".join(str(v) for v in row[1:]).encode("utf-8")).hexdigest()
+                for row in response.data_preview or []
+            }
+        print(f"Fingerprint of data source {data_source_id} failed, full scans are used: {errors}")
+        return None
+
+    def _scan(self, data_source_id: str, schemata: Optional[list[str]] = None) -> CatalogScanResultPdm:
+        print(f"scan_data_source {data_source_id=} {schemata=} START")
+        start = time()
+        result = self.sdk.catalog_data_source.scan_data_source(
+            data_source_id, CatalogScanModelRequest(schemata=schemata)
+        )
+        duration = int((time() - start) * 1000)
+        print(f"scan_data_source {data_source_id=} duration={duration}")
+        return result
+
+    def rescan(self, data_source_id: str) -> PdmSnapshot:
+        """Scan the data source again, only changed schemas if the previous snapshot has fingerprints."""
+        fingerprints = self.fingerprint(data_source_id)
+        previous = self.get_snapshot(data_source_id)
+        if fingerprints and previous is not None and previous.fingerprints:
+            changed = sorted(s for s, f in fingerprints.items() if previous.fingerprints.get(s) != f)
+            tables = [t for t in previous.pdm.pdm.tables if t.path[0] in fingerprints and t.path[0] not in changed]
+            warnings = []
+            if changed:
+                result = self._scan(data_source_id, changed)
+                tables += result.pdm.tables
+                warnings = result.warnings
+            pdm = CatalogScanResultPdm(pdm=CatalogDeclarativeTables(tables=tables), warnings=warnings)
+        else:
+            pdm = self._scan(data_source_id)
+        if previous is not None:
+            print(f"PDM of {data_source_id} changed: {diff_tables(previous.pdm.pdm.tables, pdm.pdm.tables)}")
+        snapshot = PdmSnapshot(pdm=pdm, fingerprints=fingerprints, created_at=time())
+        self.cache.set(self._key(data_source_id), snapshot)
+        return snapshot
+
+    def scan(self, data_source_id: str, refresh: bool = False) -> CatalogScanResultPdm:
+        snapshot = None if refresh else self.get_snapshot(data_source_id)
+        if snapshot is None:
+            snapshot = self.rescan(data_source_id)
+        return snapshot.pdm
+
+    def _refresh(self, data_source_id: str) -> Optional[PdmSnapshot]:
+        try:
+            return self.rescan(data_source_id)
+        except Exception as e:
+            # The previous snapshot is still served
+            print(f"Background refresh of data source {data_source_id} failed: {e}")
+            return None
+
+    def refresh_in_background(self, data_source_id: str) -> Future:
+        """Rescan in a worker thread, at most one refresh of a data source runs at a time."""
+        with self._lock:
+            future = self._refreshes.get(data_source_id)
+            if future is None or future.done():
+                future = self._refreshes[data_source_id] = self._executor.submit(self._refresh, data_source_id)
+            return future
+
+    def is_refreshing(self, data_source_id: str) -> bool:
+        with self._lock:
+            future = self._refreshes.get(data_source_id)
+            return future is not None and not future.done()
+
+
+_scanners: dict[str, PdmScanner] = {}
+_scanners_lock = threading.Lock()
+
+
+def get_pdm_scanner(sdk: GoodDataSdk, scope: str) -> PdmScanner:
+    """Scanner shared in the process, background refreshes must outlive Streamlit reruns."""
+    with _scanners_lock:
+        if scope not in _scanners:
+            _scanners[scope] = PdmScanner(sdk, scope)
+        return _scanners[scope]
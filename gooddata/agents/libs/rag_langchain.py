@@ -1,24 +1,49 @@
+import os
 from enum import Enum
 from operator import itemgetter
+from typing import AsyncIterator, Callable, Iterable, Iterator, Optional
 
 import attr
 import duckdb
 import lancedb
 from langchain.globals import set_debug
-from langchain_community.vectorstores import DuckDB
 from langchain_core.documents import Document
 from langchain_core.messages import AIMessage, HumanMessage, get_buffer_string
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate, format_document
 from langchain_core.runnables import RunnableParallel, RunnablePassthrough
 
+from gooddata.agents.libs.bm25_index import BM25_URL_TEMPLATE, BM25Index
+from gooddata.agents.libs.embedding_cache import CachedEmbeddings
+from gooddata.agents.libs.embedding_pipeline import EmbeddingPipeline, token_batches
 from gooddata.agents.libs.gd_openai import GoodDataOpenAICommon
-from gooddata.agents.libs.utils import debug_to_file, timeit
+from gooddata.agents.libs.hybrid_retriever import HybridRetriever
+from gooddata.agents.libs.index_manifest import (
+    CONTENT_HASH_KEY,
+    MANIFEST_URL_TEMPLATE,
+    IndexManifest,
+    SharedIndexDiff,
+    SharedIndexManifest,
+    document_hash,
+    document_key,
+    shared_document_key,
+)
+from gooddata.agents.libs.retrieval_cache import CachedRetriever, invalidate_stale_results
+from gooddata.agents.libs.tracing import current_span, traced
+from gooddata.agents.libs.utils import DEBUG_PATH, debug_to_file
+from gooddata.agents.libs.vector_stores import numpy_store
+from gooddata.agents.libs.vector_stores.duckdb_custom import CustomDuckDB
 from gooddata.agents.libs.vector_stores.lancedb_custom import CustomLanceDB
+from gooddata.agents.libs.vector_stores.numpy_store import NumpyVectorStore
+from gooddata.agents.libs.vector_stores.search_filter import SearchFilter, members_table_name
 
 PRODUCT_NAME = "GoodData Cloud"
 DEFAULT_MAX_SEARCH_RESULTS = 5
 DB_URL_TEMPLATE = "tmp/{org_id}.{db_type}"
+# Org-level table with documents of all workspaces, each distinct document stored once
+SHARED_TABLE_NAME = "org_shared"
+# Limit length of IN (...) lists in delete statements
+DELETE_BATCH_SIZE = 1000
 
 
 @attr.s(auto_attribs=True, kw_only=True)
@@ -30,7 +55,15 @@ class DBParams:
 
 class VectorDB(Enum):
     LANCEDB = DBParams(name="LanceDB", db_library=lancedb, langchain_library=CustomLanceDB)
-    DUCKDB = DBParams(name="DuckDB", db_library=duckdb, langchain_library=DuckDB)
+    DUCKDB = DBParams(name="DuckDB", db_library=duckdb, langchain_library=CustomDuckDB)
+    # In-process, no native library, memory-mapped float32 matrix
+    NUMPY = DBParams(name="NumPy", db_library=numpy_store, langchain_library=NumpyVectorStore)
+
+
+class RetrievalMode(Enum):
+    VECTOR = "vector"
+    # BM25 and vector rankings fused with reciprocal rank fusion
+    HYBRID = "hybrid"
 
 
 class GoodDataRAGCommon:
@@ -44,6 +77,10 @@ class GoodDataRAGCommon:
         openai_model: str = "gpt-3.5-turbo-0613",
         temperature: int = 0,
         max_search_results: int = DEFAULT_MAX_SEARCH_RESULTS,
+        shared_store: bool = False,
+        retrieval_mode: RetrievalMode = RetrievalMode.VECTOR,
+        cache_results: bool = True,
+        debug: bool = False,
     ) -> None:
         self.gd_openai = GoodDataOpenAICommon(
             openai_model=openai_model,
@@ -56,8 +93,20 @@ class GoodDataRAGCommon:
         self.max_search_results = max_search_results
         self.openai_chat_model = self.gd_openai.get_chat_llm_model()
         self.vector_db = vector_db
-        # Add prefix to prevent issues with DBs which do not support table names starting with numbers
-        self.vector_db_table_name = f"ws_{workspace_id}"
+        self.workspace_id = workspace_id
+        self.shared_store = shared_store
+        if shared_store:
+            self.vector_db_table_name = SHARED_TABLE_NAME
+        else:
+            # Add prefix to prevent issues with DBs which do not support table names starting with numbers
+            self.vector_db_table_name = f"ws_{workspace_id}"
+        self.retrieval_mode = retrieval_mode
+        self._lexical_index: Optional[BM25Index] = None
+        self.cache_results = cache_results
+        # Indexed documents are written to DEBUG_PATH
+        self.debug = debug
+        # Version of the documents in the index, part of retrieval cache keys
+        self._index_version: Optional[str] = None
         self.openai_embedding = self.gd_openai.get_llm_embeddings()
 
     # TODO - other databases. QDrant, Milvus, Weaviate, PostgreSQL
@@ -68,8 +117,7 @@ class GoodDataRAGCommon:
         )
 
     def connect_to_table(self, db_conn, table_name: str) -> bool:
-        # TODO - try to load docs everytime, update only changed rows
-        if self.vector_db == VectorDB.LANCEDB:
+        if self.vector_db in (VectorDB.LANCEDB, VectorDB.NUMPY):
             open_func = db_conn.open_table
         elif self.vector_db == VectorDB.DUCKDB:
             open_func = db_conn.table
@@ -84,76 +132,325 @@ class GoodDataRAGCommon:
             print(f"Opening table {table_name} failed: {e}")
             return False
 
-    @staticmethod
-    def debug_documents(documents: list[Document]):
-        docs_str = "\n".join([f"""Metadata:\n{str(r.metadata)}\n\nContent:\n{r.page_content}""" for r in documents])
-        debug_to_file("rag_docs.txt", docs_str)
-
-    def init_vector_store_duckdb(self, documents: list[Document], db_conn):
-        _, is_new = self.connect_to_table(db_conn, self.vector_db_table_name)
-        if is_new:
-            return self.vector_db.value.langchain_library.from_documents(
-                documents,
+    @property
+    def manifest_path(self) -> str:
+        return MANIFEST_URL_TEMPLATE.format(
+            org_id=self.gd_openai.org_id, db_type=self.vector_db.name, table_name=self.vector_db_table_name
+        )
+
+    @property
+    def cache_scope(self) -> tuple[str, str, str, str]:
+        return self.gd_openai.org_id, self.vector_db.name, self.vector_db_table_name, self.workspace_id
+
+    @property
+    def index_version(self) -> Optional[str]:
+        """None if the content of the index is not tracked (table loaded without sync)."""
+        if self._index_version is None:
+            if self.shared_store:
+                manifest = SharedIndexManifest.load(self.manifest_path)
+                if manifest.exists and self.workspace_id in manifest.memberships:
+                    self._index_version = manifest.workspace_version(self.workspace_id)
+            else:
+                manifest = IndexManifest.load(self.manifest_path)
+                if manifest.exists:
+                    self._index_version = manifest.version
+        return self._index_version
+
+    def set_index_version(self, index_version: str) -> None:
+        if index_version != self._index_version:
+            invalidate_stale_results(self.cache_scope, index_version)
+        self._index_version = index_version
+
+    @property
+    def lexical_index_path(self) -> str:
+        # Per workspace also with the shared store, lexical hits are returned from the index itself
+        return BM25_URL_TEMPLATE.format(
+            org_id=self.gd_openai.org_id, db_type=self.vector_db.name, workspace_id=self.workspace_id
+        )
+
+    @property
+    def lexical_index(self) -> BM25Index:
+        if self._lexical_index is None:
+            self._lexical_index = BM25Index.load(self.lexical_index_path)
+        return self._lexical_index
+
+    @traced
+    def sync_lexical_index(self, documents: list[Document]) -> None:
+        if self.lexical_index.sync(documents) or not os.path.isfile(self.lexical_index_path):
+            self.lexical_index.save()
+
+    def debug_documents(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """Pass documents through, in debug mode writing them to the debug file as they are consumed."""
+        if not self.debug:
+            yield from documents
+            return
+        DEBUG_PATH.mkdir(parents=True, exist_ok=True)
+        with open(DEBUG_PATH / "rag_docs.txt", "w") as fp:
+            for i, document in enumerate(documents):
+                if i:
+                    fp.write("\n")
+                fp.write(f"Metadata:\n{document.metadata}\n\nContent:\n{document.page_content}")
+                yield document
+
+    def get_vector_store(self, db_conn):
+        if self.vector_db == VectorDB.DUCKDB:
+            return self.vector_db.value.langchain_library(
                 connection=db_conn,
                 table_name=self.vector_db_table_name,
                 embedding=self.openai_embedding,
                 vector_key="embedding",
             )
-        else:
+        elif self.vector_db == VectorDB.LANCEDB:
+            return self.vector_db.value.langchain_library(
+                embedding=self.openai_embedding,
+                table_name=self.vector_db_table_name,
+                connection=db_conn,
+                # LangChain overwrites the whole table on every add by default
+                mode="append",
+            )
+        elif self.vector_db == VectorDB.NUMPY:
             return self.vector_db.value.langchain_library(
                 connection=db_conn,
                 table_name=self.vector_db_table_name,
                 embedding=self.openai_embedding,
-                vector_key="embedding",
             )
+        else:
+            raise NotImplementedError(f"Database {self.vector_db.name} is not supported")
+
+    def init_vector_store_duckdb(self, documents: Iterable[Document], db_conn):
+        table_exists = self.connect_to_table(db_conn, self.vector_db_table_name)
+        vector_store = self.get_vector_store(db_conn)
+        if not table_exists:
+            self.embed_and_store(vector_store, documents)
+        return vector_store
 
-    def init_vector_store_lancedb(self, documents: list[Document], db_conn):
+    def init_vector_store_lancedb(self, documents: Iterable[Document], db_conn):
         table_exists = self.connect_to_table(db_conn, self.vector_db_table_name)
+        vector_store = self.get_vector_store(db_conn)
+        if not table_exists:
+            # LanceDB table is created by the first batch
+            self.embed_and_store(vector_store, documents)
+        return vector_store
+
+    def delete_documents(self, db_conn, keys: list[str]) -> None:
+        for i in range(0, len(keys), DELETE_BATCH_SIZE):
+            batch = keys[i : i + DELETE_BATCH_SIZE]
+            if self.vector_db == VectorDB.DUCKDB:
+                db_conn.execute(
+                    f"""DELETE FROM "{self.vector_db_table_name}" WHERE list_contains(?::VARCHAR[], id);""", [batch]
+                )
+            elif self.vector_db == VectorDB.LANCEDB:
+                quoted_keys = ", ".join(["'" + key.replace("'", "''") + "'" for key in batch])
+                db_conn.open_table(self.vector_db_table_name).delete(f"id IN ({quoted_keys})")
+            elif self.vector_db == VectorDB.NUMPY:
+                db_conn.open_table(self.vector_db_table_name).delete(batch)
+            else:
+                raise NotImplementedError(f"Database {self.vector_db.name} is not supported")
+
+    @staticmethod
+    def upsert_documents(
+        vector_store, documents: list[Document], key_func: Callable[[Document], str] = document_key, **kwargs
+    ) -> None:
+        # Row ID is the document key, so changed documents replace their previous version
+        vector_store.add_texts(
+            texts=[d.page_content for d in documents],
+            metadatas=[{**d.metadata, CONTENT_HASH_KEY: document_hash(d)} for d in documents],
+            ids=[key_func(d) for d in documents],
+            **kwargs,
+        )
+
+    @traced
+    def embed_and_store(
+        self,
+        vector_store,
+        documents: Iterable[Document],
+        key_func: Callable[[Document], str] = document_key,
+        **kwargs,
+    ) -> int:
+        """Keyword arguments are passed to add_texts of the vector store."""
+
+        def write_batch(batch: list[Document]) -> None:
+            self.upsert_documents(vector_store, batch, key_func, **kwargs)
+
+        if isinstance(self.openai_embedding, CachedEmbeddings):
+            written = EmbeddingPipeline(self.openai_embedding).run(documents, write_batch)
+        else:
+            # Without the cache, vectors computed by the pipeline cannot be handed over to the vector store
+            written = 0
+            for batch in token_batches(documents):
+                write_batch(batch)
+                written += len(batch)
+        current_span().set_attributes(workspace=self.workspace_id, documents=written)
+        return written
+
+    @traced
+    def sync_vector_store(self, documents: Iterable[Document], db_conn):
+        """
+        Embed and store only documents which were added or changed since the last sync,
+        delete documents which disappeared from the catalog.
+        """
+        manifest = IndexManifest.load(self.manifest_path)
+        table_exists = self.connect_to_table(db_conn, self.vector_db_table_name)
+        if table_exists and not manifest.exists:
+            # Table created by a full load, row IDs are random, we cannot match them with documents
+            print(f"Table {self.vector_db_table_name} has no manifest, rebuilding it")
+            self.drop_vector_table(db_conn)
+            table_exists = False
+        if not table_exists:
+            manifest.documents = {}
+
+        diff = manifest.diff(documents)
+        print(
+            f"Syncing table {self.vector_db_table_name}: "
+            + f"upsert={len(diff.to_upsert)} delete={len(diff.to_delete)} unchanged={diff.unchanged}"
+        )
         if table_exists:
-            return self.vector_db.value.langchain_library(
-                embedding=self.openai_embedding,
-                table_name=self.vector_db_table_name,
-                connection=db_conn,
+            # Changed documents are deleted as well, add_texts does not update existing rows.
+            # So are new ones, they may be stored by a sync which died before the manifest was saved.
+            self.delete_documents(db_conn, diff.to_delete + [document_key(d) for d in diff.to_upsert])
+        vector_store = self.get_vector_store(db_conn)
+        if diff.to_upsert:
+            self.embed_and_store(vector_store, diff.to_upsert)
+        if not diff.is_empty or not manifest.exists:
+            manifest.apply(diff)
+            manifest.save()
+        self.set_index_version(manifest.version)
+        return vector_store
+
+    @traced
+    def sync_shared_vector_store(self, documents: Iterable[Document], db_conn):
+        """
+        Sync documents of the workspace into the org-level shared table.
+        Only documents not stored for any other workspace are embedded,
+        documents no longer referenced by any workspace are deleted.
+        Workspace membership of rows is stored next to the table, searches are filtered by it.
+        """
+        with SharedIndexManifest.lock(self.manifest_path):
+            manifest = SharedIndexManifest.load(self.manifest_path)
+            table_exists = self.connect_to_table(db_conn, self.vector_db_table_name)
+            if table_exists and not manifest.exists:
+                print(f"Table {self.vector_db_table_name} has no manifest, rebuilding it")
+                self.drop_vector_table(db_conn)
+                table_exists = False
+            if not table_exists:
+                manifest = SharedIndexManifest(path=self.manifest_path)
+
+            diff = manifest.sync_workspace(self.workspace_id, documents)
+            print(
+                f"Syncing workspace {self.workspace_id} into table {self.vector_db_table_name}: "
+                + f"new={len(diff.to_upsert)} joined={len(diff.joined)} left={len(diff.left)} "
+                + f"orphaned={len(diff.to_delete)}"
             )
-        else:
-            return self.vector_db.value.langchain_library.from_documents(
-                documents=documents,
-                embedding=self.openai_embedding,
-                table_name=self.vector_db_table_name,
-                connection=db_conn,
+            vector_store = self.get_vector_store(db_conn)
+            self.apply_shared_diff(vector_store, db_conn, diff, table_exists)
+            manifest.save()
+        self.set_index_version(manifest.workspace_version(self.workspace_id))
+        return vector_store
+
+    def apply_shared_diff(self, vector_store, db_conn, diff: SharedIndexDiff, table_exists: bool) -> None:
+        if table_exists:
+            # New documents may be stored by a sync which died before the manifest was saved
+            self.delete_documents(db_conn, diff.to_delete + [shared_document_key(d) for d in diff.to_upsert])
+        if diff.to_upsert:
+            self.embed_and_store(vector_store, diff.to_upsert, shared_document_key, workspaces=[self.workspace_id])
+        # Membership of deleted rows is removed as well, no row is rewritten for it
+        vector_store.update_members(self.workspace_id, diff.joined, diff.left + diff.to_delete)
+
+    def remove_workspace_from_shared_store(self, db_conn) -> None:
+        """Delete the workspace from the shared table, rows of other workspaces are kept."""
+        with SharedIndexManifest.lock(self.manifest_path):
+            manifest = SharedIndexManifest.load(self.manifest_path)
+            if not manifest.exists or not self.connect_to_table(db_conn, self.vector_db_table_name):
+                return
+            diff = manifest.sync_workspace(self.workspace_id, [])
+            print(
+                f"Removing workspace {self.workspace_id} from table {self.vector_db_table_name}: "
+                + f"left={len(diff.left)} orphaned={len(diff.to_delete)}"
             )
+            self.apply_shared_diff(self.get_vector_store(db_conn), db_conn, diff, table_exists=True)
+            manifest.save()
 
-    @timeit
-    def init_vector_store(self, documents: list[Document]):
-        self.debug_documents(documents)
+    @traced
+    def init_vector_store(self, documents: Iterable[Document], sync: bool = True):
+        """
+        With sync=True the table is incrementally updated to match documents,
+        otherwise an existing table is used as is and documents are loaded only into a new table.
+        The shared store is always synced, it is updated by all workspaces.
+        Documents are consumed once, e.g. GoodDataCatalogBuilder.iter_documents() is embedded while it is fetched
+        and only new or changed documents are held in memory. The lexical index of hybrid retrieval needs all of them.
+        """
+        if self.retrieval_mode == RetrievalMode.HYBRID:
+            documents = list(documents)
+            self.sync_lexical_index(documents)
+        documents = self.debug_documents(documents)
         db_conn = self.connect_to_db()
-        if self.vector_db == VectorDB.DUCKDB:
+        if self.shared_store:
+            return self.sync_shared_vector_store(documents, db_conn)
+        elif sync:
+            return self.sync_vector_store(documents, db_conn)
+        elif self.vector_db == VectorDB.DUCKDB:
             return self.init_vector_store_duckdb(documents, db_conn)
-        elif self.vector_db == VectorDB.LANCEDB:
+        elif self.vector_db in (VectorDB.LANCEDB, VectorDB.NUMPY):
+            # NumPy tables follow LanceDB semantics, they are created by the first add
             return self.init_vector_store_lancedb(documents, db_conn)
         else:
             raise NotImplementedError(f"Database {self.vector_db.name} is not supported")
 
-    def drop_table(self, db_conn):
+    def drop_vector_table(self, db_conn) -> None:
         if self.vector_db == VectorDB.DUCKDB:
             db_conn.sql(f"""DROP TABLE "{self.vector_db_table_name}";""")
-        elif self.vector_db == VectorDB.LANCEDB:
+            db_conn.sql(f"""DROP TABLE IF EXISTS "{members_table_name(self.vector_db_table_name)}";""")
+        elif self.vector_db in (VectorDB.LANCEDB, VectorDB.NUMPY):
             db_conn.drop_table(self.vector_db_table_name)
         else:
             raise NotImplementedError(f"Database {self.vector_db.name} is not supported")
+        # Both manifest types live in the same file
+        IndexManifest.load(self.manifest_path).delete()
 
-    @timeit
-    def get_rag_retriever(self, vector_store):
-        return vector_store.as_retriever(search_type="similarity", search_kwargs={"k": self.max_search_results})
+    def drop_table(self, db_conn):
+        """Reset the index of the workspace, the shared table keeps documents of other workspaces."""
+        if self.shared_store:
+            self.remove_workspace_from_shared_store(db_conn)
+        else:
+            self.drop_vector_table(db_conn)
+        self.lexical_index.delete()
+        self._index_version = None
 
-    def similarity_search(self, vector_store, query: str):
-        # TODO - use direct select from the table? How to embed correct vectors?
-        #  Would allow to use filters before doing similarity search!
-        #  Note: some DBs do not support filtering on metadata columns yet, e.g. DuckDB
-        #  Some support it only with LlamaIndex
+    @traced
+    def get_rag_retriever(self, vector_store, search_filter: Optional[SearchFilter] = None):
+        retriever = self._get_retriever(vector_store, search_filter)
+        index_version = self.index_version
+        if not self.cache_results or index_version is None:
+            return retriever
+        return CachedRetriever(
+            retriever=retriever,
+            scope=self.cache_scope,
+            index_version=index_version,
+            workspace_id=self.workspace_id,
+            # Workspace scope of the shared store is covered by the cache scope and the index version
+            parameters=(self.retrieval_mode.name, self.max_search_results, search_filter or SearchFilter()),
+        )
+
+    def _get_retriever(self, vector_store, search_filter: Optional[SearchFilter] = None):
+        if self.shared_store:
+            # Workspace-scoped search is a filtered query on the shared table
+            search_filter = attr.evolve(search_filter or SearchFilter(), member_of=self.workspace_id)
+        if self.retrieval_mode == RetrievalMode.HYBRID:
+            return HybridRetriever(
+                vector_store=vector_store,
+                lexical_index=self.lexical_index,
+                k=self.max_search_results,
+                search_filter=search_filter,
+            )
+        search_kwargs = {"k": self.max_search_results}
+        if search_filter is not None and not search_filter.is_empty:
+            # All supported vector stores apply the filter before vector scoring
+            search_kwargs["filter"] = search_filter
+        return vector_store.as_retriever(search_type="similarity", search_kwargs=search_kwargs)
+
+    def similarity_search(self, vector_store, query: str, search_filter: Optional[SearchFilter] = None):
         # TODO: using retriever here to accept custom Retriever implementations for both RAG and pure similarity search
-        return self.get_rag_retriever(vector_store).get_relevant_documents(query)
-        # return vector_store.similarity_search(query, k=self.max_search_results)
+        return self.get_rag_retriever(vector_store, search_filter).get_relevant_documents(query)
 
     @staticmethod
     def _combine_documents(docs, document_prompt, document_separator="\n\n"):
@@ -162,7 +459,7 @@ class GoodDataRAGCommon:
 
 
 class GoodDataRAGSimple(GoodDataRAGCommon):
-    @timeit
+    @traced
     def get_rag_chain(
         self,
         rag_retriever,
@@ -176,7 +473,7 @@ class GoodDataRAGSimple(GoodDataRAGCommon):
             | StrOutputParser()
         )
 
-    @timeit
+    @traced
     def rag_chain_invoke(
         self,
         rag_retriever,
@@ -186,9 +483,18 @@ class GoodDataRAGSimple(GoodDataRAGCommon):
         set_debug(True)
         return self.get_rag_chain(rag_retriever, answer_prompt).invoke(question)
 
+    async def rag_chain_astream(
+        self,
+        rag_retriever,
+        question: str,
+        answer_prompt: str,
+    ) -> AsyncIterator[str]:
+        async for token in self.get_rag_chain(rag_retriever, answer_prompt).astream(question):
+            yield token
+
 
 class GoodDataRAGHistory(GoodDataRAGCommon):
-    @timeit
+    @traced
     def get_rag_chain_with_history(self, rag_retriever, condense_question_prompt, chat_template):
         _inputs = RunnableParallel(
             standalone_question=RunnablePassthrough.assign(chat_history=lambda x: get_buffer_string(x["chat_history"]))
@@ -205,7 +511,7 @@ class GoodDataRAGHistory(GoodDataRAGCommon):
         )
         return conversational_qa_chain
 
-    @timeit
+    @traced
     def rag_chain_with_history_invoke(self, rag_retriever, question: str, chat_history: list[tuple[str, str]]):
         chat_history_ai = [(HumanMessage(content=human), AIMessage(content=ai)) for human, ai in chat_history]
         self.get_rag_chain_with_history(rag_retriever).invoke(
@@ -0,0 +1,50 @@
+from typing import Hashable, Optional
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from gooddata.agents.libs.cache import TTLCache, get_cache
+from gooddata.agents.libs.embedding_cache import normalize_text
+from gooddata.agents.libs.tracing import span
+
+RETRIEVAL_CACHE_NAME = "retrieval_results"
+RETRIEVAL_CACHE_MAX_ENTRIES = 2048
+RETRIEVAL_CACHE_TTL = 600
+
+
+def get_retrieval_cache() -> TTLCache:
+    return get_cache(RETRIEVAL_CACHE_NAME, max_entries=RETRIEVAL_CACHE_MAX_ENTRIES, ttl=RETRIEVAL_CACHE_TTL)
+
+
+def invalidate_stale_results(scope: Hashable, index_version: str) -> int:
+    """Drop results of the scope computed against other versions of the index."""
+    return get_retrieval_cache().invalidate(lambda key: key[0] == scope and key[1] != index_version)
+
+
+class CachedRetriever(BaseRetriever):
+    """
+    Caches ranked documents of the wrapped retriever.
+    Keys are (scope, index version, *parameters, normalized query); a new index version never hits old results.
+    """
+
+    retriever: BaseRetriever
+    scope: Hashable
+    index_version: str
+    parameters: tuple = ()
+    # Only labels the spans, the scope identifies the cached results
+    workspace_id: Optional[str] = None
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        key = (self.scope, self.index_version, *self.parameters, normalize_text(query))
+        cache = get_retrieval_cache()
+        with span("retrieval", workspace=self.workspace_id, cache_hit=key in cache) as retrieval_span:
+            documents = cache.get_or_compute(
+                key, lambda: self.retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+            )
+            retrieval_span.set_attribute("documents", len(documents))
+        # Callers may reorder the list, the cached one must stay intact
+        return list(documents)
@@ -0,0 +1,154 @@
+import re
+from collections import defaultdict
+from typing import Optional
+
+import attr
+from gooddata_sdk import CatalogDeclarativeTable
+
+# Prompt size budget of one chunk, in columns of source tables
+DEFAULT_CHUNK_COLUMNS = 150
+DEFAULT_MAX_WORKERS = 4
+
+CODE_BLOCK_RE = re.compile(r"```.*?```", re.DOTALL)
+DIMENSION_TARGET_RE = re.compile(r"(?:TABLE|INTO|VIEW|models/)\s*(?:IF NOT EXISTS\s+)?[\"`]?(dim_\w+)", re.IGNORECASE)
+STATEMENT_KIND_RE = re.compile(r"\b(CREATE|INSERT|MERGE|SELECT)\b", re.IGNORECASE)
+
+
+@attr.s(auto_attribs=True, kw_only=True)
+class TableChunk:
+    tables: list[CatalogDeclarativeTable]
+    # Generated separately, the chunk only references them
+    shared_tables: list[CatalogDeclarativeTable] = attr.Factory(list)
+    # The chunk generates the shared dimensions
+    is_shared: bool = False
+
+    @property
+    def columns(self) -> int:
+        return sum(len(t.columns) for t in self.tables)
+
+
+def table_key(table: CatalogDeclarativeTable) -> str:
+    return table.path[-1].lower()
+
+
+def dimension_name(table: CatalogDeclarativeTable) -> str:
+    return f"dim_{table_key(table)}"
+
+
+def table_references(tables: list[CatalogDeclarativeTable]) -> dict[str, set[str]]:
+    """Table ID -> IDs of referenced tables, by declared foreign keys or by <table>_id column names."""
+    by_id = {t.id: t for t in tables}
+    by_name: dict[str, str] = {}
+    for table in tables:
+        name = table_key(table)
+        by_name.setdefault(name, table.id)
+        # customers.customer_id, categories.category_id
+        by_name.setdefault(re.sub(r"ies$", "y", name), table.id)
+        by_name.setdefault(name.rstrip("s"), table.id)
+    references: dict[str, set[str]] = {t.id: set() for t in tables}
+    for table in tables:
+        for column in table.columns:
+            target = column.referenced_table_id if column.referenced_table_id in by_id else None
+            if target is None and column.name.lower().endswith("_id"):
+                target = by_name.get(column.name.lower()[:-3])
+            if target is not None and target != table.id:
+                references[table.id].add(target)
+    return references
+
+
+def connected_components(tables: list[CatalogDeclarativeTable], references: dict[str, set[str]]) -> list[list[str]]:
+    parents = {t.id: t.id for t in tables}
+
+    def find(table_id: str) -> str:
+        while parents[table_id] != table_id:
+            parents[table_id] = parents[parents[table_id]]
+            table_id = parents[table_id]
+        return table_id
+
+    for table_id, targets in references.items():
+        for target in targets:
+            parents[find(table_id)] = find(target)
+    components = defaultdict(list)
+    for table in tables:
+        components[find(table.id)].append(table.id)
+    return list(components.values())
+
+
+def cluster_tables(tables: list[CatalogDeclarativeTable], max_columns: int = DEFAULT_CHUNK_COLUMNS) -> list[TableChunk]:
+    """
+    Split tables into prompt-sized chunks. Tables related by foreign keys stay together where the budget allows,
+    components are ordered by name, so tables with a common prefix end up in the same chunk.
+    Tables referenced across chunks are moved to shared chunks, their dimensions are generated once.
+    """
+    by_id = {t.id: t for t in tables}
+    references = table_references(tables)
+    components = sorted(connected_components(tables, references), key=lambda c: min(table_key(by_id[i]) for i in c))
+
+    chunks: list[list[CatalogDeclarativeTable]] = [[]]
+    columns = 0
+    for component in components:
+        # Referenced tables first, then by name
+        ordered = sorted(component, key=lambda i: (-sum(i in references[o] for o in component), table_key(by_id[i])))
+        for table_id in ordered:
+            table = by_id[table_id]
+            if chunks[-1] and columns + len(table.columns) > max_columns:
+                chunks.append([])
+                columns = 0
+            chunks[-1].append(table)
+            columns += len(table.columns)
+
+    chunk_of = {t.id: n for n, chunk in enumerate(chunks) for t in chunk}
+    # Only dimension-like tables (referencing no other table) are shared, fact tables stay in their chunks
+    shared_ids = {
+        target
+        for table_id, targets in references.items()
+        for target in targets
+        if chunk_of[target] != chunk_of[table_id] and not references[target]
+    }
+    result = []
+    for chunk in chunks:
+        own = [t for t in chunk if t.id not in shared_ids]
+        if own:
+            referenced = {target for t in own for target in references[t.id] if target in shared_ids}
+            result.append(TableChunk(tables=own, shared_tables=[by_id[i] for i in sorted(referenced)]))
+    shared = [by_id[i] for i in sorted(shared_ids, key=lambda i: table_key(by_id[i]))]
+    shared_chunk: list[CatalogDeclarativeTable] = []
+    for table in shared:
+        if shared_chunk and sum(len(t.columns) for t in shared_chunk) + len(table.columns) > max_columns:
+            result.append(TableChunk(tables=shared_chunk, is_shared=True))
+            shared_chunk = []
+        shared_chunk.append(table)
+    if shared_chunk:
+        result.append(TableChunk(tables=shared_chunk, is_shared=True))
+    return result
+
+
+def dimension_target(block: str) -> Optional[tuple[str, str]]:
+    """(dimension table, statement kind) created by a code block, None if it is not a dimension."""
+    target = DIMENSION_TARGET_RE.search(block)
+    if target is None:
+        return None
+    kind = STATEMENT_KIND_RE.search(block)
+    return target.group(1).lower(), kind.group(1).upper() if kind else ""
+
+
+class DimensionMerger:
+    """Reduce step, keeps the first definition of every dimension, later duplicates from other chunks are dropped."""
+
+    def __init__(self) -> None:
+        self.emitted: set[tuple[str, str]] = set()
+
+    def merge(self, section: str) -> str:
+        produced: set[tuple[str, str]] = set()
+
+        def replace(match: re.Match) -> str:
+            target = dimension_target(match.group(0))
+            if target is not None and target in self.emitted:
+                return f"<!-- {target[0]} is defined above -->"
+            if target is not None:
+                produced.add(target)
+            return match.group(0)
+
+        merged = CODE_BLOCK_RE.sub(replace, section)
+        self.emitted |= produced
+        return merged
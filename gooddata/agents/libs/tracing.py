@@ -0,0 +1,473 @@
+import asyncio
+import json
+import os
+import random
+import threading
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from time import time_ns
+from typing import Any, Optional
+
+import httpx
+
+from gooddata.tools import TMP_DIR, create_dir
+
+# Comma separated exporters enabling tracing, e.g. "jsonl,prometheus", unset or empty disables it
+TRACING_ENV = "GOODDATA_TRACING"
+TRACES_PATH_ENV = "GOODDATA_TRACES_PATH"
+PROMETHEUS_PORT_ENV = "GOODDATA_PROMETHEUS_PORT"
+OTLP_ENDPOINT_ENV = "OTEL_EXPORTER_OTLP_TRACES_ENDPOINT"
+SERVICE_NAME_ENV = "OTEL_SERVICE_NAME"
+DEFAULT_TRACES_PATH = TMP_DIR / "traces.jsonl"
+DEFAULT_PROMETHEUS_PORT = 9464
+DEFAULT_OTLP_ENDPOINT = "http://localhost:4318/v1/traces"
+DEFAULT_SERVICE_NAME = "gooddata-agents"
+OTLP_BATCH_SIZE = 512
+# Seconds, from fast cache hits to slow LLM calls and report executions
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SPAN_DURATION_METRIC = "gooddata_span_duration_seconds"
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: dict[str, Any]) -> None:
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent is not None else None
+        self.start_ns = time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    @property
+    def is_recording(self) -> bool:
+        return True
+
+    @property
+    def duration(self) -> float:
+        return ((self.end_ns or time_ns()) - self.start_ns) / 1e9
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration": self.duration,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Returned when tracing is disabled, callers set attributes unconditionally."""
+
+    is_recording = False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, **attributes: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _NoopSpanContext:
+    def __enter__(self) -> _NoopSpan:
+        return NOOP_SPAN
+
+    def __exit__(self, *exc_info) -> None:
+        return None
+
+
+_NOOP_SPAN_CONTEXT = _NoopSpanContext()
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = DURATION_BUCKETS) -> None:
+        self.buckets = buckets
+        # The last count is the +Inf bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels_key(labels: dict[str, Any]) -> tuple[tuple[str, str], ...]:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in labels] + ([extra] if extra else [])
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class MetricsRegistry:
+    """In-process histograms and counters, rendered in the Prometheus text format."""
+
+    def __init__(self) -> None:
+        self.histograms: dict[tuple[str, tuple], Histogram] = {}
+        self.counters: dict[tuple[str, tuple], float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        key = (name, _labels_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def increment(self, name: str, value: float = 1, **labels: Any) -> None:
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def get_histogram(self, name: str, **labels: Any) -> Optional[Histogram]:
+        return self.histograms.get((name, _labels_key(labels)))
+
+    def to_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            names = set()
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                if name not in names:
+                    names.add(name)
+                    lines.append(f"# TYPE {name} histogram")
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    bucket_labels = _format_labels(labels, f'le="{bound}"')
+                    lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                inf_labels = _format_labels(labels, 'le="+Inf"')
+                lines.append(f"{name}_bucket{inf_labels} {histogram.count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in names:
+                    names.add(name)
+                    lines.append(f"# TYPE {name} counter")
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+
+class SpanExporter:
+    def export(self, span: Span) -> None:
+        pass
+
+    def shutdown(self) -> None:
+        pass
+
+
+class JsonlSpanExporter(SpanExporter):
+    """One JSON per finished span, appended to a file."""
+
+    def __init__(self, path: Path = DEFAULT_TRACES_PATH) -> None:
+        create_dir(Path(path).parent)
+        self._fp = open(path, "a")
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.as_dict(), default=str)
+        with self._lock:
+            self._fp.write(line + "\n")
+            self._fp.flush()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._fp.close()
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpSpanExporter(SpanExporter):
+    """
+    Sends spans in batches to an OpenTelemetry collector, OTLP/HTTP with JSON encoding.
+    Requests are sent by a worker thread, failures are logged and the batch is dropped.
+    """
+
+    def __init__(
+        self,
+        endpoint: str = DEFAULT_OTLP_ENDPOINT,
+        service_name: str = DEFAULT_SERVICE_NAME,
+        batch_size: int = OTLP_BATCH_SIZE,
+    ) -> None:
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self._client = httpx.Client(timeout=10)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="otlp_export")
+        self._batch: list[Span] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def to_otlp(span: Span) -> dict:
+        otlp_span = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            # SPAN_KIND_INTERNAL
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()],
+            # STATUS_CODE_ERROR or STATUS_CODE_UNSET
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 0},
+        }
+        if span.parent_id:
+            otlp_span["parentSpanId"] = span.parent_id
+        return otlp_span
+
+    def payload(self, spans: list[Span]) -> dict:
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [{"key": "service.name", "value": _otlp_value(self.service_name)}]},
+                    "scopeSpans": [{"scope": {"name": __name__}, "spans": [self.to_otlp(s) for s in spans]}],
+                }
+            ]
+        }
+
+    def _send(self, spans: list[Span]) -> None:
+        try:
+            self._client.post(self.endpoint, json=self.payload(spans)).raise_for_status()
+        except httpx.HTTPError as e:
+            print(f"Export of {len(spans)} spans to {self.endpoint} failed: {e}")
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._batch.append(span)
+            if len(self._batch) < self.batch_size:
+                return
+            spans, self._batch = self._batch, []
+        self._executor.submit(self._send, spans)
+
+    def flush(self) -> None:
+        with self._lock:
+            spans, self._batch = self._batch, []
+        if spans:
+            self._executor.submit(self._send, spans)
+
+    def shutdown(self) -> None:
+        self.flush()
+        self._executor.shutdown(wait=True)
+        self._client.close()
+
+
+class PrometheusExporter(SpanExporter):
+    """Serves the metrics registry in the Prometheus text format on /metrics, spans themselves are not exported."""
+
+    def __init__(self, metrics: MetricsRegistry, port: int = DEFAULT_PROMETHEUS_PORT) -> None:
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:  # noqa: N802
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(("", port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="prometheus", daemon=True).start()
+        print(f"Prometheus metrics served on port {port}")
+
+    def shutdown(self) -> None:
+        self._server.shutdown()
+
+
+class _SpanContext:
+    __slots__ = ("tracer", "name", "attributes", "span", "token")
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: dict[str, Any]) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self) -> Span:
+        self.span = Span(self.name, self.tracer.current_span.get(), self.attributes)
+        self.token = self.tracer.current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.tracer.current_span.reset(self.token)
+        if exc_value is not None:
+            self.span.error = f"{exc_type.__name__}: {exc_value}"
+        self.tracer.finish(self.span)
+
+
+class Tracer:
+    """
+    Nested spans, the parent is the innermost open span of the current thread or asyncio task.
+    Durations of all spans are recorded into the metrics registry, finished spans are passed to exporters.
+    Disabled tracer returns a shared no-op span, the only cost is one attribute check.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.exporters: list[SpanExporter] = []
+        self.metrics = MetricsRegistry()
+        self.current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+    def span(self, name: str, **attributes: Any):
+        if not self.enabled:
+            return _NOOP_SPAN_CONTEXT
+        return _SpanContext(self, name, attributes)
+
+    def start_span(self, name: str, **attributes: Any):
+        """Span which is not made current, for async generators resumed in different contexts."""
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(name, self.current_span.get(), attributes)
+
+    def finish(self, span: Span) -> None:
+        span.end_ns = time_ns()
+        self.metrics.observe(SPAN_DURATION_METRIC, span.duration, span=span.name)
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception as e:
+                print(f"Export of span {span.name} by {type(exporter).__name__} failed: {e}")
+
+    def get_current_span(self):
+        return (self.current_span.get() or NOOP_SPAN) if self.enabled else NOOP_SPAN
+
+    def configure(self, exporters: list[SpanExporter]) -> None:
+        self.shutdown()
+        self.exporters = exporters
+        self.enabled = True
+
+    def shutdown(self) -> None:
+        for exporter in self.exporters:
+            exporter.shutdown()
+        self.exporters = []
+        self.enabled = False
+
+
+_tracer = Tracer()
+_configure_lock = threading.Lock()
+_configured = False
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def create_exporter(name: str) -> SpanExporter:
+    if name == "jsonl":
+        return JsonlSpanExporter(Path(os.getenv(TRACES_PATH_ENV, DEFAULT_TRACES_PATH)))
+    elif name == "prometheus":
+        return PrometheusExporter(_tracer.metrics, int(os.getenv(PROMETHEUS_PORT_ENV, DEFAULT_PROMETHEUS_PORT)))
+    elif name == "otlp":
+        return OtlpSpanExporter(
+            os.getenv(OTLP_ENDPOINT_ENV, DEFAULT_OTLP_ENDPOINT), os.getenv(SERVICE_NAME_ENV, DEFAULT_SERVICE_NAME)
+        )
+    else:
+        raise ValueError(f"Unknown tracing exporter {name}, supported are jsonl, prometheus and otlp")
+
+
+def configure_tracing(exporters: Optional[list[str]] = None) -> Tracer:
+    """
+    Enable tracing with exporters listed in the GOODDATA_TRACING environment variable, or the given ones.
+    Configured once per process, later calls are no-op, Streamlit reruns must not start another HTTP server.
+    """
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return _tracer
+        _configured = True
+        if exporters is None:
+            exporters = [e.strip().lower() for e in os.getenv(TRACING_ENV, "").split(",") if e.strip()]
+        if exporters:
+            _tracer.configure([create_exporter(e) for e in exporters])
+            print(f"Tracing enabled, exporters: {', '.join(exporters)}")
+        return _tracer
+
+
+def span(name: str, **attributes: Any):
+    """Context manager of a nested span, e.g. with span("vector_search", workspace=ws) as s: s.set_attribute(...)"""
+    if not _tracer.enabled:
+        return _NOOP_SPAN_CONTEXT
+    return _SpanContext(_tracer, name, attributes)
+
+
+def current_span():
+    return _tracer.get_current_span()
+
+
+def start_span(name: str, **attributes: Any):
+    return _tracer.start_span(name, **attributes)
+
+
+def end_span(span) -> None:
+    if span.is_recording:
+        _tracer.finish(span)
+
+
+def traced(func=None, *, name: Optional[str] = None):
+    """
+    Decorator recording a span around every call, the span name is the qualified function name by default.
+    Use @traced or @traced(name="..."), works with both sync and async functions.
+    """
+
+    def decorate(f):
+        span_name = name or f.__qualname__
+        if asyncio.iscoroutinefunction(f):
+
+            @wraps(f)
+            async def async_wrapper(*args, **kwargs):
+                if not _tracer.enabled:
+                    return await f(*args, **kwargs)
+                with _SpanContext(_tracer, span_name, {}):
+                    return await f(*args, **kwargs)
+
+            return async_wrapper
+
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if not _tracer.enabled:
+                return f(*args, **kwargs)
+            with _SpanContext(_tracer, span_name, {}):
+                return f(*args, **kwargs)
+
+        return wrapper
+
+    return decorate(func) if func is not None else decorate
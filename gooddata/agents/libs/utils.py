@@ -1,25 +1,66 @@
+import asyncio
 import os
-from functools import wraps
+import threading
 from pathlib import Path
-from time import perf_counter
+from typing import AsyncIterator, Iterator, Optional, TypeVar
+
+import duckdb
+
+from gooddata.tools import create_dir
+
+T = TypeVar("T")
 
 DEBUG_PATH = Path("tmp")
 PROMPT_PATH = Path("prompts")
 
 
-def timeit(func):
-    @wraps(func)
-    def timeit_wrapper(*args, **kwargs):
-        final_func_name = func.__name__
-        print(f"Function {final_func_name} started")
-        start_time = perf_counter()
-        result = func(*args, **kwargs)
-        end_time = perf_counter()
-        total_time = end_time - start_time
-        print(f"Function {final_func_name} took {total_time:.4f} seconds")
-        return result
+def connect_cache_db(db_path: Path) -> duckdb.DuckDBPyConnection:
+    """
+    DuckDB lets only one process open a file. A cache file locked by another process (e.g. another Streamlit app)
+    is replaced by an in-memory DB, still shared by all agents of this process.
+    """
+    if str(db_path) != ":memory:":
+        create_dir(Path(db_path).parent)
+        try:
+            return duckdb.connect(str(db_path))
+        except duckdb.IOException as e:
+            print(f"Cache {db_path} is locked by another process, using an in-memory cache: {e}")
+    return duckdb.connect(":memory:")
+
+
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_loop_lock = threading.Lock()
+
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """Process-wide event loop running in a daemon thread, async clients pooled on it survive Streamlit reruns."""
+    global _background_loop
+    with _background_loop_lock:
+        if _background_loop is None:
+            _background_loop = asyncio.new_event_loop()
+            threading.Thread(target=_background_loop.run_forever, name="async-loop", daemon=True).start()
+        return _background_loop
+
+
+def iterate_sync(items: AsyncIterator[T]) -> Iterator[T]:
+    """
+    Consume an async iterator from synchronous code, e.g. a Streamlit script.
+    Items are yielded as soon as they arrive, so callers can render them incrementally.
+    """
+    loop = get_background_loop()
+
+    async def next_item() -> T:
+        return await items.__anext__()
 
-    return timeit_wrapper
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(next_item(), loop).result()
+            except StopAsyncIteration:
+                return
+    finally:
+        if hasattr(items, "aclose"):
+            asyncio.run_coroutine_threadsafe(items.aclose(), loop).result()
 
 
 def debug_to_file(file_name: str, content: str, folder: Path = None) -> None:
@@ -0,0 +1,86 @@
+import json
+from typing import Any, Iterable, Optional
+
+from langchain_community.vectorstores import DuckDB
+from langchain_core.documents import Document
+
+from gooddata.agents.libs.tracing import span
+from gooddata.agents.libs.vector_stores.search_filter import SearchFilter, members_table_name
+
+SCORE_KEY = "_similarity"
+
+
+class CustomDuckDB(DuckDB):
+    """
+    DuckDB vector store applying metadata filters in SQL WHERE before the distance is computed,
+    so only matching rows are scored. Similarity is returned in metadata like by other stores.
+    Workspace membership of rows of the org-level shared table is kept in a side table.
+    """
+
+    @property
+    def members_table(self) -> str:
+        return members_table_name(self._table_name)
+
+    def _ensure_members_table(self) -> None:
+        self._connection.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS "{self.members_table}" (
+                workspace_id VARCHAR, id VARCHAR, PRIMARY KEY (workspace_id, id)
+            );
+            """
+        )
+
+    def update_members(self, workspace_id: str, added: list[str], removed: list[str]) -> None:
+        self._ensure_members_table()
+        self._connection.execute(
+            f"""INSERT OR IGNORE INTO "{self.members_table}" SELECT ?, unnest(?::VARCHAR[]);""", [workspace_id, added]
+        )
+        self._connection.execute(
+            f"""DELETE FROM "{self.members_table}" WHERE workspace_id = ? AND list_contains(?::VARCHAR[], id);""",
+            [workspace_id, removed],
+        )
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[list[dict]] = None, **kwargs: Any) -> list[str]:
+        workspaces = kwargs.pop("workspaces", None)
+        ids = super().add_texts(texts, metadatas, **kwargs)
+        for workspace_id in workspaces or []:
+            self.update_members(workspace_id, ids, [])
+        return ids
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[SearchFilter] = None, **kwargs: Any
+    ) -> list[tuple[Document, float]]:
+        embedding = self._embedding.embed_query(query)
+        where = ""
+        params: list[Any] = []
+        if filter is not None and not filter.is_empty:
+            if filter.member_of is not None:
+                self._ensure_members_table()
+            where_sql, params = filter.to_duckdb_where(members_table=self.members_table)
+            where = f"WHERE {where_sql}"
+        with span("vector_search", backend="DuckDB", k=k) as search_span:
+            rows = self._connection.execute(
+                f"""
+                SELECT {self._text_key}, metadata, list_cosine_similarity({self._vector_key}, ?::FLOAT[]) AS similarity
+                FROM {self._table_name}
+                {where}
+                ORDER BY similarity DESC
+                LIMIT ?;
+                """,
+                [embedding, *params, k],
+            ).fetchall()
+            search_span.set_attribute("documents", len(rows))
+        result = []
+        for text, metadata, similarity in rows:
+            metadata = json.loads(metadata) if metadata else {}
+            result.append((Document(page_content=text, metadata={**metadata, SCORE_KEY: similarity}), similarity))
+        return result
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[SearchFilter] = None, **kwargs: Any
+    ) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter=filter, **kwargs)]
+
+    def _select_relevance_score_fn(self):
+        # Scores are already cosine similarities
+        return lambda score: score
@@ -1,4 +1,5 @@
-from typing import Any, ClassVar, Collection
+import uuid
+from typing import Any, ClassVar, Collection, Iterable, Optional, Union
 
 from langchain_community.vectorstores import LanceDB
 from langchain_core.callbacks import CallbackManagerForRetrieverRun
@@ -6,7 +7,15 @@ from langchain_core.documents import Document
 from langchain_core.pydantic_v1 import Field
 from langchain_core.vectorstores import VectorStore, VectorStoreRetriever
 
-EXCLUDED_METADATA = ["vector"]
+from gooddata.agents.libs.tracing import span
+from gooddata.agents.libs.vector_stores.search_filter import MEMBERSHIP_COLUMN, SearchFilter, sql_string
+
+# Workspaces of shared rows must not leak into results of other workspaces
+EXCLUDED_METADATA = ["vector", MEMBERSHIP_COLUMN]
+DISTANCE_KEY = "_distance"
+DEFAULT_K = 4
+# Limit length of IN (...) lists in membership updates
+UPDATE_BATCH_SIZE = 1000
 
 
 class LanceDBRetriever(VectorStoreRetriever):
@@ -28,26 +37,107 @@ class LanceDBRetriever(VectorStoreRetriever):
     )
 
     def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
-        if self.search_type == "similarity":
-            docs = self.vectorstore.similarity_search(query, **self.search_kwargs)
-        elif self.search_type == "similarity_score_threshold":
-            docs_and_similarities = self.vectorstore.similarity_search_with_relevance_scores(
-                query, **self.search_kwargs
-            )
-            docs = [doc for doc, _ in docs_and_similarities]
-        elif self.search_type == "mmr":
-            docs = self.vectorstore.max_marginal_relevance_search(query, **self.search_kwargs)
-        else:
-            raise ValueError(f"search_type of {self.search_type} not allowed.")
-
+        # Includes the query embedding, LanceDB embeds the query itself
+        with span("vector_search", backend="LanceDB", k=self.search_kwargs.get("k")) as search_span:
+            if self.search_type == "similarity":
+                docs = self.vectorstore.similarity_search(query, **self.search_kwargs)
+            elif self.search_type == "similarity_score_threshold":
+                docs_and_similarities = self.vectorstore.similarity_search_with_relevance_scores(
+                    query, **self.search_kwargs
+                )
+                docs = [doc for doc, _ in docs_and_similarities]
+            elif self.search_type == "mmr":
+                docs = self.vectorstore.max_marginal_relevance_search(query, **self.search_kwargs)
+            else:
+                raise ValueError(f"search_type of {self.search_type} not allowed.")
+            search_span.set_attribute("documents", len(docs))
+        # CustomLanceDB drops the vectors, other LanceDB stores may not
         for doc in docs:
             for excl in EXCLUDED_METADATA:
-                del doc.metadata[excl]
-
+                doc.metadata.pop(excl, None)
         return docs
 
 
 class CustomLanceDB(LanceDB):
+    """
+    LanceDB vector store applying metadata filters before the vector search (prefilter),
+    so a selective filter still returns k matching documents.
+    Rows of the org-level shared table carry workspaces referencing them in a LABEL_LIST indexed column.
+    """
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[list[dict]] = None,
+        ids: Optional[list[str]] = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        workspaces = kwargs.pop("workspaces", None)
+        if workspaces is None:
+            return super().add_texts(texts, metadatas, ids, **kwargs)
+        texts = list(texts)
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        embeddings = self._embedding.embed_documents(texts)
+        rows = [
+            {
+                self._vector_key: embedding,
+                self._id_key: row_id,
+                self._text_key: text,
+                "metadata": metadatas[idx] if metadatas else {"id": row_id},
+                MEMBERSHIP_COLUMN: list(workspaces),
+            }
+            for idx, (text, embedding, row_id) in enumerate(zip(texts, embeddings, ids))
+        ]
+        if self._table_name in self._connection.table_names():
+            self._connection.open_table(self._table_name).add(rows, mode=self.mode)
+        else:
+            self._connection.create_table(self._table_name, data=rows)
+        return ids
+
+    def _update_members(self, ids: list[str], values_sql: str) -> None:
+        for i in range(0, len(ids), UPDATE_BATCH_SIZE):
+            values = ", ".join(sql_string(row_id) for row_id in ids[i : i + UPDATE_BATCH_SIZE])
+            self.get_table().update(where=f"{self._id_key} IN ({values})", values_sql={MEMBERSHIP_COLUMN: values_sql})
+
+    def update_members(self, workspace_id: str, added: list[str], removed: list[str]) -> None:
+        """Add/remove the workspace to/from existing rows and index the membership column."""
+        self._update_members(added, f"array_append({MEMBERSHIP_COLUMN}, {sql_string(workspace_id)})")
+        self._update_members(removed, f"array_remove({MEMBERSHIP_COLUMN}, {sql_string(workspace_id)})")
+        if self._table_name in self._connection.table_names():
+            # Rows written after the index was built would be scanned
+            self.get_table().create_scalar_index(MEMBERSHIP_COLUMN, index_type="LABEL_LIST", replace=True)
+
+    @staticmethod
+    def _where(filter: Union[SearchFilter, str, None]) -> Optional[str]:
+        if isinstance(filter, SearchFilter):
+            return filter.to_lance_where() or None
+        return filter
+
+    def similarity_search_with_score(
+        self, query: str, k: Optional[int] = None, filter: Union[SearchFilter, str, None] = None, **kwargs: Any
+    ) -> list[tuple[Document, float]]:
+        # LangChain's LanceDB post-filters the top k (or ignores the filter), so the query is built here
+        kwargs.setdefault("prefilter", True)
+        embedding = self._embedding.embed_query(query)
+        search = self.get_table().search(embedding, vector_column_name=self._vector_key).limit(k or DEFAULT_K)
+        if (where := self._where(filter)) is not None:
+            search = search.where(where, prefilter=kwargs["prefilter"])
+        rows = search.to_arrow()
+        # Vectors must not get into the LLM prompt, whichever retriever uses the store
+        columns = [c for c in rows.schema.names if c != self._text_key and c not in EXCLUDED_METADATA]
+        result = []
+        for idx in range(len(rows)):
+            metadata = {c: rows[c][idx].as_py() for c in columns}
+            result.append(
+                (Document(page_content=rows[self._text_key][idx].as_py(), metadata=metadata), metadata[DISTANCE_KEY])
+            )
+        return result
+
+    def similarity_search(
+        self, query: str, k: Optional[int] = None, filter: Union[SearchFilter, str, None] = None, **kwargs: Any
+    ) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter=filter, **kwargs)]
+
     def as_retriever(self, **kwargs: Any) -> VectorStoreRetriever:
         tags = kwargs.pop("tags", None) or []
         tags.extend(self._get_retriever_tags())
@@ -0,0 +1,455 @@
+import json
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from gooddata.agents.libs.tracing import span
+from gooddata.agents.libs.vector_stores.search_filter import SearchFilter
+
+SCORE_KEY = "_similarity"
+SEGMENT_PREFIX = "segment_"
+DELETED_FILE = "deleted.json"
+# Workspace -> IDs of its rows in the org-level shared table
+MEMBERS_FILE = "members.json"
+ROW_ID_COLUMN = "__row_id"
+IVF_CENTROIDS_FILE = "ivf_centroids.npy"
+IVF_ASSIGNMENTS_FILE = "ivf_assignments.npy"
+# Exact search is fast enough for catalog-sized tables, IVF pays off only for really large ones
+IVF_MIN_ROWS = 100_000
+DEFAULT_IVF_PROBES = 8
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_SIZE = 50_000
+# Compact when tombstones exceed this ratio of rows
+MAX_DELETED_RATIO = 0.1
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return (vectors / norms).astype(np.float32)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indexes of k highest scores, ordered from the highest. Full sort is avoided by argpartition."""
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k >= len(scores):
+        return np.argsort(-scores)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+class IVFIndex:
+    """
+    Inverted file index: rows are clustered by k-means, a query scores only rows of its nearest clusters.
+    Approximate, recall is controlled by the number of probed clusters.
+    """
+
+    def __init__(self, centroids: np.ndarray, assignments: np.ndarray) -> None:
+        self.centroids = centroids
+        self.assignments = assignments
+        self.order = np.argsort(assignments, kind="stable")
+        self.offsets = np.searchsorted(assignments[self.order], np.arange(len(centroids) + 1))
+
+    @classmethod
+    def build(cls, matrix: np.ndarray, n_lists: Optional[int] = None, seed: int = 0) -> "IVFIndex":
+        n_lists = n_lists or int(np.sqrt(len(matrix)))
+        rng = np.random.default_rng(seed)
+        sample = matrix[rng.choice(len(matrix), min(len(matrix), KMEANS_SAMPLE_SIZE), replace=False)]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+        for _ in range(KMEANS_ITERATIONS):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for i in range(n_lists):
+                members = sample[labels == i]
+                if len(members):
+                    centroids[i] = members.mean(axis=0)
+            centroids = normalize(centroids)
+        assignments = np.concatenate(
+            [np.argmax(matrix[i : i + 10_000] @ centroids.T, axis=1) for i in range(0, len(matrix), 10_000)]
+        )
+        return cls(centroids, assignments.astype(np.int32))
+
+    def candidates(self, query: np.ndarray, n_probes: int) -> np.ndarray:
+        probes = top_k(self.centroids @ query, n_probes)
+        return np.concatenate([self.order[self.offsets[p] : self.offsets[p + 1]] for p in probes])
+
+    def save(self, path: Path) -> None:
+        np.save(path / IVF_CENTROIDS_FILE, self.centroids)
+        np.save(path / IVF_ASSIGNMENTS_FILE, self.assignments)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["IVFIndex"]:
+        if not os.path.isfile(path / IVF_CENTROIDS_FILE):
+            return None
+        return cls(np.load(path / IVF_CENTROIDS_FILE), np.load(path / IVF_ASSIGNMENTS_FILE))
+
+
+class NumpyTable:
+    """
+    Vectors are stored as a contiguous float32 matrix in a memory-mapped .npy file,
+    normalized at write time, so cosine similarity is a plain dot product.
+    IDs, texts and metadata are stored in a sidecar JSON array in the same row order.
+
+    Every add writes a new segment and deletes are recorded as tombstones, so writes cost O(batch).
+    Segments are compacted into one matrix (and the IVF index is rebuilt) on the first read after writes.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.matrix: Optional[np.ndarray] = None
+        self.records: list[dict] = []
+        # Tombstones: ID -> number of the last segment in which rows of the ID are deleted
+        self.deleted: dict[str, int] = {}
+        # Loaded apart from segments, membership changes do not trigger compaction
+        self.members: Optional[dict[str, set[str]]] = None
+        self.ivf: Optional[IVFIndex] = None
+        self._id_to_row: dict[str, int] = {}
+        # Metadata columns used by filters, built lazily
+        self._columns: dict[str, np.ndarray] = {}
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    def _segment_names(self) -> list[str]:
+        return sorted(p.stem for p in self.path.glob(f"{SEGMENT_PREFIX}*.npy"))
+
+    @staticmethod
+    def _segment_number(name: str) -> int:
+        return int(name[len(SEGMENT_PREFIX) :])
+
+    def _next_segment_name(self) -> str:
+        names = self._segment_names()
+        last = self._segment_number(names[-1]) if names else -1
+        return f"{SEGMENT_PREFIX}{last + 1:08d}"
+
+    def _write_segment(self, name: str, vectors: np.ndarray, records: list[dict]) -> None:
+        with open(self.path / f"{name}.json", "w") as fp:
+            json.dump(records, fp)
+        # Vectors last, segment is visible only when its .npy exists
+        with open(self.path / f"{name}.tmp", "wb") as fp:
+            np.save(fp, vectors)
+        os.replace(self.path / f"{name}.tmp", self.path / f"{name}.npy")
+
+    def _save_deleted(self) -> None:
+        with open(self.path / DELETED_FILE, "w") as fp:
+            json.dump(self.deleted, fp)
+
+    def _save_members(self) -> None:
+        with open(self.path / f"{MEMBERS_FILE}.tmp", "w") as fp:
+            json.dump({ws: sorted(ids) for ws, ids in self.members.items()}, fp)
+        os.replace(self.path / f"{MEMBERS_FILE}.tmp", self.path / MEMBERS_FILE)
+
+    def _load_members(self) -> dict[str, set[str]]:
+        if self.members is None:
+            self.members = {}
+            if os.path.isfile(self.path / MEMBERS_FILE):
+                with open(self.path / MEMBERS_FILE) as fp:
+                    self.members = {ws: set(ids) for ws, ids in json.load(fp).items()}
+        return self.members
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        if os.path.isfile(self.path / DELETED_FILE):
+            with open(self.path / DELETED_FILE) as fp:
+                self.deleted = json.load(fp)
+        self.members = None
+        names = self._segment_names()
+        if len(names) > 1 or (self.deleted and len(self.deleted) > MAX_DELETED_RATIO * self._row_count(names)):
+            with span("vector_store.compact", backend="NumPy", segments=len(names)):
+                self._compact(names)
+            names = self._segment_names()
+        if names:
+            self.matrix = np.load(self.path / f"{names[0]}.npy", mmap_mode="r")
+            with open(self.path / f"{names[0]}.json") as fp:
+                self.records = json.load(fp)
+        else:
+            self.matrix = None
+            self.records = []
+        self._id_to_row = {r["id"]: i for i, r in enumerate(self.records)}
+        self._columns = {}
+        self.ivf = None
+        if self.matrix is not None and len(self.matrix) >= IVF_MIN_ROWS:
+            self.ivf = IVFIndex.load(self.path)
+            if self.ivf is None:
+                self.ivf = IVFIndex.build(self.matrix)
+                self.ivf.save(self.path)
+        self._loaded = True
+
+    def _row_count(self, names: list[str]) -> int:
+        return sum(np.load(self.path / f"{n}.npy", mmap_mode="r").shape[0] for n in names)
+
+    def _compact(self, names: list[str]) -> None:
+        vectors = []
+        records = []
+        # Latest occurrence of an ID wins, rows deleted after they were written are dropped
+        latest: dict[str, tuple[int, int]] = {}
+        segments = []
+        for segment_index, name in enumerate(names):
+            with open(self.path / f"{name}.json") as fp:
+                segment_records = json.load(fp)
+            segments.append(segment_records)
+            segment_number = self._segment_number(name)
+            for row, record in enumerate(segment_records):
+                if self.deleted.get(record["id"], -1) < segment_number:
+                    latest[record["id"]] = (segment_index, row)
+                else:
+                    latest.pop(record["id"], None)
+        for segment_index, name in enumerate(names):
+            keep = [row for row, r in enumerate(segments[segment_index]) if latest.get(r["id"]) == (segment_index, row)]
+            vectors.append(np.load(self.path / f"{name}.npy", mmap_mode="r")[keep])
+            records.extend(segments[segment_index][row] for row in keep)
+        matrix = np.concatenate(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+        new_name = self._next_segment_name()
+        self._write_segment(new_name, matrix, records)
+        for name in names:
+            os.remove(self.path / f"{name}.npy")
+            os.remove(self.path / f"{name}.json")
+        self.deleted = {}
+        self._save_deleted()
+        # Rows changed, IVF index is rebuilt on load
+        for file_name in (IVF_CENTROIDS_FILE, IVF_ASSIGNMENTS_FILE):
+            if os.path.isfile(self.path / file_name):
+                os.remove(self.path / file_name)
+
+    def add(self, ids: list[str], texts: list[str], vectors: list[list[float]], metadatas: list[dict]) -> None:
+        if not ids:
+            return
+        with self._lock:
+            self.path.mkdir(parents=True, exist_ok=True)
+            records = [{"id": i, "text": t, "metadata": m} for i, t, m in zip(ids, texts, metadatas)]
+            self._write_segment(self._next_segment_name(), normalize(np.asarray(vectors, dtype=np.float32)), records)
+            self._loaded = False
+
+    def delete(self, ids: list[str]) -> None:
+        with self._lock:
+            self._load()
+            names = self._segment_names()
+            if not names:
+                return
+            # Loaded table is compacted into a single segment
+            segment_number = self._segment_number(names[-1])
+            self.deleted.update({i: segment_number for i in ids if i in self._id_to_row})
+            self._save_deleted()
+            self._loaded = False
+
+    def update_members(self, workspace_id: str, added: list[str], removed: list[str]) -> None:
+        with self._lock:
+            self.path.mkdir(parents=True, exist_ok=True)
+            members = self._load_members()
+            ids = members.setdefault(workspace_id, set())
+            ids.update(added)
+            ids.difference_update(removed)
+            if not ids:
+                del members[workspace_id]
+            self._save_members()
+            self._columns.pop(f"{ROW_ID_COLUMN}:{workspace_id}", None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._load()
+            return len(self.records) - len(self.deleted)
+
+    def _column(self, key: str) -> np.ndarray:
+        if key not in self._columns:
+            self._columns[key] = np.array([str(r["metadata"].get(key, "")) for r in self.records])
+        return self._columns[key]
+
+    def _row_ids(self) -> np.ndarray:
+        if ROW_ID_COLUMN not in self._columns:
+            self._columns[ROW_ID_COLUMN] = np.array([r["id"] for r in self.records])
+        return self._columns[ROW_ID_COLUMN]
+
+    def _member_rows(self, workspace_id: str) -> np.ndarray:
+        key = f"{ROW_ID_COLUMN}:{workspace_id}"
+        if key not in self._columns:
+            self._columns[key] = np.isin(self._row_ids(), list(self._load_members().get(workspace_id, ())))
+        return self._columns[key]
+
+    def filter_rows(self, search_filter: SearchFilter) -> np.ndarray:
+        """Rows matching the filter, evaluated on whole metadata columns at once."""
+        mask = np.ones(len(self.records), dtype=bool)
+        if search_filter.object_types:
+            mask &= np.isin(self._column("object_type"), search_filter.object_types)
+        if search_filter.workspace_ids:
+            mask &= np.isin(self._column("workspace_id"), search_filter.workspace_ids)
+        if search_filter.id_prefix:
+            mask &= np.char.startswith(self._column("id"), search_filter.id_prefix)
+        if search_filter.member_of is not None:
+            mask &= self._member_rows(search_filter.member_of)
+        return np.flatnonzero(mask)
+
+    def search(
+        self,
+        query_vectors: np.ndarray,
+        k: int,
+        search_filter: Optional[SearchFilter] = None,
+        n_probes: int = DEFAULT_IVF_PROBES,
+    ) -> list[list[tuple[dict, float]]]:
+        """Batched cosine top-k. Returns (record, similarity) pairs ordered from the most similar, per query."""
+        with self._lock:
+            self._load()
+            matrix = self.matrix
+            records = self.records
+            deleted_rows = [self._id_to_row[i] for i in self.deleted if i in self._id_to_row]
+            ivf = self.ivf
+            allowed = None
+            if search_filter is not None and not search_filter.is_empty:
+                allowed = self.filter_rows(search_filter)
+        if matrix is None or len(matrix) == 0:
+            return [[] for _ in query_vectors]
+        queries = normalize(np.atleast_2d(np.asarray(query_vectors, dtype=np.float32)))
+        results = []
+        if ivf is None and allowed is None:
+            all_scores = queries @ matrix.T
+            all_scores[:, deleted_rows] = -np.inf
+            for scores in all_scores:
+                rows = [r for r in top_k(scores, k) if np.isfinite(scores[r])]
+                results.append([(records[r], float(scores[r])) for r in rows])
+        elif ivf is None:
+            # Only filtered rows are scored
+            candidates = allowed[~np.isin(allowed, deleted_rows)]
+            all_scores = queries @ matrix[candidates].T
+            for scores in all_scores:
+                results.append([(records[candidates[r]], float(scores[r])) for r in top_k(scores, k)])
+        else:
+            for query in queries:
+                candidates = ivf.candidates(query, n_probes)
+                if allowed is not None:
+                    candidates = np.intersect1d(candidates, allowed, assume_unique=True)
+                candidates = candidates[~np.isin(candidates, deleted_rows)]
+                if len(candidates) == 0:
+                    results.append([])
+                    continue
+                scores = matrix[candidates] @ query
+                results.append([(records[candidates[r]], float(scores[r])) for r in top_k(scores, k)])
+        return results
+
+
+class NumpyDB:
+    """Directory of NumpyTables, mimics the connection API of lancedb."""
+
+    def __init__(self, uri: str) -> None:
+        self.uri = Path(uri)
+        self._tables: dict[str, NumpyTable] = {}
+
+    def table_names(self) -> list[str]:
+        if not os.path.isdir(self.uri):
+            return []
+        return sorted(p.name for p in self.uri.iterdir() if p.is_dir())
+
+    def open_table(self, name: str) -> NumpyTable:
+        if name not in self.table_names():
+            raise FileNotFoundError(f"Table {name} does not exist in {self.uri}")
+        return self.get_table(name)
+
+    def get_table(self, name: str) -> NumpyTable:
+        """Open the table, it is created by the first add."""
+        if name not in self._tables:
+            self._tables[name] = NumpyTable(self.uri / name)
+        return self._tables[name]
+
+    def drop_table(self, name: str) -> None:
+        self.open_table(name)
+        shutil.rmtree(self.uri / name)
+        self._tables.pop(name, None)
+
+
+_connections: dict[str, NumpyDB] = {}
+_connections_lock = threading.Lock()
+
+
+def connect(uri: str) -> NumpyDB:
+    # Loaded (memory-mapped) tables are reused by all connections to the same directory
+    with _connections_lock:
+        if uri not in _connections:
+            _connections[uri] = NumpyDB(uri)
+        return _connections[uri]
+
+
+class NumpyVectorStore(VectorStore):
+    def __init__(self, connection: NumpyDB, embedding: Embeddings, table_name: str = "vectorstore") -> None:
+        self._connection = connection
+        self._embedding = embedding
+        self._table_name = table_name
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    @property
+    def table(self) -> NumpyTable:
+        return self._connection.get_table(self._table_name)
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[list[dict]] = None,
+        ids: Optional[list[str]] = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        texts = list(texts)
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        self.table.add(ids, texts, self._embedding.embed_documents(texts), metadatas)
+        for workspace_id in kwargs.get("workspaces") or []:
+            self.table.update_members(workspace_id, ids, [])
+        return ids
+
+    def update_members(self, workspace_id: str, added: list[str], removed: list[str]) -> None:
+        self.table.update_members(workspace_id, added, removed)
+
+    @staticmethod
+    def _to_document(record: dict, score: float) -> Document:
+        return Document(page_content=record["text"], metadata={**record["metadata"], SCORE_KEY: score})
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: list[float], k: int = 4, filter: Optional[SearchFilter] = None, **kwargs: Any
+    ) -> list[tuple[Document, float]]:
+        with span("vector_search", backend="NumPy", k=k) as search_span:
+            results = self.table.search(np.asarray([embedding]), k, search_filter=filter)[0]
+            search_span.set_attribute("documents", len(results))
+        return [(self._to_document(record, score), score) for record, score in results]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> list[tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k, **kwargs)
+
+    def similarity_search_by_vector(self, embedding: list[float], k: int = 4, **kwargs: Any) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, **kwargs)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def batch_similarity_search(
+        self, queries: list[str], k: int = 4, filter: Optional[SearchFilter] = None
+    ) -> list[list[Document]]:
+        vectors = np.asarray([self._embedding.embed_query(q) for q in queries])
+        return [
+            [self._to_document(record, score) for record, score in results]
+            for results in self.table.search(vectors, k, search_filter=filter)
+        ]
+
+    def _select_relevance_score_fn(self):
+        # Scores are already cosine similarities
+        return lambda score: score
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: list[str],
+        embedding: Embeddings,
+        metadatas: Optional[list[dict]] = None,
+        connection: Optional[NumpyDB] = None,
+        table_name: str = "vectorstore",
+        **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        store = cls(connection=connection, embedding=embedding, table_name=table_name)
+        store.add_texts(texts, metadatas, **kwargs)
+        return store
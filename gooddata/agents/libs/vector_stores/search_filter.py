@@ -0,0 +1,80 @@
+from typing import Any, Optional
+
+import attr
+
+# Workspaces referencing a row of the org-level shared table, list column in LanceDB, side table in DuckDB and NumPy
+MEMBERSHIP_COLUMN = "workspaces"
+
+
+def sql_string(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def members_table_name(table_name: str) -> str:
+    return f"{table_name}_members"
+
+
+@attr.s(auto_attribs=True, kw_only=True, frozen=True)
+class SearchFilter:
+    """
+    Structured filter on document metadata, applied by vector stores before vector scoring.
+    Empty lists/None mean no restriction.
+    """
+
+    object_types: tuple[str, ...] = attr.ib(default=(), converter=tuple)
+    workspace_ids: tuple[str, ...] = attr.ib(default=(), converter=tuple)
+    id_prefix: Optional[str] = None
+    # Workspace whose rows are searched in the org-level shared table, rows themselves have no workspace_id
+    member_of: Optional[str] = None
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.object_types and not self.workspace_ids and not self.id_prefix and self.member_of is None
+
+    def matches(self, metadata: dict) -> bool:
+        if self.object_types and metadata.get("object_type") not in self.object_types:
+            return False
+        if self.workspace_ids and metadata.get("workspace_id") not in self.workspace_ids:
+            return False
+        if self.id_prefix and not str(metadata.get("id", "")).startswith(self.id_prefix):
+            return False
+        return True
+
+    def to_lance_where(self, metadata_column: str = "metadata") -> str:
+        """SQL predicate for LanceDB, which stores LangChain metadata as a struct column."""
+        conditions = []
+        if self.object_types:
+            values = ", ".join(sql_string(v) for v in self.object_types)
+            conditions.append(f"{metadata_column}.object_type IN ({values})")
+        if self.workspace_ids:
+            values = ", ".join(sql_string(v) for v in self.workspace_ids)
+            conditions.append(f"{metadata_column}.workspace_id IN ({values})")
+        if self.id_prefix:
+            prefix = self.id_prefix.replace("'", "''").replace("%", "\\%").replace("_", "\\_")
+            conditions.append(f"{metadata_column}.id LIKE '{prefix}%'")
+        if self.member_of is not None:
+            # Served by the LABEL_LIST index of the column
+            conditions.append(f"array_has_any({MEMBERSHIP_COLUMN}, [{sql_string(self.member_of)}])")
+        return " AND ".join(conditions)
+
+    def to_duckdb_where(
+        self, metadata_column: str = "metadata", members_table: Optional[str] = None
+    ) -> tuple[str, list[Any]]:
+        """Parametrized SQL predicate for DuckDB, which stores LangChain metadata as a JSON string."""
+        conditions = []
+        params: list[Any] = []
+        if self.object_types:
+            conditions.append(f"list_contains(?::VARCHAR[], json_extract_string({metadata_column}, '$.object_type'))")
+            params.append(list(self.object_types))
+        if self.workspace_ids:
+            conditions.append(f"list_contains(?::VARCHAR[], json_extract_string({metadata_column}, '$.workspace_id'))")
+            params.append(list(self.workspace_ids))
+        if self.id_prefix:
+            conditions.append(f"starts_with(json_extract_string({metadata_column}, '$.id'), ?)")
+            params.append(self.id_prefix)
+        if self.member_of is not None:
+            if members_table is None:
+                raise ValueError("Workspace membership filter requires the members table")
+            conditions.append(f'id IN (SELECT id FROM "{members_table}" WHERE workspace_id = ?)')
+            params.append(self.member_of)
+        return " AND ".join(conditions), params
@@ -1,58 +1,79 @@
+import asyncio
+from typing import AsyncIterator, Optional
+
+from gooddata.agents.libs.catalog_scope import CatalogRetriever
 from gooddata.agents.libs.gd_openai import GoodDataOpenAICommon
+from gooddata.agents.libs.maql_prompt import (
+    DEFAULT_EXAMPLE_COUNT,
+    MAQL_EXAMPLES,
+    MAQL_PREAMBLE,
+    catalog_version,
+    format_entities,
+    format_examples,
+    get_example_selector,
+)
+from gooddata.agents.libs.tracing import span
 from gooddata.tools import TMP_DIR, create_dir
 
 
 class MaqlAgent(GoodDataOpenAICommon):
-    def get_open_ai_sys_msg(self) -> str:
-        sys_msg = """
-You are a data engineer writing metrics also known as measures in MAQL language.
-You exclusively use the following description of MAQL language.
-
-Metrics always start with keyword SELECT.
-You have translate entities specified by natural language with corresponding IDs of entities.
-All IDs must be specified as {{<type>/<id>}}, where <type> identifies type of entity and <id> the ID of entity.
-
-Examples:
+    def __init__(
+        self,
+        catalog_retriever: Optional[CatalogRetriever] = None,
+        example_count: Optional[int] = DEFAULT_EXAMPLE_COUNT,
+        **kwargs,
+    ) -> None:
+        """
+        With catalog_retriever, prompts contain only entities relevant to the question,
+        otherwise all entities of the workspace, compiled once per catalog version.
+        example_count few-shot examples most similar to the question are included, None includes all of them.
+        """
+        super().__init__(**kwargs)
+        self.catalog_retriever = catalog_retriever
+        self.example_count = example_count
 
-Question: Give me count of customers
-Answer: SELECT COUNT({{attribute/customer_id}})
+    def get_compiled_entities(self) -> str:
+        facts = self.gd_sdk.facts(self.workspace_id)
+        attributes = self.gd_sdk.attributes(self.workspace_id)
+        metrics = self.gd_sdk.metrics(self.workspace_id)
 
-Question: Give me average price
-Answer: SELECT AVG({{fact/price}})
+        def compile_entities() -> str:
+            entities = format_entities(facts, attributes, metrics)
+            # For debug
+            create_dir(TMP_DIR)
+            with open(TMP_DIR / "maql.txt", "w") as fp:
+                fp.write(entities)
+            return entities
 
-Question: Give me count of flights
-Answer: SELECT SUM({{metric/flight_count}})
+        version = catalog_version(facts, attributes, metrics)
+        key = (self.gd_sdk.catalog_cache_prefix, self.workspace_id, "maql_entities", version)
+        return self.gd_sdk.catalog_cache.get_or_compute(key, compile_entities)
 
-Now, I teach you how to apply filters. Warning: the entity type for attributes must be here specified as "label".
-Examples:
-Question: Sum of flight count where manufacturer is AIRBUS
-Answer: SELECT SUM({{metric/flight_count}}) WHERE {{label/manufacturer}} = "AIRBUS"
-
-Question: Sum of flight count where manufacturer is like AIR
-Answer: SELECT SUM({{metric/flight_count}}) WHERE {{label/manufacturer}} LIKE "%AIR%"
-
-Now I teach you how to create metrics calculating values for previous period of time.
-Examples:
-Question: Calculate revenue for previous quarter
-Answer: SELECT {{metric/revenue}} FOR Previous({{attribute/quarter}})
+    def get_entities(self, question: Optional[str]) -> str:
+        if self.catalog_retriever is None or question is None:
+            return self.get_compiled_entities()
+        return format_entities(
+            self.catalog_retriever.search(question, "fact"),
+            self.catalog_retriever.search(question, "attribute"),
+            self.catalog_retriever.search(question, "metric"),
+        )
 
-Question: Calculate revenue three years before now
-Answer: SELECT {{metric/revenue}} FOR Previous({{attribute/year}}, 3)
+    def get_examples(self, question: Optional[str]) -> str:
+        if self.example_count is None or question is None:
+            return format_examples(MAQL_EXAMPLES)
+        embeddings = self.get_llm_embeddings()
+        return format_examples(get_example_selector(embeddings, embeddings.model).select(question, self.example_count))
 
+    def get_open_ai_sys_msg(self, question: Optional[str] = None) -> str:
+        with span("prompt.build", agent="maql", workspace=self.workspace_id) as prompt_span:
+            # From the most to the least stable part, the longest common prefix is reused by the provider
+            prompt = f"""{MAQL_PREAMBLE}
 Here is the list of available entities:
-"""
-        facts = "Facts:\n" + "\n".join([f"- Fact with ID {f[0]} is described as '{f[1]}'" for f in self.gd_sdk.facts])
-        attributes = "Attributes:\n" + "\n".join(
-            [f"- Attribute with ID {a[0]} is described as '{a[1]}'" for a in self.gd_sdk.attributes]
-        )
-        metrics = "Metrics:\n" + "\n".join(
-            [f"- Metric with ID {m[0]} is described as '{m[1]}'" for m in self.gd_sdk.metrics]
-        )
-        sys_msg += f"{facts}\n\n{attributes}\n\n{metrics}"
-        create_dir(TMP_DIR)
-        with open(TMP_DIR / "maql.txt", "w") as fp:
-            fp.write(sys_msg)
-        return sys_msg
+{self.get_entities(question)}
+
+{self.get_examples(question)}"""
+            prompt_span.set_attribute("characters", len(prompt))
+        return prompt
 
     @staticmethod
     def get_open_ai_raw_prompt(question: str) -> str:
@@ -60,7 +81,19 @@ Here is the list of available entities:
 
     def process(self, prompt: str) -> str:
         completion = self.ask_chat_completion(
-            system_prompt=self.get_open_ai_sys_msg(),
+            system_prompt=self.get_open_ai_sys_msg(prompt),
             user_prompt=self.get_open_ai_raw_prompt(prompt),
         )
         return completion.choices[0].message.content
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        # Catalog calls of the SDK and embeddings are blocking
+        system_prompt = await asyncio.to_thread(self.get_open_ai_sys_msg, prompt)
+        async for token in self.astream_chat_completion(
+            system_prompt=system_prompt,
+            user_prompt=self.get_open_ai_raw_prompt(prompt),
+        ):
+            yield token
+
+    async def aprocess(self, prompt: str) -> str:
+        return "".join([token async for token in self.astream(prompt)])
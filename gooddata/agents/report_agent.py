@@ -1,19 +1,37 @@
+import asyncio
 import json
 import re
-from pathlib import Path
+from typing import AsyncIterator, Optional
 
 import pandas as pd
-from gooddata_sdk import Attribute, ObjId, SimpleMetric
+from gooddata_sdk import Attribute, ExecutionDefinition, ObjId, SimpleMetric, TableDimension
 from langchain.chains import RetrievalQA
-from langchain.indexes import VectorstoreIndexCreator
-from langchain_community.document_loaders import TextLoader
-from langchain_openai import ChatOpenAI
 
+from gooddata.agents.libs.catalog_scope import CatalogRetriever, CatalogScope
 from gooddata.agents.libs.gd_openai import AIMethod, GoodDataOpenAICommon
-from gooddata.tools import TMP_DIR, create_dir
+from gooddata.agents.libs.tracing import span
+from gooddata.agents.libs.vector_stores.search_filter import SearchFilter
+from gooddata.tools import get_org_id_from_host
 
 
 class ReportAgent(GoodDataOpenAICommon):
+    def __init__(self, catalog_retriever: Optional[CatalogRetriever] = None, **kwargs) -> None:
+        """
+        With catalog_retriever, prompts contain only metrics and attributes relevant to the question
+        and the function schema allows only their IDs. Otherwise, the whole workspace catalog is sent.
+        """
+        super().__init__(**kwargs)
+        self.catalog_retriever = catalog_retriever
+        self._catalog_index: Optional[CatalogRetriever] = None
+
+    def get_catalog_scope(self, question: str) -> CatalogScope:
+        if self.catalog_retriever is not None:
+            return self.catalog_retriever.get_scope(question)
+        return CatalogScope(
+            metrics=self.gd_sdk.metrics(self.workspace_id),
+            attributes=self.gd_sdk.attributes(self.workspace_id),
+        )
+
     @staticmethod
     def answer_to_json(answer: str) -> dict:
         """Transform answer to dict, no matter the format.
@@ -56,22 +74,22 @@ class ReportAgent(GoodDataOpenAICommon):
             Metrics are a list containing strings, representing the identifier of the metrics from the workspace.
             """
 
-    def get_open_ai_fnc_info(self) -> str:
+    def get_open_ai_fnc_info(self, scope: CatalogScope) -> str:
         return f"""
         Whenever you create a new ExecutionDefinition, you always work upon {self.unique_prefix}, defined as:
-        metrics:{self.gd_sdk.metrics_string(self.workspace_id)}
-        attributes:{self.gd_sdk.attributes_string(self.workspace_id)}
+        metrics:{scope.metrics}
+        attributes:{scope.attributes}
         \"\"\"
         """
 
-    def get_open_ai_raw_prompt(self, question: str) -> str:
+    def get_open_ai_raw_prompt(self, question: str, scope: CatalogScope) -> str:
         return f"""
         Create "{question}" in {self.unique_prefix} as ExecutionDefinition json.
 
         context:\"\"\"
         This is {self.unique_prefix}:
-        metrics:{self.gd_sdk.metrics_string(self.workspace_id)}
-        attributes:{self.gd_sdk.attributes_string(self.workspace_id)}
+        metrics:{scope.metrics}
+        attributes:{scope.attributes}
         \"\"\"
         """
 
@@ -86,12 +104,20 @@ class ReportAgent(GoodDataOpenAICommon):
         """
 
     @staticmethod
-    def get_execdef_fnc() -> dict:
+    def get_execdef_fnc(scope: Optional[CatalogScope] = None) -> dict:
         """ExecutionDefinition function definition for OpenAI function calls
 
+        Args:
+            scope (CatalogScope, optional): If set, only IDs from the scope are allowed
+
         Returns:
             str: Definition of the ExecDef
         """
+        attribute_item = {"type": "string", "description": "local_id of an attribute"}
+        metric_item = {"type": "string", "description": "local_id of a metric"}
+        if scope is not None:
+            attribute_item["enum"] = scope.attribute_ids
+            metric_item["enum"] = scope.metric_ids
         return {
             "name": "ExecutionDefinition",
             "description": "Create ExecutionDefinition for data visualization",
@@ -100,12 +126,12 @@ class ReportAgent(GoodDataOpenAICommon):
                 "properties": {
                     "attributes": {
                         "type": "array",
-                        "items": {"type": "string", "description": "local_id of an attribute"},
+                        "items": attribute_item,
                         "description": "List of local_id of attributes to be used in the visualization",
                     },
                     "metrics": {
                         "type": "array",
-                        "items": {"type": "string", "description": "local_id of a metric"},
+                        "items": metric_item,
                         "description": "List of local_id of metrics to be used in the visualization",
                     },
                 },
@@ -116,35 +142,60 @@ class ReportAgent(GoodDataOpenAICommon):
     def ask_open_ai_raw(self, question: str) -> str:
         completion = self.ask_chat_completion(
             system_prompt=self.get_open_ai_sys_msg(),
-            user_prompt=self.get_open_ai_raw_prompt(question),
+            user_prompt=self.get_open_ai_raw_prompt(question, self.get_catalog_scope(question)),
         )
         return completion.choices[0].message.content
 
+    async def astream_open_ai_raw(self, question: str) -> AsyncIterator[str]:
+        system_prompt = self.get_open_ai_sys_msg()
+        scope = await asyncio.to_thread(self.get_catalog_scope, question)
+        user_prompt = self.get_open_ai_raw_prompt(question, scope)
+        async for token in self.astream_chat_completion(system_prompt=system_prompt, user_prompt=user_prompt):
+            yield token
+
     def ask_func_open_ai(self, question: str) -> str:
+        scope = self.get_catalog_scope(question)
         completion = self.ask_chat_completion(
-            system_prompt=self.get_open_ai_fnc_info(),
+            system_prompt=self.get_open_ai_fnc_info(scope),
             user_prompt=self.get_functions_prompt(question),
-            functions=[self.get_execdef_fnc()],
+            functions=[self.get_execdef_fnc(self.scoped_schema(scope))],
             function_name="ExecutionDefinition",
         )
         return completion.choices[0].message.function_call.arguments
 
-    def get_workspace_loader(self, file_dir: Path, file_name: str):
-        create_dir(file_dir)
-        file_path = file_dir / file_name
-        with open(file_path, "w") as fp:
-            fp.write(f"{self.get_open_ai_sys_msg()}\n")
-            fp.write(f"Metrics: {self.gd_sdk.metrics_string(self.workspace_id)}\n")
-            fp.write(f"Attributes: {self.gd_sdk.attributes_string(self.workspace_id)}\n")
-        return TextLoader(str(file_path))
+    async def aask_func_open_ai(self, question: str) -> str:
+        scope = await asyncio.to_thread(self.get_catalog_scope, question)
+        completion = await self.aask_chat_completion(
+            system_prompt=self.get_open_ai_fnc_info(scope),
+            user_prompt=self.get_functions_prompt(question),
+            functions=[self.get_execdef_fnc(self.scoped_schema(scope))],
+            function_name="ExecutionDefinition",
+        )
+        return completion.choices[0].message.function_call.arguments
 
-    def ask_langchain_open_ai(self, question: str) -> str:
-        loader = self.get_workspace_loader(TMP_DIR, f"report_agent_loader_{self.workspace_id}.txt")
-        index = VectorstoreIndexCreator().from_loaders([loader])
+    def scoped_schema(self, scope: CatalogScope) -> Optional[CatalogScope]:
+        # Enums of the whole catalog would only duplicate it in the prompt
+        return scope if self.catalog_retriever is not None else None
+
+    @property
+    def catalog_index(self) -> CatalogRetriever:
+        """Persistent index of the workspace catalog, synced incrementally when the catalog changes."""
+        if self.catalog_retriever is not None:
+            return self.catalog_retriever
+        if self._catalog_index is None:
+            self._catalog_index = CatalogRetriever(
+                gd_sdk=self.gd_sdk,
+                org_id=self.org_id or self.gd_sdk.profile or get_org_id_from_host(self.gd_sdk.host),
+                workspace_id=self.workspace_id,
+                openai_api_key=self.openai_api_key,
+                openai_organization=self.openai_organization,
+            )
+        return self._catalog_index
 
+    def ask_langchain_open_ai(self, question: str) -> str:
         chain = RetrievalQA.from_chain_type(
-            llm=ChatOpenAI(model=self.openai_model),
-            retriever=index.vectorstore.as_retriever(),
+            llm=self.get_chat_llm_model(),
+            retriever=self.catalog_index.get_retriever(SearchFilter(object_types=["metric", "attribute"])),
         )
 
         return chain.run(self.get_langchain_query(question))
@@ -162,22 +213,48 @@ class ReportAgent(GoodDataOpenAICommon):
                 print("No method found, defaulting to RAW")
                 return self.ask_open_ai_raw(question)
 
-    def execute_report(self, answer: str) -> tuple[pd.DataFrame, list, list]:
+    async def astream(self, method: AIMethod, question: str) -> AsyncIterator[str]:
+        """
+        Yields the answer as it arrives. Only RAW answers are streamed token by token,
+        function call arguments and LangChain answers are yielded at once.
+        """
+        match method:
+            case AIMethod.FUNC:
+                yield await self.aask_func_open_ai(question)
+            case AIMethod.LANGCHAIN:
+                yield await asyncio.to_thread(self.ask_langchain_open_ai, question)
+            case _:
+                async for token in self.astream_open_ai_raw(question):
+                    yield token
+
+    async def aask(self, method: AIMethod, question: str) -> str:
+        return "".join([token async for token in self.astream(method, question)])
+
+    def execute_report(self, answer: str, max_rows: Optional[int] = None) -> tuple[pd.DataFrame, list, list]:
         """Get Pandas data frame the generated ExecutionDefinition
 
         Args:
             answer (str):
                 Answer from the OpenAI agent, can be either a valid .json or
                 a written text containing the valid .json
+            max_rows (int, optional):
+                Read only first pages of the result with at least this number of rows
         """
 
         exdef = self.answer_to_json(answer)
 
-        frames = self.gd_sdk.pandas.data_frames(self.workspace_id)
-
-        attributes = {attr: Attribute(local_id=attr, label=attr) for attr in exdef["attributes"]}
-        metrics = {metr: SimpleMetric(local_id=metr, item=ObjId(metr, type="metric")) for metr in exdef["metrics"]}
-        df = frames.for_items(items={**attributes, **metrics}, auto_index=False)
+        attributes = [Attribute(local_id=attr, label=attr) for attr in exdef["attributes"]]
+        metrics = [SimpleMetric(local_id=metr, item=ObjId(metr, type="metric")) for metr in exdef["metrics"]]
+        dimensions = [TableDimension(item_ids=exdef["attributes"])]
+        if metrics:
+            dimensions.append(TableDimension(item_ids=["measureGroup"]))
+        exec_def = ExecutionDefinition(attributes=attributes, metrics=metrics, filters=[], dimensions=dimensions)
+        with span(
+            "report.execute", workspace=self.workspace_id, attributes=len(attributes), metrics=len(metrics)
+        ) as report_span:
+            # Result is read in pages, the same columns as frames.for_items(auto_index=False) returns
+            df = self.gd_sdk.execution_reader(self.workspace_id, exec_def).read_all(max_rows).to_pandas()
+            report_span.set_attribute("rows", len(df))
         return df, exdef["attributes"], exdef["metrics"]
 
     def process(self, method: AIMethod, question: str) -> tuple[pd.DataFrame, list, list]:
@@ -187,3 +264,7 @@ class ReportAgent(GoodDataOpenAICommon):
         """
         answer = self.ask(method, question)
         return self.execute_report(answer)
+
+    async def aprocess(self, method: AIMethod, question: str) -> tuple[pd.DataFrame, list, list]:
+        answer = await self.aask(method, question)
+        return await asyncio.to_thread(self.execute_report, answer)
@@ -1,16 +1,39 @@
 import os
-from typing import Optional
+from typing import Callable, Optional
 
 from gooddata_pandas import GoodPandas
-from gooddata_sdk import GoodDataSdk
+from gooddata_sdk import ExecutionDefinition, GoodDataSdk
+
+from gooddata.agents.libs.cache import TTLCache, get_cache
+from gooddata.agents.libs.execution_cache import CachedExecutionFrames
+from gooddata.agents.libs.execution_reader import PagedExecutionReader
+from gooddata.agents.libs.pdm_cache import PdmScanner, get_pdm_scanner
+from gooddata.tools import TMP_DIR
+
+# GoodData does not expose ETags through the SDK, catalog entries simply expire
+DEFAULT_CATALOG_TTL = 300
+CATALOG_CACHE_DIR = TMP_DIR / "catalog_cache"
 
 
 class GoodDataSdkWrapper:
-    def __init__(self, profile: Optional[str] = None, timeout: int = 10) -> None:
+    def __init__(
+        self,
+        profile: Optional[str] = None,
+        timeout: int = 10,
+        catalog_ttl: Optional[float] = DEFAULT_CATALOG_TTL,
+        persist_catalog: bool = False,
+        sdk: Optional[GoodDataSdk] = None,
+        pandas: Optional[GoodPandas] = None,
+    ) -> None:
+        """
+        sdk and pandas can be injected, e.g. local stubs in tests.
+        Catalog cache is shared by all wrappers in the process, Streamlit creates a new wrapper on every rerun.
+        """
         self.profile = profile
         self.timeout = timeout
-        self.sdk = self.create_sdk()
-        self.pandas = self.create_pandas()
+        self.sdk = sdk or self.create_sdk()
+        self.pandas = pandas or self.create_pandas()
+        self.catalog_cache = self.create_catalog_cache(catalog_ttl, persist_catalog)
         self.wait_for_gooddata_is_up()
 
     @property
@@ -52,23 +75,65 @@ class GoodDataSdkWrapper:
     def wait_for_gooddata_is_up(self) -> None:
         self.sdk.support.wait_till_available(timeout=self.timeout)
 
+    @staticmethod
+    def create_catalog_cache(ttl: Optional[float], persist: bool) -> TTLCache:
+        # Wrappers with a different TTL get their own cache
+        name = f"{'gooddata_catalog_persistent' if persist else 'gooddata_catalog'}/ttl={ttl}"
+        # Each cache has its own file, caches with a different TTL must not overwrite each other
+        persist_path = CATALOG_CACHE_DIR / f"{name.replace('/', '_')}.pickle" if persist else None
+        return get_cache(name, ttl=ttl, persist_path=persist_path)
+
+    @property
+    def catalog_cache_prefix(self) -> str:
+        # Wrappers connected to different organizations share the cache
+        return self.profile or f"{self.host}|{self.override_host}"
+
+    def cached_catalog(
+        self, workspace_id: str, object_type: str, fetch: Callable[[], list[tuple[str, str]]]
+    ) -> list[tuple[str, str]]:
+        return self.catalog_cache.get_or_compute((self.catalog_cache_prefix, workspace_id, object_type), fetch)
+
+    def invalidate_catalog(self, workspace_id: Optional[str] = None) -> None:
+        """Drop cached catalog of the workspace, or of all workspaces, e.g. after the model was changed."""
+        self.catalog_cache.invalidate(
+            lambda key: key[0] == self.catalog_cache_prefix and workspace_id in (None, key[1])
+        )
+
+    def execution_frames(self, workspace_id: str) -> CachedExecutionFrames:
+        """Data frame factory of the workspace, repeated executions are served from the local cache."""
+        return CachedExecutionFrames(self.pandas.data_frames(workspace_id), self.catalog_cache_prefix, workspace_id)
+
+    def execution_reader(self, workspace_id: str, exec_def: ExecutionDefinition, **kwargs) -> PagedExecutionReader:
+        """Reader of the execution result in pages of Arrow record batches, kwargs are passed to the reader."""
+        return PagedExecutionReader(self.sdk, workspace_id, exec_def, self.catalog_cache_prefix, **kwargs)
+
+    def pdm_scanner(self) -> PdmScanner:
+        """Scanner of data sources keeping snapshots of their PDMs."""
+        return get_pdm_scanner(self.sdk, self.catalog_cache_prefix)
+
     def metrics(self, workspace_id: str) -> list[tuple[str, str]]:
-        # TODO - cache the SDK call
-        metric_catalog = self.sdk.catalog_workspace_content.get_metrics_catalog(workspace_id=workspace_id)
-        return [(metric.id, metric.title) for metric in metric_catalog]
+        def fetch() -> list[tuple[str, str]]:
+            metric_catalog = self.sdk.catalog_workspace_content.get_metrics_catalog(workspace_id=workspace_id)
+            return [(metric.id, metric.title) for metric in metric_catalog]
+
+        return self.cached_catalog(workspace_id, "metrics", fetch)
 
     def facts(self, workspace_id: str) -> list[tuple[str, str]]:
-        # TODO - cache the SDK call
-        fact_catalog = self.sdk.catalog_workspace_content.get_facts_catalog(workspace_id=workspace_id)
-        return [(fact.id, fact.title) for fact in fact_catalog]
+        def fetch() -> list[tuple[str, str]]:
+            fact_catalog = self.sdk.catalog_workspace_content.get_facts_catalog(workspace_id=workspace_id)
+            return [(fact.id, fact.title) for fact in fact_catalog]
+
+        return self.cached_catalog(workspace_id, "facts", fetch)
 
     def metrics_string(self, workspace_id: str) -> str:
         return str(self.metrics(workspace_id))
 
     def attributes(self, workspace_id: str) -> list[tuple[str, str]]:
-        # TODO - cache the SDK call
-        attribute_catalog = self.sdk.catalog_workspace_content.get_attributes_catalog(workspace_id=workspace_id)
-        return [(attr.id, attr.title) for attr in attribute_catalog]
+        def fetch() -> list[tuple[str, str]]:
+            attribute_catalog = self.sdk.catalog_workspace_content.get_attributes_catalog(workspace_id=workspace_id)
+            return [(attr.id, attr.title) for attr in attribute_catalog]
+
+        return self.cached_catalog(workspace_id, "attributes", fetch)
 
     def attributes_string(self, workspace_id: str) -> str:
         return str(self.attributes(workspace_id))
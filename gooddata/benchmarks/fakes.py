@@ -0,0 +1,76 @@
+import hashlib
+import re
+from time import sleep
+from types import SimpleNamespace
+from typing import Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+FAKE_EMBEDDING_SIZE = 256
+FAKE_ANSWER = '{"objects": []}'
+TOKEN_RE = re.compile(r"\w+")
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Deterministic stand-in for OpenAI embeddings, no network and no randomness.
+    Tokens are hashed into signed buckets, texts sharing words are similar, so retrieval behaves realistically.
+    """
+
+    def __init__(self, size: int = FAKE_EMBEDDING_SIZE, latency: float = 0.0) -> None:
+        self.size = size
+        # Simulated round trip per call, 0 measures only the local overhead
+        self.latency = latency
+        self.model = f"fake-embedding-{size}"
+
+    def _embed(self, text: str) -> list[float]:
+        vector = np.zeros(self.size, dtype=np.float32)
+        for token in TOKEN_RE.findall(text.lower()):
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.size
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if self.latency:
+            sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        if self.latency:
+            sleep(self.latency)
+        return self._embed(text)
+
+
+def fake_chat_model(answer: str = FAKE_ANSWER, latency: Optional[float] = None) -> FakeListChatModel:
+    """Chat model answering always the same, latency is applied per streamed character."""
+    return FakeListChatModel(responses=[answer], sleep=latency)
+
+
+class StubWorkspaceContent:
+    def __init__(self, ldm: SimpleNamespace, adm: SimpleNamespace, latency: float = 0.0) -> None:
+        self.ldm = ldm
+        self.adm = adm
+        self.latency = latency
+
+    def get_declarative_ldm(self, workspace_id: str) -> SimpleNamespace:
+        sleep(self.latency)
+        return self.ldm
+
+    def get_declarative_analytics_model(self, workspace_id: str) -> SimpleNamespace:
+        sleep(self.latency)
+        return self.adm
+
+
+class StubSdkWrapper:
+    """
+    Stand-in for GoodDataSdkWrapper serving synthetic declarative models.
+    Provides only what GoodDataCatalogBuilder uses, latency simulates the API round trip.
+    """
+
+    def __init__(self, ldm: SimpleNamespace, adm: SimpleNamespace, latency: float = 0.0) -> None:
+        self.profile = "benchmark"
+        self.sdk = SimpleNamespace(catalog_workspace_content=StubWorkspaceContent(ldm, adm, latency))
@@ -0,0 +1,198 @@
+import argparse
+import json
+import platform
+import shutil
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable, Optional
+
+import attr
+import numpy as np
+
+from gooddata.agents.libs.catalog import GoodDataCatalogBuilder
+from gooddata.agents.libs.embedding_cache import CachedEmbeddings, EmbeddingCache, get_query_cache
+from gooddata.agents.libs.rag_langchain import GoodDataRAGSimple, VectorDB
+from gooddata.benchmarks.fakes import FakeEmbeddings, StubSdkWrapper, fake_chat_model
+from gooddata.benchmarks.synthetic_catalog import SyntheticCatalogGenerator
+from gooddata.tools import TMP_DIR
+
+DEFAULT_SCALES = [1_000, 10_000]
+DEFAULT_QUERIES = 100
+RESULTS_DIR = TMP_DIR / "benchmarks"
+# All files of benchmark indexes start with the org ID, they are deleted after each run
+ORG_ID_PREFIX = "benchmark"
+WORKSPACE_ID = "benchmark"
+ANSWER_PROMPT = """Answer the question based only on the following context:
+{context}
+
+Question: {question}
+"""
+
+
+@attr.s(auto_attribs=True, kw_only=True)
+class BenchmarkResult:
+    backend: str
+    documents: int
+    catalog_build_s: float
+    indexing_s: float
+    retrieval_p50_ms: float
+    retrieval_p99_ms: float
+    e2e_p50_ms: float
+    e2e_p99_ms: float
+
+    @property
+    def key(self) -> str:
+        return f"{self.backend}/{self.documents}"
+
+
+def timed(func: Callable[[], Any]) -> tuple[Any, float]:
+    start = perf_counter()
+    result = func()
+    return result, perf_counter() - start
+
+
+def percentiles_ms(durations: list[float]) -> tuple[float, float]:
+    p50, p99 = np.percentile(np.asarray(durations) * 1000, [50, 99])
+    return round(float(p50), 3), round(float(p99), 3)
+
+
+def remove_benchmark_files(org_id: str) -> None:
+    for path in TMP_DIR.glob(f"{org_id}.*"):
+        if path.is_dir():
+            shutil.rmtree(path)
+        else:
+            path.unlink()
+
+
+def run_scale(vector_db: VectorDB, documents: int, queries: int, seed: int = 0) -> BenchmarkResult:
+    """
+    Build, index and query a synthetic catalog, OpenAI and GoodData are replaced by local fakes.
+    Fake embeddings are wrapped by CachedEmbeddings as in the agents, the cache starts empty in every run.
+    """
+    generator = SyntheticCatalogGenerator(documents, seed)
+    ldm, adm = generator.generate()
+    questions = generator.generate_questions(queries)
+    org_id = f"{ORG_ID_PREFIX}_{documents}"
+    remove_benchmark_files(org_id)
+
+    rag = GoodDataRAGSimple(
+        org_id=org_id,
+        workspace_id=WORKSPACE_ID,
+        vector_db=vector_db,
+        openai_api_key=ORG_ID_PREFIX,
+        openai_organization=None,
+        cache_results=False,
+    )
+    embeddings = FakeEmbeddings()
+    embedding_cache = EmbeddingCache(TMP_DIR / f"{org_id}.embedding_cache.duckdb")
+    rag.openai_embedding = CachedEmbeddings(embeddings, embeddings.model, embedding_cache)
+    # Questions are the same for all backends, later backends must not reuse query embeddings of earlier ones
+    get_query_cache().invalidate()
+    rag.openai_chat_model = fake_chat_model()
+    try:
+        catalog, catalog_build_s = timed(GoodDataCatalogBuilder(StubSdkWrapper(ldm, adm), WORKSPACE_ID).build)
+        vector_store, indexing_s = timed(lambda: rag.init_vector_store(catalog.documents))
+        retriever = rag.get_rag_retriever(vector_store)
+        retrieval = [timed(lambda: retriever.get_relevant_documents(q))[1] for q in questions]
+        # rag_chain_invoke turns on LangChain debug output, which would dominate the measurement
+        chain = rag.get_rag_chain(retriever, ANSWER_PROMPT)
+        e2e = [timed(lambda: chain.invoke(q))[1] for q in questions]
+    finally:
+        embedding_cache.close()
+        remove_benchmark_files(org_id)
+
+    retrieval_p50_ms, retrieval_p99_ms = percentiles_ms(retrieval)
+    e2e_p50_ms, e2e_p99_ms = percentiles_ms(e2e)
+    return BenchmarkResult(
+        backend=vector_db.name,
+        documents=len(catalog.documents),
+        catalog_build_s=round(catalog_build_s, 3),
+        indexing_s=round(indexing_s, 3),
+        retrieval_p50_ms=retrieval_p50_ms,
+        retrieval_p99_ms=retrieval_p99_ms,
+        e2e_p50_ms=e2e_p50_ms,
+        e2e_p99_ms=e2e_p99_ms,
+    )
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: list[BenchmarkResult], baseline_path: Path) -> None:
+    """Print relative change of every metric against results of another commit, positive means slower."""
+    with open(baseline_path) as fp:
+        baseline = json.load(fp)
+    baseline_results = {f"{r['backend']}/{r['documents']}": r for r in baseline["results"]}
+    print(f"Compared with commit {baseline['commit']}:")
+    for result in results:
+        previous = baseline_results.get(result.key)
+        if previous is None:
+            print(f"- {result.key}: not in the baseline")
+            continue
+        changes = [
+            f"{name}={(value - previous[name]) / previous[name]:+.1%}"
+            for name, value in attr.asdict(result).items()
+            if isinstance(value, float) and previous.get(name)
+        ]
+        print(f"- {result.key}: {' '.join(changes)}")
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Offline benchmark of catalog build, indexing and retrieval")
+    parser.add_argument(
+        "--scales",
+        type=lambda v: [int(s) for s in v.split(",")],
+        default=DEFAULT_SCALES,
+        help="Comma separated numbers of documents, e.g. 1000,10000,100000,1000000",
+    )
+    parser.add_argument(
+        "--backends",
+        type=lambda v: [VectorDB[b.strip().upper()] for b in v.split(",")],
+        default=list(VectorDB),
+        help=f"Comma separated vector databases, any of {','.join(db.name for db in VectorDB)}",
+    )
+    parser.add_argument("--queries", type=int, default=DEFAULT_QUERIES, help="Queries per backend and scale")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic catalog")
+    parser.add_argument("--output", type=Path, help="Results file, tmp/benchmarks/<commit>.json by default")
+    parser.add_argument("--baseline", type=Path, help="Results of another commit to compare with")
+    args = parser.parse_args(argv)
+
+    commit = git_commit()
+    results = []
+    for documents in args.scales:
+        for vector_db in args.backends:
+            print(f"Benchmark {vector_db.name} with {documents} documents START")
+            result = run_scale(vector_db, documents, args.queries, args.seed)
+            print(f"Benchmark {vector_db.name} with {documents} documents: {attr.asdict(result)}")
+            results.append(result)
+
+    output = args.output or RESULTS_DIR / f"{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as fp:
+        json.dump(
+            {
+                "commit": commit,
+                "python": platform.python_version(),
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "queries": args.queries,
+                "seed": args.seed,
+                "results": [attr.asdict(r) for r in results],
+            },
+            fp,
+            indent=2,
+        )
+    print(f"Results written to {output}")
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
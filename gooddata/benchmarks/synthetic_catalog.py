@@ -0,0 +1,100 @@
+from types import SimpleNamespace
+
+from faker import Faker
+from faker.providers import job
+
+FACTS_PER_DATASET = 3
+ATTRIBUTES_PER_DATASET = 5
+LABELS_PER_ATTRIBUTE = 2
+DATE_GRANULARITIES = ["DAY", "WEEK", "MONTH", "QUARTER", "YEAR"]
+# Share of documents per object type, the rest are datasets with their facts and attributes
+METRIC_SHARE = 0.2
+VISUALIZATION_SHARE = 0.1
+DASHBOARD_SHARE = 0.01
+DATE_DATASET_SHARE = 0.01
+
+
+def measure_item(measure_definition: dict) -> dict:
+    return {"measure": {"definition": {"measureDefinition": measure_definition}}}
+
+
+class SyntheticCatalogGenerator:
+    """
+    Declarative LDM and ADM of a workspace with approximately the requested number of RAG documents.
+    Objects only mimic attributes of gooddata_sdk declarative classes used by the catalog builder.
+    Titles are generated by Faker with a fixed seed, catalogs of the same size are identical.
+    """
+
+    def __init__(self, documents: int, seed: int = 0) -> None:
+        self.documents = documents
+        self.fake = Faker()
+        self.fake.seed_instance(seed)
+        self.fake.add_provider(job)
+
+    def _title(self) -> str:
+        return f"{self.fake.job()} {self.fake.word()}"
+
+    @staticmethod
+    def _object(prefix: str, index: int, title: str, **kwargs) -> SimpleNamespace:
+        return SimpleNamespace(id=f"{prefix}_{index}", title=title, **kwargs)
+
+    def generate_ldm(self) -> SimpleNamespace:
+        date_datasets = max(1, int(self.documents * DATE_DATASET_SHARE / (1 + len(DATE_GRANULARITIES))))
+        share = 1 - METRIC_SHARE - VISUALIZATION_SHARE - DASHBOARD_SHARE - DATE_DATASET_SHARE
+        datasets = max(1, int(self.documents * share / (1 + FACTS_PER_DATASET + ATTRIBUTES_PER_DATASET)))
+        ldm_datasets = []
+        for d in range(datasets):
+            title = self._title()
+            facts = [
+                self._object("fact", d * FACTS_PER_DATASET + f, f"{title} {self.fake.word()}")
+                for f in range(FACTS_PER_DATASET)
+            ]
+            attributes = []
+            for a in range(ATTRIBUTES_PER_DATASET):
+                attribute_id = d * ATTRIBUTES_PER_DATASET + a
+                attribute_title = f"{title} {self.fake.word()}"
+                labels = [
+                    self._object(f"label_{attribute_id}", n, f"{attribute_title} {self.fake.word()}")
+                    for n in range(LABELS_PER_ATTRIBUTE)
+                ]
+                attributes.append(self._object("attribute", attribute_id, attribute_title, labels=labels))
+            ldm_datasets.append(self._object("dataset", d, title, facts=facts, attributes=attributes))
+        date_instances = [
+            self._object("date", d, f"{self.fake.word()} date", granularities=DATE_GRANULARITIES)
+            for d in range(date_datasets)
+        ]
+        return SimpleNamespace(ldm=SimpleNamespace(datasets=ldm_datasets, date_instances=date_instances))
+
+    def generate_adm(self, ldm: SimpleNamespace) -> SimpleNamespace:
+        facts = [f for d in ldm.ldm.datasets for f in d.facts]
+        attributes = [a for d in ldm.ldm.datasets for a in d.attributes]
+        metrics = [self._object("metric", m, self._title()) for m in range(max(1, int(self.documents * METRIC_SHARE)))]
+        visualizations = []
+        for v in range(max(1, int(self.documents * VISUALIZATION_SHARE))):
+            metric = metrics[v % len(metrics)]
+            fact = facts[v % len(facts)]
+            attribute = attributes[v % len(attributes)]
+            items = [
+                measure_item({"item": {"identifier": {"id": metric.id, "type": "metric"}}}),
+                measure_item({"item": {"identifier": {"id": fact.id, "type": "fact"}}, "aggregation": "SUM"}),
+                {"attribute": {"displayForm": {"identifier": {"id": attribute.labels[0].id}}}},
+            ]
+            title = f"{metric.title} by {attribute.title}"
+            visualizations.append(self._object("visualization", v, title, content={"buckets": [{"items": items}]}))
+        dashboards = [
+            self._object("dashboard", d, f"{self.fake.catch_phrase()} overview")
+            for d in range(max(1, int(self.documents * DASHBOARD_SHARE)))
+        ]
+        return SimpleNamespace(
+            analytics=SimpleNamespace(
+                metrics=metrics, visualization_objects=visualizations, analytical_dashboards=dashboards
+            )
+        )
+
+    def generate(self) -> tuple[SimpleNamespace, SimpleNamespace]:
+        ldm = self.generate_ldm()
+        return ldm, self.generate_adm(ldm)
+
+    def generate_questions(self, count: int) -> list[str]:
+        """Questions naming random words and jobs, as users name metrics and attributes."""
+        return [f"What is the {self.fake.word()} of {self.fake.job()}?" for _ in range(count)]
@@ -0,0 +1,2 @@
+# Ad-hoc scripts calling OpenAI at import time, run them directly with python
+collect_ignore = ["test_duckdb.py", "test_lancedb.py", "test_lancedb_min.py"]
@@ -0,0 +1,141 @@
+import json
+from types import SimpleNamespace
+from typing import Optional
+
+import pytest
+from langchain_core.embeddings import Embeddings
+from openai.types.chat import ChatCompletion
+
+from gooddata.agents.api_agent import ApiAgent
+from gooddata.agents.libs import api_router
+from gooddata.agents.libs.api_router import ApiRouter, benchmark_routing, get_api_router
+from gooddata.agents.libs.api_spec import ApiOperation, CompiledApiSpec
+
+ENTITIES = ["workspaces", "metrics", "facts", "attributes", "labels", "datasets", "users", "dataSources"]
+
+
+class KeywordEmbeddings(Embeddings):
+    """One dimension per entity name, counts how often documents are embedded."""
+
+    model = "keywords"
+
+    def __init__(self) -> None:
+        self.documents_calls = 0
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.documents_calls += 1
+        return [self.embed_query(t) for t in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        text = text.lower()
+        # The constant keeps the vector of a text without any of the words non-zero
+        return [float(text.count(e.lower())) for e in ENTITIES] + [0.1]
+
+
+def operation(index: int, entity: str) -> ApiOperation:
+    return ApiOperation(
+        path=f"/api/v1/entities/workspaces/{{workspaceId}}/{entity}",
+        method="GET",
+        summary=f"Get all {entity}",
+        function_name=f"function_{index}",
+        parameters=[("workspaceId", None, True), ("filter", "Filtering parameter", False)],
+        query_parameters=["filter"],
+    )
+
+
+@pytest.fixture
+def spec(monkeypatch) -> CompiledApiSpec:
+    monkeypatch.setattr(api_router, "_routers", {})
+    operations = [operation(i, e) for i, e in enumerate(ENTITIES[1:])]
+    return CompiledApiSpec(
+        version=1,
+        source_hash="hash",
+        entity_paths=[o.path for o in operations],
+        operations=operations,
+        functions=[o.to_function() for o in operations],
+        apis_description="",
+    )
+
+
+def completion(content: Optional[str] = None, function_call: Optional[dict] = None) -> ChatCompletion:
+    message = {"role": "assistant", "content": content, "function_call": function_call}
+    return ChatCompletion(
+        id="completion",
+        object="chat.completion",
+        created=0,
+        model="gpt",
+        choices=[{"index": 0, "finish_reason": "stop", "message": message}],
+    )
+
+
+def create_agent(answer: ChatCompletion, requests: list[dict]) -> ApiAgent:
+    agent = ApiAgent(openai_api_key="test", workspace_id="demo", response_cache=False)
+
+    def create(**kwargs) -> ChatCompletion:
+        requests.append(kwargs)
+        return answer
+
+    agent.openai_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    agent.get_llm_embeddings = KeywordEmbeddings
+    return agent
+
+
+def test_route_returns_top_k_by_similarity(spec):
+    router = ApiRouter(KeywordEmbeddings(), spec)
+
+    routed = router.route("which metrics and facts are about flights", k=2)
+
+    assert {o.function_name for o in routed} == {"function_0", "function_1"}
+    assert [o.path.rsplit("/", 1)[1] for o in router.route("list users", k=1)] == ["users"]
+
+
+def test_router_is_shared_per_spec_and_model(spec):
+    embeddings = KeywordEmbeddings()
+
+    router = get_api_router(embeddings, spec, "keywords")
+
+    assert get_api_router(embeddings, spec, "keywords") is router
+    assert get_api_router(embeddings, spec, "other") is not router
+    assert embeddings.documents_calls == 2
+
+
+def test_benchmark_routing(spec):
+    router = ApiRouter(KeywordEmbeddings(), spec)
+    questions = [
+        ("list metrics", "/api/v1/entities/workspaces/{workspaceId}/metrics"),
+        ("list users", "/api/v1/entities/workspaces/{workspaceId}/users"),
+        ("list users", "/api/v1/entities/workspaces/{workspaceId}/facts"),
+    ]
+
+    result = benchmark_routing(router, questions, k=1)
+
+    assert (result.total, result.hits) == (3, 2)
+    assert result.recall == pytest.approx(2 / 3)
+    assert result.mrr == pytest.approx(2 / 3)
+    assert result.misses[0]["routed"] == ["/api/v1/entities/workspaces/{workspaceId}/users"]
+
+
+def test_only_routed_operations_are_sent_as_functions(spec):
+    requests = []
+    call = {"name": "function_0", "arguments": json.dumps({"filter": "title=containsic=flight"})}
+    agent = create_agent(completion(function_call=call), requests)
+
+    path = agent.get_routed_api_path("show me metrics related to flights", spec)
+
+    assert path == "/api/v1/entities/workspaces/demo/metrics?filter=title%3Dcontainsic%3Dflight"
+    assert len(requests[0]["functions"]) == api_router.DEFAULT_ROUTING_SIZE
+    assert requests[0]["functions"][0]["name"] == "function_0"
+
+
+@pytest.mark.parametrize(
+    "answer",
+    [
+        completion(content="/api/v1/entities/workspaces"),
+        # A function which was not offered
+        completion(content="/api/v1/entities/workspaces", function_call={"name": "function_99", "arguments": "{}"}),
+    ],
+)
+def test_answer_without_routed_function_falls_back_to_the_path(spec, answer):
+    agent = create_agent(answer, [])
+
+    assert agent.get_routed_api_path("list workspaces", spec) == "/api/v1/entities/workspaces"
@@ -0,0 +1,114 @@
+import pickle
+
+import pytest
+
+from gooddata.agents.libs import api_spec
+from gooddata.agents.libs.api_spec import (
+    API_SPEC_ARTIFACT_VERSION,
+    ApiOperation,
+    CompiledApiSpec,
+    compile_api_spec,
+    hash_file,
+    load_api_spec,
+    save_api_spec,
+)
+
+OPERATION = ApiOperation(
+    path="/api/v1/entities/workspaces/{workspaceId}/metrics",
+    method="GET",
+    summary="Get all Metrics",
+    function_name="function_0",
+    parameters=[
+        ("workspaceId", None, True),
+        ("filter", "Filtering parameter in RSQL", False),
+        ("size", "The size of the page to be returned", False),
+    ],
+    query_parameters=["filter", "size"],
+)
+
+
+@pytest.fixture
+def compiled(monkeypatch, tmp_path):
+    """Spec and artifact in tmp_path, compile_api_spec is counted and needs no parser."""
+    spec_path = tmp_path / "spec.json"
+    spec_path.write_text('{"openapi": "3.0.1"}')
+    calls = []
+
+    def compile_spec(path):
+        calls.append(path)
+        return CompiledApiSpec(
+            version=API_SPEC_ARTIFACT_VERSION,
+            source_hash=hash_file(path),
+            entity_paths=[OPERATION.path],
+            operations=[OPERATION],
+            functions=[OPERATION.to_function()],
+            apis_description="",
+        )
+
+    monkeypatch.setattr(api_spec, "compile_api_spec", compile_spec)
+    monkeypatch.setattr(api_spec, "_specs", {})
+    return spec_path, tmp_path / "artifact.pickle", calls
+
+
+def test_compile_entity_get_operations():
+    pytest.importorskip("openapi_parser")
+
+    spec = compile_api_spec()
+
+    assert spec.source_hash == hash_file(api_spec.API_SPEC_PATH)
+    assert all(p.startswith(api_spec.ENTITIES_PATH_PREFIX) for p in spec.entity_paths)
+    assert all(o.method == "GET" for o in spec.operations)
+    assert [f["name"] for f in spec.functions] == [f"function_{i}" for i in range(len(spec.operations))]
+    assert spec.operations_by_function["function_0"] is spec.operations[0]
+    assert "API path: " + spec.operations[0].path in spec.apis_description
+
+
+def test_artifact_is_reused_when_the_source_hash_matches(compiled):
+    spec_path, artifact_path, calls = compiled
+
+    first = load_api_spec(spec_path, artifact_path)
+    assert artifact_path.exists()
+    # The process-wide instance is reused
+    assert load_api_spec(spec_path, artifact_path) is first
+    # A new process reads the artifact
+    api_spec._specs.clear()
+    assert load_api_spec(spec_path, artifact_path).operations == [OPERATION]
+
+    assert calls == [spec_path]
+
+
+def test_changed_source_is_recompiled(compiled):
+    spec_path, artifact_path, calls = compiled
+    load_api_spec(spec_path, artifact_path)
+
+    spec_path.write_text('{"openapi": "3.0.2"}')
+    spec = load_api_spec(spec_path, artifact_path)
+
+    assert spec.source_hash == hash_file(spec_path)
+    assert len(calls) == 2
+
+
+def test_artifact_of_another_version_is_recompiled(compiled):
+    spec_path, artifact_path, calls = compiled
+    stale = load_api_spec(spec_path, artifact_path)
+    stale.version = API_SPEC_ARTIFACT_VERSION - 1
+    save_api_spec(stale, artifact_path)
+    api_spec._specs.clear()
+
+    assert load_api_spec(spec_path, artifact_path).version == API_SPEC_ARTIFACT_VERSION
+    assert len(calls) == 2
+    with open(artifact_path, "rb") as fp:
+        assert pickle.load(fp).version == API_SPEC_ARTIFACT_VERSION
+
+
+def test_to_url_fills_path_and_query():
+    url = OPERATION.to_url({"filter": "title==Revenue", "size": "5"}, defaults={"workspaceId": "demo"})
+
+    assert url == "/api/v1/entities/workspaces/demo/metrics?filter=title%3D%3DRevenue&size=5"
+
+
+def test_to_url_skips_empty_query_parameters():
+    # Arguments override the defaults
+    url = OPERATION.to_url({"workspaceId": "other", "filter": ""}, defaults={"workspaceId": "demo", "size": None})
+
+    assert url == "/api/v1/entities/workspaces/other/metrics"
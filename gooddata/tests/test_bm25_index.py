@@ -0,0 +1,65 @@
+from langchain_core.documents import Document
+
+from gooddata.agents.libs.bm25_index import BM25Index, tokenize
+from gooddata.agents.libs.hybrid_retriever import reciprocal_rank_fusion
+from gooddata.agents.libs.vector_stores.search_filter import SearchFilter
+
+
+def document(object_type: str, object_id: str, title: str) -> Document:
+    return Document(
+        page_content=f"{object_type} {title}",
+        metadata={"object_type": object_type, "id": object_id, "title": title, "workspace_id": "ws"},
+    )
+
+
+DOCUMENTS = [
+    document("metric", "revenue_by_month", "Revenue by month"),
+    document("metric", "order_count", "Number of orders"),
+    document("attribute", "customer.region", "Customer region"),
+]
+
+
+def test_identifiers_are_tokenized_whole_and_in_parts():
+    assert tokenize("Show revenue_by_month per date.month") == [
+        "show",
+        "revenue_by_month",
+        "revenue",
+        "by",
+        "month",
+        "per",
+        "date.month",
+        "date",
+        "month",
+    ]
+
+
+def test_search_ranks_and_filters(tmp_path):
+    index = BM25Index(path=tmp_path / "index.json")
+    assert index.sync(DOCUMENTS)
+    assert [d.metadata["id"] for d, _ in index.search("orders", k=3)] == ["order_count"]
+    assert index.search("region", k=3, search_filter=SearchFilter(object_types=["metric"])) == []
+    assert [d.metadata["id"] for d in index.exact_match("  `Customer  Region` ")] == ["customer.region"]
+
+
+def test_sync_is_incremental_and_persistent(tmp_path):
+    index = BM25Index(path=tmp_path / "index.json")
+    index.sync(DOCUMENTS)
+    assert not index.sync(DOCUMENTS)
+    index.save()
+
+    loaded = BM25Index.load(tmp_path / "index.json")
+    changed = [DOCUMENTS[0], document("metric", "order_count", "Order volume")]
+    assert loaded.sync(changed)
+    assert loaded.search("region", k=3) == []
+    assert loaded.search("orders", k=3) == []
+    assert [d.metadata["id"] for d, _ in loaded.search("volume", k=3)] == ["order_count"]
+
+
+def test_reciprocal_rank_fusion_merges_rankings_by_object():
+    revenue, orders, region = DOCUMENTS
+    # Vector stores return the same objects with store-specific metadata
+    vector_orders = Document(page_content=orders.page_content, metadata={"metadata": orders.metadata, "_distance": 0.1})
+    fused = reciprocal_rank_fusion([[revenue, orders], [vector_orders, region]], k=3)
+    assert fused[0] is orders
+    assert fused[1:] == [revenue, region]
+    assert reciprocal_rank_fusion([[revenue, orders], [vector_orders, region]], k=1) == [orders]
@@ -0,0 +1,81 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep, time
+
+import pytest
+
+from gooddata.agents.libs import cache as cache_module
+from gooddata.agents.libs.cache import TTLCache, get_cache
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module, "time", lambda: now[0])
+    cache = TTLCache(ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=100)
+    now[0] += 11
+    assert "a" not in cache
+    assert cache.get("b") == 2
+    assert cache.get("a", "missing") == "missing"
+    assert cache.stats.hits == 1 and cache.stats.misses == 1
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = TTLCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert "b" not in cache and "a" in cache and "c" in cache
+    assert cache.stats.evictions == 1
+
+
+def test_concurrent_misses_compute_once():
+    cache = TTLCache()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "value"
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        owner = executor.submit(cache.get_or_compute, "key", compute)
+        started.wait(5)
+        waiters = [executor.submit(cache.get_or_compute, "key", compute) for _ in range(3)]
+        # All callers missed the cache and wait for the owner
+        deadline = time() + 5
+        while cache.stats.misses < 4 and time() < deadline:
+            sleep(0.001)
+        release.set()
+        results = [owner.result()] + [w.result() for w in waiters]
+    assert results == ["value"] * 4
+    assert calls == [1]
+
+
+def test_failed_computation_is_not_cached():
+    cache = TTLCache()
+
+    def fail():
+        raise RuntimeError("Failed")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("key", fail)
+    assert cache.get_or_compute("key", lambda: "value") == "value"
+
+
+def test_cache_persists_entries(tmp_path):
+    TTLCache(persist_path=tmp_path / "cache.pickle").set("a", 1)
+    assert TTLCache(persist_path=tmp_path / "cache.pickle").get("a") == 1
+
+
+def test_get_cache_rejects_different_configuration():
+    cache = get_cache("test_get_cache", max_entries=10, ttl=60)
+    assert get_cache("test_get_cache", ttl=60) is cache
+    assert get_cache("test_get_cache") is cache
+    with pytest.raises(ValueError):
+        get_cache("test_get_cache", ttl=120)
@@ -0,0 +1,164 @@
+import asyncio
+import copy
+import threading
+from typing import Optional
+
+import pytest
+
+from gooddata.agents.libs.chat_poller import BackoffPolicy, ChatHistoryTracker, ChatInteractionDriver, retry_after
+
+FAST_POLICY = BackoffPolicy(initial_interval=0.001, max_interval=0.01, timeout=5.0)
+
+
+class FakeApiError(Exception):
+    def __init__(self, status: int, headers: Optional[dict] = None) -> None:
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.headers = headers
+
+
+def interaction(interaction_id: int, finished: bool, text: str = "") -> dict:
+    return {"chatHistoryInteractionId": interaction_id, "interactionFinished": finished, "textResponse": text}
+
+
+class FakeChatHistory:
+    """Chat API answering each question in a few polls, one word of the answer per poll."""
+
+    def __init__(self, words_per_answer: int = 3, errors: Optional[list[Exception]] = None) -> None:
+        self.words_per_answer = words_per_answer
+        self.errors = errors or []
+        self.interactions: list[dict] = []
+        self.requested_from: list[int] = []
+        self._lock = threading.Lock()
+
+    def ask(self, question: str) -> None:
+        with self._lock:
+            self.interactions.append(interaction(len(self.interactions) + 1, False))
+
+    def get_history(self, from_interaction_id: int) -> dict:
+        with self._lock:
+            self.requested_from.append(from_interaction_id)
+            if self.errors:
+                raise self.errors.pop(0)
+            for i in self.interactions:
+                if not i["interactionFinished"]:
+                    i["textResponse"] = f"{i['textResponse']} word".strip()
+                    i["interactionFinished"] = len(i["textResponse"].split()) >= self.words_per_answer
+            return {
+                "interactions": [
+                    copy.deepcopy(i) for i in self.interactions if i["chatHistoryInteractionId"] > from_interaction_id
+                ]
+            }
+
+
+async def collect(driver: ChatInteractionDriver, question: str) -> list[list[dict]]:
+    return [changed async for changed in driver.arun(question)]
+
+
+def run_driver(history: FakeChatHistory, tracker: ChatHistoryTracker, policy: BackoffPolicy = FAST_POLICY) -> list:
+    driver = ChatInteractionDriver(history.ask, history.get_history, tracker, policy)
+    return asyncio.run(collect(driver, "question"))
+
+
+def test_tracker_merges_new_and_changed_interactions():
+    interactions = [interaction(1, True, "first")]
+    tracker = ChatHistoryTracker(interactions, last_interaction_id=1)
+
+    assert tracker.apply([interaction(2, False, "partial")]) == [interaction(2, False, "partial")]
+    assert tracker.last_interaction_id == 1
+    assert not tracker.finished
+    # Unchanged interactions are not reported again
+    assert tracker.apply([interaction(2, False, "partial")]) == []
+
+    assert tracker.apply([interaction(1, True, "first"), interaction(2, True, "done")]) == [
+        interaction(2, True, "done")
+    ]
+    assert tracker.last_interaction_id == 2
+    assert tracker.finished
+    # The list of the caller is updated in place
+    assert interactions == [interaction(1, True, "first"), interaction(2, True, "done")]
+
+
+def test_tracker_accepts_string_ids():
+    tracker = ChatHistoryTracker([interaction(1, False)])
+    changed = tracker.apply([{**interaction(1, True, "done"), "chatHistoryInteractionId": "1"}])
+
+    assert len(changed) == 1
+    assert len(tracker.interactions) == 1
+    assert tracker.last_interaction_id == 1
+
+
+def test_driver_polls_until_answer_is_finished():
+    history = FakeChatHistory()
+    tracker = ChatHistoryTracker([])
+
+    updates = run_driver(history, tracker)
+
+    assert updates[-1] == [interaction(1, True, "word word word")]
+    assert tracker.interactions == [interaction(1, True, "word word word")]
+    assert tracker.last_interaction_id == 1
+
+
+def test_driver_requests_only_interactions_after_last_finished():
+    history = FakeChatHistory()
+    tracker = ChatHistoryTracker([])
+    run_driver(history, tracker)
+    history.requested_from.clear()
+
+    updates = run_driver(history, tracker)
+
+    assert set(history.requested_from) == {1}
+    assert all(i["chatHistoryInteractionId"] == 2 for changed in updates for i in changed)
+    assert [i["chatHistoryInteractionId"] for i in tracker.interactions] == [1, 2]
+    assert tracker.finished
+
+
+def test_driver_retries_throttled_requests():
+    history = FakeChatHistory(errors=[FakeApiError(429, {"Retry-After": "0"}), FakeApiError(503)])
+    tracker = ChatHistoryTracker([])
+
+    run_driver(history, tracker)
+
+    assert tracker.finished
+    assert not history.errors
+
+
+def test_driver_raises_other_errors():
+    history = FakeChatHistory(errors=[FakeApiError(500)])
+
+    with pytest.raises(FakeApiError):
+        run_driver(history, ChatHistoryTracker([]))
+
+
+def test_driver_raises_errors_of_the_question():
+    history = FakeChatHistory()
+
+    def ask(question: str) -> None:
+        raise ValueError("invalid question")
+
+    driver = ChatInteractionDriver(ask, history.get_history, ChatHistoryTracker([]), FAST_POLICY)
+    with pytest.raises(ValueError, match="invalid question"):
+        asyncio.run(collect(driver, "question"))
+
+
+def test_driver_stops_after_timeout():
+    history = FakeChatHistory(words_per_answer=1_000_000)
+    tracker = ChatHistoryTracker([])
+
+    run_driver(history, tracker, BackoffPolicy(initial_interval=0.001, max_interval=0.01, timeout=0.05))
+
+    assert not tracker.finished
+
+
+@pytest.mark.parametrize(
+    "e, expected",
+    [
+        (FakeApiError(429, {"Retry-After": "2"}), 2.0),
+        (FakeApiError(503, {"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}), 0.0),
+        (FakeApiError(429), 0.0),
+        (FakeApiError(500, {"Retry-After": "2"}), None),
+        (ValueError(), None),
+    ],
+)
+def test_retry_after(e, expected):
+    assert retry_after(e) == expected
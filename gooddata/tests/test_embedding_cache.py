@@ -0,0 +1,62 @@
+import subprocess
+import sys
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from gooddata.agents.libs.embedding_cache import CachedEmbeddings, EmbeddingCache, text_hash
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    embedded: list[str] = []
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.embedded.extend(texts)
+        return super().embed_documents(texts)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = EmbeddingCache(tmp_path / "cache.duckdb", max_entries=2)
+    cache.put_many("model", {"a": [1.0], "b": [2.0]})
+    # Reading "a" makes "b" the least recently used
+    assert cache.get_many("model", ["a"]) == {"a": [1.0]}
+    cache.put_many("model", {"c": [3.0]})
+    assert set(cache.get_many("model", ["a", "b", "c"])) == {"a", "c"}
+    assert cache.stats.evictions == 1
+
+
+def test_texts_are_embedded_once(tmp_path):
+    embedding = CountingEmbedding(size=8, embedded=[])
+    cached = CachedEmbeddings(embedding, "model", EmbeddingCache(tmp_path / "cache.duckdb"))
+    vectors = cached.embed_documents(["revenue", "revenue", " revenue ", "costs"])
+    # Texts differing only in whitespace share the embedding
+    assert len(embedding.embedded) == 2
+    assert vectors[0] == vectors[1] == vectors[2] != vectors[3]
+
+    cached.embed_documents(["costs", "revenue"])
+    assert len(embedding.embedded) == 2
+    assert cached.stats.hits == 2 and cached.stats.misses == 2
+    assert set(cached.cache.get_many("model", [text_hash("costs"), text_hash("revenue")])) == {
+        text_hash("costs"),
+        text_hash("revenue"),
+    }
+
+
+def test_file_locked_by_another_process_falls_back_to_memory(tmp_path):
+    db_path = tmp_path / "cache.duckdb"
+    holder = subprocess.Popen(
+        [
+            sys.executable,
+            "-c",
+            f"import duckdb, time; c = duckdb.connect({str(db_path)!r}); print(1, flush=True); time.sleep(60)",
+        ],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        holder.stdout.readline()
+        cache = EmbeddingCache(db_path)
+        cache.put_many("model", {"a": [1.0]})
+        assert cache.get_many("model", ["a"]) == {"a": [1.0]}
+    finally:
+        holder.kill()
+        holder.wait()
@@ -0,0 +1,193 @@
+import itertools
+import threading
+from time import sleep
+from typing import Optional
+
+import httpx
+import openai
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+
+from gooddata.agents.libs import embedding_pipeline
+from gooddata.agents.libs.embedding_cache import CachedEmbeddings, EmbeddingCache
+from gooddata.agents.libs.embedding_pipeline import EmbeddingPipeline, RateLimiter, token_batches
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+
+
+class FakeClock:
+    """Replaces monotonic and sleep of the pipeline, sleeping only moves the clock."""
+
+    def __init__(self, monkeypatch) -> None:
+        self.now = 1000.0
+        self.sleeps: list[float] = []
+        monkeypatch.setattr(embedding_pipeline, "monotonic", lambda: self.now)
+        monkeypatch.setattr(embedding_pipeline, "sleep", self.sleep)
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class CountingEmbedding(Embeddings):
+    """Fails with the given errors first, then embeds and remembers the texts."""
+
+    def __init__(self, errors: Optional[list[Exception]] = None) -> None:
+        self.embedding = DeterministicFakeEmbedding(size=8)
+        self.calls: list[list[str]] = []
+        self.errors = errors or []
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls.append(texts)
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.embedding.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+def document(tokens: int, name: str = "") -> Document:
+    # 4 characters per estimated token
+    return Document(page_content=name.ljust(tokens * 4, "x"))
+
+
+def rate_limit_error(retry_after: str) -> openai.RateLimitError:
+    response = httpx.Response(429, headers={"retry-after": retry_after}, request=REQUEST)
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+def test_token_batches_are_limited_by_tokens_and_size():
+    documents = [document(40), document(40), document(30), document(100), document(1), document(1), document(1)]
+
+    batches = list(token_batches(documents, max_batch_tokens=100, max_batch_size=2))
+
+    assert [[len(d.page_content) // 4 for d in b] for b in batches] == [[40, 40], [30], [100], [1, 1], [1]]
+
+
+def test_token_batches_are_lazy():
+    documents = (document(1, str(i)) for i in itertools.count())
+
+    first = next(token_batches(documents, max_batch_size=3))
+
+    assert len(first) == 3
+    # Only one document after the first batch was read
+    assert next(documents).page_content.startswith("4")
+
+
+def test_rate_limiter_waits_for_the_token_budget(monkeypatch):
+    clock = FakeClock(monkeypatch)
+    limiter = RateLimiter(tokens_per_minute=100, requests_per_minute=1000)
+
+    limiter.acquire(60)
+    assert clock.sleeps == []
+    limiter.acquire(60)
+
+    # 20 missing tokens are refilled in 12 seconds
+    assert sum(clock.sleeps) == pytest.approx(12, abs=0.1)
+
+
+def test_rate_limiter_waits_for_the_request_budget(monkeypatch):
+    clock = FakeClock(monkeypatch)
+    limiter = RateLimiter(tokens_per_minute=1_000_000, requests_per_minute=2)
+
+    for _ in range(3):
+        limiter.acquire(1)
+
+    assert sum(clock.sleeps) == pytest.approx(30, abs=0.1)
+
+
+def test_rate_limiter_pauses_and_halves_the_rate_on_rate_limit(monkeypatch):
+    clock = FakeClock(monkeypatch)
+    limiter = RateLimiter(tokens_per_minute=100, requests_per_minute=1000)
+
+    limiter.on_rate_limit(5)
+    limiter.acquire(1)
+
+    assert sum(clock.sleeps) == pytest.approx(5, abs=0.1)
+    assert limiter.rate_factor == 0.5
+    limiter.on_success()
+    assert limiter.rate_factor == pytest.approx(0.525)
+
+
+def test_transient_errors_are_retried(monkeypatch):
+    clock = FakeClock(monkeypatch)
+    embedding = CountingEmbedding([openai.APIConnectionError(request=REQUEST)])
+    pipeline = EmbeddingPipeline(embedding, max_retries=2)
+
+    batch = [document(1, "a"), document(1, "b")]
+    assert pipeline.embed_batch(batch) == batch
+
+    assert len(embedding.calls) == 2
+    assert clock.sleeps == [embedding_pipeline.INITIAL_BACKOFF]
+
+
+def test_rate_limit_errors_pause_all_workers(monkeypatch):
+    clock = FakeClock(monkeypatch)
+    embedding = CountingEmbedding([rate_limit_error("7")])
+    pipeline = EmbeddingPipeline(embedding)
+
+    pipeline.embed_batch([document(1)])
+
+    assert len(embedding.calls) == 2
+    assert pipeline.rate_limiter.rate_factor < 1
+    assert sum(clock.sleeps) == pytest.approx(7, abs=0.1)
+
+
+def test_errors_are_raised_after_the_last_retry(monkeypatch):
+    FakeClock(monkeypatch)
+    errors = [openai.APIConnectionError(request=REQUEST) for _ in range(3)]
+    embedding = CountingEmbedding(errors)
+
+    with pytest.raises(openai.APIConnectionError):
+        EmbeddingPipeline(embedding, max_retries=2).embed_batch([document(1)])
+    assert len(embedding.calls) == 3
+
+
+def test_batches_in_flight_are_bounded():
+    pulled = 0
+    written = 0
+    max_ahead = 0
+    lock = threading.Lock()
+
+    def documents():
+        nonlocal pulled, max_ahead
+        for i in range(50):
+            with lock:
+                pulled += 1
+                max_ahead = max(max_ahead, pulled - written)
+            yield document(1, str(i))
+
+    class SlowEmbedding(DeterministicFakeEmbedding):
+        def embed_documents(self, texts: list[str]) -> list[list[float]]:
+            sleep(0.002)
+            return super().embed_documents(texts)
+
+    def write_batch(batch: list[Document]) -> None:
+        nonlocal written
+        with lock:
+            written += len(batch)
+
+    pipeline = EmbeddingPipeline(SlowEmbedding(size=8), concurrency=2, max_batch_size=1)
+
+    assert pipeline.run(documents(), write_batch) == 50
+    # Two batches per worker in flight, one batch waiting for a free slot and one document read ahead by token_batches
+    assert max_ahead <= 2 * 2 + 2
+
+
+def test_cached_texts_do_not_use_the_rate_limit(tmp_path):
+    embedding = CountingEmbedding()
+    cached = CachedEmbeddings(embedding, "model", EmbeddingCache(tmp_path / "cache.duckdb"))
+    documents = [document(1, "a"), document(1, "b")]
+    EmbeddingPipeline(cached).run(documents, lambda batch: None)
+    assert len(embedding.calls) == 1
+
+    pipeline = EmbeddingPipeline(cached)
+    acquired = []
+    pipeline.rate_limiter.acquire = acquired.append
+    pipeline.run(documents + [document(2, "c")], lambda batch: None)
+
+    # Only the new text is requested and charged
+    assert embedding.calls[1] == [document(2, "c").page_content]
+    assert acquired == [2]
@@ -0,0 +1,119 @@
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+from gooddata_sdk import Attribute, ExecutionDefinition, ObjId, SimpleMetric, TableDimension
+
+from gooddata.agents.libs import execution_cache
+from gooddata.agents.libs.execution_cache import CachedExecutionFrames, ExecutionCache, execution_key
+
+
+def exec_def(*attribute_ids: str) -> ExecutionDefinition:
+    return ExecutionDefinition(
+        attributes=[Attribute(local_id=a, label=a) for a in attribute_ids],
+        metrics=[SimpleMetric(local_id="revenue", item=ObjId("revenue", type="metric"))],
+        filters=[],
+        dimensions=[TableDimension(item_ids=list(attribute_ids)), TableDimension(item_ids=["measureGroup"])],
+    )
+
+
+class StubFrames:
+    """Stand-in for gooddata_pandas DataFrameFactory counting executions."""
+
+    def __init__(self) -> None:
+        self.calls: list[str] = []
+
+    def for_items(self, items: dict, auto_index: bool = True) -> pd.DataFrame:
+        self.calls.append("for_items")
+        return pd.DataFrame({name: [1.0, 2.0] for name in items})
+
+    def for_exec_def(self, exec_def: ExecutionDefinition) -> tuple[pd.DataFrame, SimpleNamespace]:
+        self.calls.append("for_exec_def")
+        metadata = SimpleNamespace(execution_response=SimpleNamespace(result_id="result_1"))
+        return pd.DataFrame({"revenue": [1.0, 2.0]}), metadata
+
+    def for_exec_result_id(self, result_id: str) -> tuple[pd.DataFrame, SimpleNamespace]:
+        self.calls.append("for_exec_result_id")
+        return pd.DataFrame({"revenue": [3.0]}), SimpleNamespace()
+
+
+@pytest.fixture
+def cache(tmp_path) -> ExecutionCache:
+    return ExecutionCache(tmp_path / "execution_cache")
+
+
+def test_equal_definitions_share_the_key():
+    assert execution_key("org", "ws", exec_def("region", "city")) == execution_key(
+        "org", "ws", exec_def("region", "city")
+    )
+    assert execution_key("org", "ws", {"a": 1, "b": 2}) == execution_key("org", "ws", {"b": 2, "a": 1})
+    assert execution_key("org", "ws", exec_def("region")) != execution_key("org", "ws", exec_def("city"))
+    assert execution_key("org", "ws", exec_def("region")) != execution_key("org", "other", exec_def("region"))
+    assert execution_key("org", "ws", exec_def("region")) != execution_key("other", "ws", exec_def("region"))
+
+
+def test_repeated_executions_are_served_from_cache(cache):
+    stub = StubFrames()
+    frames = CachedExecutionFrames(stub, "org", "ws", cache)
+
+    first, result_id = frames.for_exec_def(exec_def("region"))
+    second, second_result_id = frames.for_exec_def(exec_def("region"))
+    items = frames.for_items({"revenue": "metric/revenue"}, auto_index=False)
+    frames.for_items({"revenue": "metric/revenue"}, auto_index=False)
+
+    pd.testing.assert_frame_equal(first, second)
+    assert result_id == second_result_id == "result_1"
+    assert list(items.columns) == ["revenue"]
+    assert stub.calls == ["for_exec_def", "for_items"]
+
+
+def test_result_id_of_cached_execution_is_read_locally(cache):
+    stub = StubFrames()
+    frames = CachedExecutionFrames(stub, "org", "ws", cache)
+    df, result_id = frames.for_exec_def(exec_def("region"))
+
+    pd.testing.assert_frame_equal(frames.for_exec_result_id(result_id), df)
+    # Unknown result IDs are fetched once and cached
+    frames.for_exec_result_id("result_2")
+    frames.for_exec_result_id("result_2")
+    assert stub.calls == ["for_exec_def", "for_exec_result_id"]
+
+
+def test_index_survives_restart(cache):
+    cache.put("key", pd.DataFrame({"a": [1]}), "result_1")
+
+    restarted = ExecutionCache(cache.cache_dir)
+
+    assert restarted.get("key")[1] == "result_1"
+    pd.testing.assert_frame_equal(restarted.get_by_result_id("result_1"), pd.DataFrame({"a": [1]}))
+
+
+def test_expired_entries_are_removed(cache, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(execution_cache, "time", lambda: now[0])
+    cache.ttl = 10
+    cache.put("key", pd.DataFrame({"a": [1]}), "result_1")
+
+    now[0] += 9
+    assert cache.get("key") is not None
+    now[0] += 1
+    assert cache.get("key") is None
+    assert cache.get_by_result_id("result_1") is None
+    assert list(cache.cache_dir.glob("*.parquet")) == []
+
+
+def test_least_recently_used_entries_are_evicted_by_size(cache):
+    df = pd.DataFrame({"a": range(100)})
+    cache.put("first", df, "result_1")
+    cache.max_bytes = cache.size * 2
+    cache.put("second", df)
+    # first becomes the most recently used
+    cache.get("first")
+
+    cache.put("third", df)
+
+    assert cache.get_path("second") is None
+    assert cache.get_path("first") is not None
+    assert cache.get_path("third") is not None
+    assert cache.stats.evictions == 1
+    assert cache.size <= cache.max_bytes
@@ -0,0 +1,118 @@
+from types import SimpleNamespace
+
+import pytest
+
+from gooddata.agents.libs.execution_cache import ExecutionCache
+from gooddata.agents.libs.execution_reader import PagedExecutionReader
+
+DIMENSIONS = [
+    {"headers": [{"attributeHeader": {"localIdentifier": "region"}}]},
+    {"headers": [{"measureGroupHeaders": [{"localIdentifier": "revenue"}]}]},
+]
+
+
+class FakeResult:
+    def __init__(self, rows: list[tuple[str, float]], offset: int, total: int) -> None:
+        self.rows = rows
+        self.offset = offset
+        self.total = total
+
+    @property
+    def data(self) -> list[list[float]]:
+        return [[value] for _, value in self.rows]
+
+    def get_all_header_values(self, dim: int, header_idx: int) -> list[str]:
+        return [region for region, _ in self.rows]
+
+    def is_complete(self, dim: int) -> bool:
+        return self.offset + len(self.rows) >= self.total
+
+    @property
+    def paging_total(self) -> list[int]:
+        return [self.total, 1]
+
+    def next_page_start(self, dim: int) -> int:
+        return self.offset + len(self.rows)
+
+
+class FakeExecution:
+    def __init__(self, rows: list[tuple[str, float]]) -> None:
+        self.rows = rows
+        self.dimensions = DIMENSIONS
+        self.result_id = "result"
+        self.read_offsets: list[int] = []
+
+    def read_result(self, limit: list[int], offset: list[int]) -> FakeResult:
+        self.read_offsets.append(offset[0])
+        page = self.rows[offset[0] : offset[0] + limit[0]]
+        return FakeResult(page, offset[0], len(self.rows))
+
+
+@pytest.fixture
+def execution() -> FakeExecution:
+    return FakeExecution([(f"region_{i}", float(i)) for i in range(25)])
+
+
+@pytest.fixture
+def cache(tmp_path) -> ExecutionCache:
+    return ExecutionCache(tmp_path / "execution_cache")
+
+
+def create_reader(execution: FakeExecution, cache: ExecutionCache, **kwargs) -> PagedExecutionReader:
+    sdk = SimpleNamespace(compute=SimpleNamespace(for_exec_def=lambda workspace_id, exec_def: execution))
+    return PagedExecutionReader(sdk, "ws", {"exec_def": 1}, "test", page_size=10, cache=cache, **kwargs)
+
+
+def test_pages_become_batches(execution, cache):
+    batches = list(create_reader(execution, cache, column_names={"revenue": "Revenue"}))
+
+    assert [b.num_rows for b in batches] == [10, 10, 5]
+    assert execution.read_offsets == [0, 10, 20]
+    assert batches[0].schema.names == ["region", "Revenue"]
+    assert batches[2].column(0).to_pylist() == [f"region_{i}" for i in range(20, 25)]
+    assert batches[2].column(1).to_pylist() == [20.0, 21.0, 22.0, 23.0, 24.0]
+
+
+def test_second_read_is_served_from_cache(execution, cache):
+    table = create_reader(execution, cache).read_all()
+    execution.read_offsets.clear()
+
+    reader = create_reader(execution, cache)
+    assert reader.read_all().to_pydict() == table.to_pydict()
+    assert reader.result_id == "result"
+    assert execution.read_offsets == []
+    assert cache.stats.hits >= 1
+
+
+def test_max_rows_reads_whole_pages_and_is_not_cached(execution, cache):
+    reader = create_reader(execution, cache)
+    table = reader.read_all(max_rows=11)
+
+    assert table.num_rows == 20
+    assert execution.read_offsets == [0, 10]
+    assert reader.truncated
+    assert cache.size == 0
+    # The complete result is read and cached by the next reader
+    assert create_reader(execution, cache).read_all().num_rows == 25
+    assert cache.size > 0
+
+
+def test_different_column_names_are_cached_separately(execution, cache):
+    create_reader(execution, cache).read_all()
+    renamed = create_reader(execution, cache, column_names={"region": "Region"}).read_all()
+
+    assert renamed.schema.names == ["Region", "revenue"]
+    assert execution.read_offsets == [0, 10, 20, 0, 10, 20]
+
+
+def test_max_rows_covering_the_whole_result_is_cached(execution, cache):
+    reader = create_reader(execution, cache)
+    assert reader.read_all(max_rows=25).num_rows == 25
+    assert not reader.truncated
+    assert cache.size > 0
+
+    # Truncation is known from the cached file too
+    cached_reader = create_reader(execution, cache)
+    assert cached_reader.read_all(max_rows=5).num_rows == 10
+    assert cached_reader.truncated
+    assert execution.read_offsets == [0, 10, 20]
@@ -0,0 +1,106 @@
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from gooddata.agents.libs.index_manifest import IndexManifest, SharedIndexManifest, document_key, shared_document_key
+from gooddata.agents.libs.rag_langchain import GoodDataRAGSimple, VectorDB
+
+
+def document(object_id: str, content: str = "", workspace_id: str = "ws") -> Document:
+    return Document(
+        page_content=content or f"metric {object_id}",
+        metadata={"object_type": "metric", "id": object_id, "workspace_id": workspace_id},
+    )
+
+
+def test_diff_detects_new_changed_and_deleted_documents(tmp_path):
+    manifest = IndexManifest(path=tmp_path / "manifest.json")
+    manifest.apply(manifest.diff([document("kept"), document("changed"), document("deleted")]))
+    manifest.save()
+
+    manifest = IndexManifest.load(tmp_path / "manifest.json")
+    version = manifest.version
+    diff = manifest.diff([document("kept"), document("changed", "new content"), document("new")])
+    assert sorted(d.metadata["id"] for d in diff.to_upsert) == ["changed", "new"]
+    assert diff.to_delete == [document_key(document("deleted"))]
+
+    manifest.apply(diff)
+    assert manifest.version != version
+    assert manifest.diff([document("kept"), document("changed", "new content"), document("new")]).is_empty
+
+
+def test_shared_manifest_tracks_membership_of_workspaces(tmp_path):
+    manifest = SharedIndexManifest(path=tmp_path / "manifest.json")
+    diff = manifest.sync_workspace("a", [document("shared", workspace_id="a"), document("only_a", workspace_id="a")])
+    assert len(diff.to_upsert) == 2
+
+    # Identical document of another workspace is stored once
+    diff = manifest.sync_workspace("b", [document("shared", workspace_id="b")])
+    shared_key = shared_document_key(document("shared"))
+    assert diff.to_upsert == [] and diff.joined == [shared_key]
+
+    diff = manifest.sync_workspace("a", [])
+    assert diff.left == [shared_key]
+    assert diff.to_delete == [shared_document_key(document("only_a"))]
+    assert "a" not in manifest.memberships
+
+    # Slot of the deleted document is reused
+    manifest.sync_workspace("b", [document("shared", workspace_id="b"), document("new", workspace_id="b")])
+    assert None not in manifest.keys
+    manifest.save()
+    assert sorted(SharedIndexManifest.load(tmp_path / "manifest.json").workspace_keys("b")) == sorted(
+        [shared_key, shared_document_key(document("new"))]
+    )
+
+
+def create_rag(vector_db: VectorDB) -> GoodDataRAGSimple:
+    rag = GoodDataRAGSimple(
+        org_id="test",
+        workspace_id="ws",
+        vector_db=vector_db,
+        openai_api_key="test",
+        openai_organization=None,
+        cache_results=False,
+    )
+    rag.openai_embedding = DeterministicFakeEmbedding(size=32)
+    return rag
+
+
+@pytest.mark.parametrize("vector_db", list(VectorDB), ids=lambda db: db.name)
+def test_sync_after_crash_does_not_duplicate_rows(tmp_path, monkeypatch, vector_db):
+    (tmp_path / "tmp").mkdir()
+    monkeypatch.chdir(tmp_path)
+    rag = create_rag(vector_db)
+    rag.init_vector_store([document("first")])
+
+    def crash(self):
+        raise RuntimeError("Killed")
+
+    # Rows of the new document are stored, but the manifest is not saved
+    with monkeypatch.context() as m:
+        m.setattr(IndexManifest, "save", crash)
+        with pytest.raises(RuntimeError):
+            rag.init_vector_store([document("first"), document("second")])
+
+    vector_store = rag.init_vector_store([document("first"), document("second")])
+    assert len(rag.similarity_search(vector_store, "metric")) == 2
+
+
+@pytest.mark.parametrize("sync", [True, False])
+def test_documents_are_streamed_into_the_vector_store(tmp_path, monkeypatch, sync):
+    (tmp_path / "tmp").mkdir()
+    monkeypatch.chdir(tmp_path)
+    rag = create_rag(VectorDB.DUCKDB)
+    vector_store = rag.init_vector_store((document(str(i)) for i in range(3)), sync=sync)
+    assert len(rag.similarity_search(vector_store, "metric")) == 3
+
+
+def test_documents_are_written_to_the_debug_file_only_in_debug_mode(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    rag = create_rag(VectorDB.NUMPY)
+    rag.init_vector_store([document("first")])
+    assert not (tmp_path / "tmp" / "rag_docs.txt").exists()
+
+    rag.debug = True
+    rag.init_vector_store([document("second")])
+    assert "Content:\nmetric second" in (tmp_path / "tmp" / "rag_docs.txt").read_text()
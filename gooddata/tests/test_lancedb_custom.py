@@ -0,0 +1,50 @@
+import lancedb
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from gooddata.agents.libs.bm25_index import BM25Index
+from gooddata.agents.libs.hybrid_retriever import HybridRetriever, fusion_key
+from gooddata.agents.libs.vector_stores.lancedb_custom import CustomLanceDB
+from gooddata.agents.libs.vector_stores.search_filter import SearchFilter
+
+
+def create_store(tmp_path) -> CustomLanceDB:
+    store = CustomLanceDB(
+        connection=lancedb.connect(str(tmp_path / "test.LANCEDB")),
+        embedding=DeterministicFakeEmbedding(size=32),
+        table_name="test",
+        mode="append",
+    )
+    # Metrics are rare, top k of an unfiltered search contains almost none of them
+    object_types = ["metric" if i % 50 == 0 else "attribute" for i in range(500)]
+    store.add_texts(
+        texts=[f"object {i}" for i in range(500)],
+        metadatas=[{"object_type": t, "id": f"{t}_{i}", "workspace_id": "ws"} for i, t in enumerate(object_types)],
+        ids=[str(i) for i in range(500)],
+    )
+    return store
+
+
+def test_selective_filter_returns_k_documents(tmp_path):
+    store = create_store(tmp_path)
+    documents = store.similarity_search("object 1", k=5, filter=SearchFilter(object_types=["metric"]))
+    assert len(documents) == 5
+    assert all(d.metadata["metadata"]["object_type"] == "metric" for d in documents)
+
+
+def test_search_without_filter(tmp_path):
+    store = create_store(tmp_path)
+    assert len(store.similarity_search("object 1", k=5)) == 5
+
+
+def test_hybrid_retriever_strips_vectors_and_fuses(tmp_path):
+    store = create_store(tmp_path)
+    index = BM25Index(path=tmp_path / "bm25.json")
+    index.sync(
+        [Document(page_content="object 0", metadata={"object_type": "metric", "id": "metric_0", "workspace_id": "ws"})]
+    )
+    retriever = HybridRetriever(vector_store=store, lexical_index=index, k=10)
+    documents = retriever.invoke("object 0 metric")
+    assert all("vector" not in d.metadata for d in documents)
+    # The lexical and the vector hit of the same object are fused into one document
+    assert len({fusion_key(d) for d in documents}) == len(documents)
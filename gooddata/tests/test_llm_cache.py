@@ -0,0 +1,115 @@
+import subprocess
+import sys
+from types import SimpleNamespace
+
+from openai.types.chat import ChatCompletion
+
+from gooddata.agents.libs import llm_cache
+from gooddata.agents.libs.gd_openai import GoodDataOpenAICommon
+from gooddata.agents.libs.llm_cache import LLMResponseCache, hash_payload
+
+RESPONSE = {"choices": [{"message": {"content": "answer"}}]}
+
+
+def completion(content: str) -> ChatCompletion:
+    return ChatCompletion(
+        id="completion",
+        object="chat.completion",
+        created=0,
+        model="gpt",
+        choices=[{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+    )
+
+
+def test_exact_hit(tmp_path):
+    cache = LLMResponseCache(tmp_path / "cache.duckdb")
+    cache.put("request", "context", RESPONSE)
+
+    assert cache.get_exact("request") == RESPONSE
+    assert cache.get_exact("other") is None
+    assert cache.stats.exact_hits == 1
+
+
+def test_semantic_hit_needs_the_same_context_and_threshold(tmp_path):
+    cache = LLMResponseCache(tmp_path / "cache.duckdb")
+    cache.put("request", "context", RESPONSE, prompt_embedding=[1.0, 0.0])
+
+    # Cosine similarity of [1, 0] and [0.9, 0.1] is about 0.994
+    assert cache.get_semantic("context", [0.9, 0.1], threshold=0.99) == RESPONSE
+    assert cache.get_semantic("context", [0.9, 0.1], threshold=0.999) is None
+    assert cache.get_semantic("other_context", [1.0, 0.0], threshold=0.5) is None
+    assert cache.stats.semantic_hits == 1
+
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+    now = [10**18]
+    monkeypatch.setattr(llm_cache, "time_ns", lambda: now[0])
+    cache = LLMResponseCache(tmp_path / "cache.duckdb", ttl=10)
+    cache.put("request", "context", RESPONSE, prompt_embedding=[1.0])
+
+    now[0] += 9 * 10**9
+    assert cache.get_exact("request") == RESPONSE
+    now[0] += 2 * 10**9
+    assert cache.get_exact("request") is None
+    assert cache.get_semantic("context", [1.0], threshold=0.5) is None
+    # Expired entries are deleted on the next write
+    cache.put("new", "context", RESPONSE)
+    assert cache.stats.evictions == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = LLMResponseCache(tmp_path / "cache.duckdb", max_entries=2)
+    cache.put("a", "context", RESPONSE)
+    cache.put("b", "context", RESPONSE)
+    # Reading "a" makes "b" the least recently used
+    cache.get_exact("a")
+    cache.put("c", "context", RESPONSE)
+
+    assert cache.get_exact("a") is not None
+    assert cache.get_exact("b") is None
+    assert cache.get_exact("c") is not None
+    assert cache.stats.evictions == 1
+
+
+def test_file_locked_by_another_process_falls_back_to_memory(tmp_path):
+    db_path = tmp_path / "cache.duckdb"
+    holder = subprocess.Popen(
+        [
+            sys.executable,
+            "-c",
+            f"import duckdb, time; c = duckdb.connect({str(db_path)!r}); print(1, flush=True); time.sleep(60)",
+        ],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        holder.stdout.readline()
+        cache = LLMResponseCache(db_path)
+        cache.put("request", "context", RESPONSE)
+        assert cache.get_exact("request") == RESPONSE
+    finally:
+        holder.kill()
+        holder.wait()
+
+
+def test_chat_completion_request_contains_temperature(tmp_path):
+    agent = GoodDataOpenAICommon(openai_api_key="test", temperature=0)
+    agent.response_cache = LLMResponseCache(tmp_path / "cache.duckdb")
+    requests = []
+
+    def create(**kwargs) -> ChatCompletion:
+        requests.append(kwargs)
+        return completion("answer")
+
+    agent.openai_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+    assert agent.ask_chat_completion("system", "user").choices[0].message.content == "answer"
+    assert agent.ask_chat_completion("system", "user").choices[0].message.content == "answer"
+
+    assert len(requests) == 1
+    assert requests[0]["temperature"] == 0
+    other = GoodDataOpenAICommon(openai_api_key="test", temperature=1, response_cache=False)
+    assert other.response_cache is None
+    assert hash_payload(other.get_chat_completion_kwargs("system", "user")) != hash_payload(
+        agent.get_chat_completion_kwargs("system", "user")
+    )
@@ -0,0 +1,92 @@
+from langchain_core.embeddings import Embeddings
+
+from gooddata.agents.libs.maql_prompt import (
+    MAQL_EXAMPLES,
+    MaqlExampleSelector,
+    catalog_version,
+    format_entities,
+    format_examples,
+)
+
+FACTS = [("price", "Price")]
+ATTRIBUTES = [("region", "Region"), ("quarter", "Quarter")]
+METRICS = [("revenue", "Revenue")]
+
+
+class KeywordEmbeddings(Embeddings):
+    """Counts of a few words, similar questions share words. Counts how often the examples are embedded."""
+
+    words = [
+        "count",
+        "customers",
+        "average",
+        "price",
+        "flight",
+        "where",
+        "manufacturer",
+        "previous",
+        "quarter",
+        "years",
+    ]
+
+    def __init__(self) -> None:
+        self.documents_calls = 0
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.documents_calls += 1
+        return [self.embed_query(t) for t in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        words = text.lower().split()
+        # The constant keeps the vector of a text without any of the words non-zero
+        return [float(words.count(w)) for w in self.words] + [0.1]
+
+
+def test_catalog_version_is_stable():
+    version = catalog_version(FACTS, ATTRIBUTES, METRICS)
+
+    assert catalog_version(list(FACTS), list(ATTRIBUTES), list(METRICS)) == version
+    assert catalog_version(FACTS, ATTRIBUTES, [("revenue", "Net revenue")]) != version
+    assert catalog_version(FACTS, ATTRIBUTES, METRICS + [("margin", "Margin")]) != version
+    # The same entity as a fact is a different catalog
+    assert catalog_version([], ATTRIBUTES, METRICS + FACTS) != version
+
+
+def test_format_entities():
+    assert format_entities(FACTS, ATTRIBUTES, METRICS) == (
+        "Facts:\n"
+        "- Fact with ID price is described as 'Price'\n"
+        "\n"
+        "Attributes:\n"
+        "- Attribute with ID region is described as 'Region'\n"
+        "- Attribute with ID quarter is described as 'Quarter'\n"
+        "\n"
+        "Metrics:\n"
+        "- Metric with ID revenue is described as 'Revenue'"
+    )
+
+
+def test_selector_returns_the_most_similar_examples_in_the_original_order():
+    embeddings = KeywordEmbeddings()
+    selector = MaqlExampleSelector(embeddings)
+
+    selected = selector.select("sum of revenue for previous quarter where manufacturer is BOEING", k=3)
+
+    assert [e.question for e in selected] == [
+        "Sum of flight count where manufacturer is AIRBUS",
+        "Sum of flight count where manufacturer is like AIR",
+        "Calculate revenue for previous quarter",
+    ]
+    selector.select("count of customers", k=1)
+    # Examples are embedded once, only questions are embedded later
+    assert embeddings.documents_calls == 1
+
+
+def test_selected_examples_are_introduced_by_the_heading_of_their_topic():
+    selected = MaqlExampleSelector(KeywordEmbeddings()).select("average price where manufacturer is AIRBUS", k=2)
+    text = format_examples(selected)
+
+    assert text.startswith("Examples:\nQuestion: Give me average price\n")
+    assert 'Warning: the entity type for attributes must be here specified as "label".' in text
+    assert "previous period" not in text
+    assert format_examples(MAQL_EXAMPLES).count("Examples:") == 3
@@ -0,0 +1,78 @@
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from gooddata.agents.libs.tracing import get_tracer
+from gooddata.agents.libs.vector_stores import numpy_store
+from gooddata.agents.libs.vector_stores.numpy_store import NumpyTable, NumpyVectorStore
+from gooddata.agents.libs.vector_stores.search_filter import SearchFilter
+from gooddata.tests.test_tracing import MemoryExporter
+
+
+def create_store(tmp_path) -> NumpyVectorStore:
+    store = NumpyVectorStore(
+        connection=numpy_store.connect(str(tmp_path / "db")),
+        embedding=DeterministicFakeEmbedding(size=16),
+        table_name="test",
+    )
+    store.add_texts(
+        [f"object {i}" for i in range(20)],
+        metadatas=[{"object_type": "metric" if i % 5 == 0 else "attribute", "id": f"id_{i}"} for i in range(20)],
+        ids=[str(i) for i in range(20)],
+    )
+    return store
+
+
+def test_search_returns_the_most_similar_rows(tmp_path):
+    store = create_store(tmp_path)
+    documents = store.similarity_search("object 3", k=3)
+    assert len(documents) == 3
+    # Same text, same vector
+    assert documents[0].page_content == "object 3"
+    assert documents[0].metadata[numpy_store.SCORE_KEY] > 0.999
+
+
+def test_filter_is_applied_before_scoring(tmp_path):
+    store = create_store(tmp_path)
+    documents = store.similarity_search("object 3", k=10, filter=SearchFilter(object_types=["metric"]))
+    assert sorted(d.metadata["id"] for d in documents) == ["id_0", "id_10", "id_15", "id_5"]
+    documents = store.similarity_search("object 3", k=10, filter=SearchFilter(id_prefix="id_1"))
+    assert len(documents) == 10 and all(d.metadata["id"].startswith("id_1") for d in documents)
+
+
+def test_deleted_and_replaced_rows(tmp_path):
+    store = create_store(tmp_path)
+    store.table.delete(["3", "4"])
+    store.add_texts(["replaced"], metadatas=[{"object_type": "metric", "id": "id_5"}], ids=["5"])
+    assert len(store.table) == 18
+    texts = [d.page_content for d in store.similarity_search("object 3", k=20)]
+    assert "object 3" not in texts and "object 4" not in texts and "object 5" not in texts
+    assert "replaced" in texts
+
+    # Segments and tombstones survive reopening of the table
+    reopened = NumpyTable(tmp_path / "db" / "test")
+    results = reopened.search(np.asarray([store.embeddings.embed_query("replaced")]), k=1)[0]
+    assert results[0][0]["id"] == "5" and len(reopened) == 18
+
+
+def test_ivf_index_search(tmp_path, monkeypatch):
+    monkeypatch.setattr(numpy_store, "IVF_MIN_ROWS", 10)
+    store = create_store(tmp_path)
+    documents = store.similarity_search("object 7", k=2, filter=SearchFilter(object_types=["attribute"]))
+    assert store.table.ivf is not None
+    assert documents[0].page_content == "object 7"
+    assert all(d.metadata["object_type"] == "attribute" for d in documents)
+
+
+def test_compaction_is_traced_not_printed(tmp_path, capsys):
+    store = create_store(tmp_path)
+    store.add_texts(["new"], metadatas=[{"object_type": "metric", "id": "id_20"}], ids=["20"])
+    tracer = get_tracer()
+    exporter = MemoryExporter()
+    tracer.configure([exporter])
+    try:
+        assert len(store.table) == 21
+    finally:
+        tracer.shutdown()
+
+    assert exporter.by_name("vector_store.compact").attributes == {"backend": "NumPy", "segments": 2}
+    assert capsys.readouterr().out == ""
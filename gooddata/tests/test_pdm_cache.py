@@ -0,0 +1,127 @@
+from types import SimpleNamespace
+
+import pytest
+from gooddata_sdk import CatalogDeclarativeColumn, CatalogDeclarativeTable, CatalogDeclarativeTables
+from gooddata_sdk.catalog.data_source.declarative_model.physical_model.pdm import CatalogScanResultPdm
+
+from gooddata.agents.libs.cache import TTLCache
+from gooddata.agents.libs.pdm_cache import FINGERPRINT_SQLS, PdmScanner, diff_tables
+
+
+def table(schema: str, table_id: str, **columns: str) -> CatalogDeclarativeTable:
+    return CatalogDeclarativeTable(
+        id=table_id,
+        type="TABLE",
+        path=[schema, table_id],
+        columns=[CatalogDeclarativeColumn(name=c, data_type=t) for c, t in columns.items()],
+    )
+
+
+class FakeDataSourceService:
+    """Data source with tables in schemas, fingerprints are computed from the table definitions."""
+
+    def __init__(self, tables: list[CatalogDeclarativeTable], supported_sqls: list[str] = FINGERPRINT_SQLS) -> None:
+        self.tables = tables
+        self.supported_sqls = supported_sqls
+        self.scanned_schemata: list = []
+        self.sqls: list[str] = []
+
+    def scan_sql(self, data_source_id: str, request) -> SimpleNamespace:
+        self.sqls.append(request.sql)
+        if request.sql not in self.supported_sqls:
+            raise ValueError("unsupported SQL")
+        schemas: dict[str, list[str]] = {}
+        for t in self.tables:
+            schemas.setdefault(t.path[0], []).extend(f"{t.id}.{c.name}:{c.data_type}" for c in t.columns)
+        return SimpleNamespace(data_preview=[[s, len(c), ",".join(sorted(c))] for s, c in schemas.items()])
+
+    def scan_data_source(self, data_source_id: str, request) -> CatalogScanResultPdm:
+        self.scanned_schemata.append(request.schemata)
+        tables = [t for t in self.tables if request.schemata is None or t.path[0] in request.schemata]
+        return CatalogScanResultPdm(pdm=CatalogDeclarativeTables(tables=tables))
+
+
+def create_scanner(data_sources: FakeDataSourceService) -> PdmScanner:
+    return PdmScanner(SimpleNamespace(catalog_data_source=data_sources), "test", cache=TTLCache())
+
+
+def table_names(pdm: CatalogScanResultPdm) -> list[str]:
+    return sorted(".".join(t.path) for t in pdm.pdm.tables)
+
+
+@pytest.fixture
+def data_sources() -> FakeDataSourceService:
+    return FakeDataSourceService(
+        [
+            table("sales", "orders", id="INT", amount="NUMERIC"),
+            table("sales", "customers", id="INT", name="STRING"),
+            table("hr", "employees", id="INT"),
+        ]
+    )
+
+
+def test_diff_tables():
+    old = [table("s", "kept", a="INT"), table("s", "retyped", a="INT"), table("s", "removed", a="INT")]
+    new = [table("s", "kept", a="INT"), table("s", "retyped", a="STRING"), table("s", "added", a="INT")]
+
+    diff = diff_tables(old, new)
+
+    assert diff.added == ["s.added"]
+    assert diff.removed == ["s.removed"]
+    assert diff.changed == ["s.retyped"]
+    assert diff_tables(new, new) == diff_tables([], [])
+
+
+def test_repeated_scan_is_served_from_snapshot(data_sources):
+    scanner = create_scanner(data_sources)
+
+    first = scanner.scan("ds")
+    assert scanner.scan("ds") is first
+    assert data_sources.scanned_schemata == [None]
+
+
+def test_rescan_scans_only_changed_schemas(data_sources):
+    scanner = create_scanner(data_sources)
+    scanner.scan("ds")
+    # A column type changes in one schema, another schema is removed and a new one appears
+    data_sources.tables = [
+        table("sales", "orders", id="INT", amount="FLOAT"),
+        table("sales", "customers", id="INT", name="STRING"),
+        table("finance", "invoices", id="INT"),
+    ]
+
+    pdm = scanner.scan("ds", refresh=True)
+
+    assert data_sources.scanned_schemata == [None, ["finance", "sales"]]
+    assert table_names(pdm) == ["finance.invoices", "sales.customers", "sales.orders"]
+    orders = next(t for t in pdm.pdm.tables if t.id == "orders")
+    assert [c.data_type for c in orders.columns] == ["INT", "FLOAT"]
+
+
+def test_rescan_of_unchanged_data_source_does_not_scan(data_sources):
+    scanner = create_scanner(data_sources)
+    first = scanner.scan("ds")
+
+    pdm = scanner.scan("ds", refresh=True)
+
+    assert data_sources.scanned_schemata == [None]
+    assert table_names(pdm) == table_names(first)
+
+
+def test_fingerprint_variants_are_tried_in_order(data_sources):
+    data_sources.supported_sqls = FINGERPRINT_SQLS[1:]
+    scanner = create_scanner(data_sources)
+
+    assert set(scanner.fingerprint("ds")) == {"sales", "hr"}
+    assert data_sources.sqls == FINGERPRINT_SQLS[:2]
+
+
+def test_data_source_without_fingerprints_is_scanned_in_full(data_sources):
+    data_sources.supported_sqls = []
+    scanner = create_scanner(data_sources)
+    scanner.scan("ds")
+
+    scanner.scan("ds", refresh=True)
+
+    assert data_sources.scanned_schemata == [None, None]
+    assert scanner.get_snapshot("ds").fingerprints is None
@@ -0,0 +1,131 @@
+import json
+from types import SimpleNamespace
+from typing import Optional
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.language_models import FakeListLLM
+from langchain_core.retrievers import BaseRetriever
+from openai.types.chat import ChatCompletion
+
+from gooddata.agents import report_agent
+from gooddata.agents.libs.catalog_scope import CatalogScope
+from gooddata.agents.libs.gd_openai import AIMethod
+from gooddata.agents.libs.vector_stores.search_filter import SearchFilter
+from gooddata.agents.report_agent import ReportAgent
+
+SCOPE = CatalogScope(metrics=[("revenue", "Revenue")], attributes=[("region", "Region"), ("year", "Year")])
+ARGUMENTS = json.dumps({"attributes": ["region"], "metrics": ["revenue"]})
+
+
+def function_call_completion() -> ChatCompletion:
+    message = {"role": "assistant", "function_call": {"name": "ExecutionDefinition", "arguments": ARGUMENTS}}
+    return ChatCompletion(
+        id="completion",
+        object="chat.completion",
+        created=0,
+        model="gpt",
+        choices=[{"index": 0, "finish_reason": "stop", "message": message}],
+    )
+
+
+def create_agent(requests: list[dict], **kwargs) -> ReportAgent:
+    # Without a retriever, the whole catalog of the workspace is the scope
+    gd_sdk = SimpleNamespace(
+        metrics=lambda workspace_id: SCOPE.metrics + [("orders", "Orders")],
+        attributes=lambda workspace_id: SCOPE.attributes,
+    )
+    agent = ReportAgent(gd_sdk=gd_sdk, workspace_id="demo", openai_api_key="test", response_cache=False, **kwargs)
+
+    def create(**request) -> ChatCompletion:
+        requests.append(request)
+        return function_call_completion()
+
+    agent.openai_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    return agent
+
+
+def items(function: dict, name: str) -> dict:
+    return function["parameters"]["properties"][name]["items"]
+
+
+def test_execdef_function_with_scope_allows_only_its_ids():
+    function = ReportAgent.get_execdef_fnc(SCOPE)
+
+    assert items(function, "attributes")["enum"] == ["region", "year"]
+    assert items(function, "metrics")["enum"] == ["revenue"]
+    assert "enum" not in items(ReportAgent.get_execdef_fnc(), "metrics")
+    assert "enum" not in items(ReportAgent.get_execdef_fnc(), "attributes")
+
+
+def test_retrieved_scope_limits_the_function_schema():
+    requests = []
+    retriever = SimpleNamespace(get_scope=lambda question: SCOPE)
+    agent = create_agent(requests, catalog_retriever=retriever)
+
+    assert agent.ask_func_open_ai("revenue by region") == ARGUMENTS
+
+    function = requests[0]["functions"][0]
+    assert items(function, "metrics")["enum"] == ["revenue"]
+    assert "orders" not in requests[0]["messages"][0]["content"]
+
+
+def test_whole_catalog_is_not_duplicated_in_enums():
+    requests = []
+    agent = create_agent(requests)
+
+    agent.ask_func_open_ai("revenue by region")
+
+    function = requests[0]["functions"][0]
+    assert "enum" not in items(function, "metrics")
+    assert "enum" not in items(function, "attributes")
+    assert "orders" in requests[0]["messages"][0]["content"]
+
+
+class StaticRetriever(BaseRetriever):
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        return [Document(page_content="Metric with ID revenue is described as 'Revenue'")]
+
+
+class FakeCatalogIndex:
+    """Persistent index of the workspace catalog, remembers how it was created and searched."""
+
+    instances: list["FakeCatalogIndex"] = []
+
+    def __init__(self, **kwargs) -> None:
+        self.kwargs = kwargs
+        self.filters: list[Optional[SearchFilter]] = []
+        self.instances.append(self)
+
+    def get_retriever(self, search_filter: Optional[SearchFilter] = None) -> BaseRetriever:
+        self.filters.append(search_filter)
+        return StaticRetriever()
+
+
+def test_langchain_questions_use_the_persistent_catalog_index(monkeypatch):
+    monkeypatch.setattr(FakeCatalogIndex, "instances", [])
+    monkeypatch.setattr(report_agent, "CatalogRetriever", FakeCatalogIndex)
+    agent = create_agent([], org_id="org")
+    agent.get_chat_llm_model = lambda: FakeListLLM(responses=[ARGUMENTS])
+
+    assert agent.ask(AIMethod.LANGCHAIN, "revenue by region") == ARGUMENTS
+    agent.ask(AIMethod.LANGCHAIN, "revenue by year")
+
+    # Created once per agent, the index itself is synced only when the catalog changes
+    [index] = FakeCatalogIndex.instances
+    assert index.kwargs["org_id"] == "org"
+    assert index.kwargs["workspace_id"] == "demo"
+    assert index.filters == [SearchFilter(object_types=["metric", "attribute"])] * 2
+
+
+def test_langchain_questions_use_the_catalog_retriever_of_the_agent(monkeypatch):
+    monkeypatch.setattr(FakeCatalogIndex, "instances", [])
+    retriever = FakeCatalogIndex()
+    monkeypatch.setattr(report_agent, "CatalogRetriever", FakeCatalogIndex)
+    agent = create_agent([], catalog_retriever=retriever)
+    agent.get_chat_llm_model = lambda: FakeListLLM(responses=[ARGUMENTS])
+
+    agent.ask(AIMethod.LANGCHAIN, "revenue by region")
+
+    assert FakeCatalogIndex.instances == [retriever]
+    assert retriever.filters == [SearchFilter(object_types=["metric", "attribute"])]
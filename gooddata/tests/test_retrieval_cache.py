@@ -0,0 +1,91 @@
+import itertools
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from gooddata.agents.libs.retrieval_cache import CachedRetriever, get_retrieval_cache, invalidate_stale_results
+from gooddata.agents.libs.tracing import get_tracer
+from gooddata.tests.test_tracing import MemoryExporter
+
+# The retrieval cache is shared by the process, each test uses its own scopes
+_scopes = itertools.count()
+
+
+def new_scope() -> tuple[str, str]:
+    return "test_retrieval_cache", f"workspace_{next(_scopes)}"
+
+
+class CountingRetriever(BaseRetriever):
+    calls: list[str] = []
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        self.calls.append(query)
+        return [Document(page_content=f"{query} {i}") for i in range(2)]
+
+
+def cached(retriever: BaseRetriever, scope, index_version: str, **kwargs) -> CachedRetriever:
+    return CachedRetriever(retriever=retriever, scope=scope, index_version=index_version, **kwargs)
+
+
+def test_queries_differing_in_whitespace_hit_the_cache():
+    retriever = CountingRetriever(calls=[])
+    scope = new_scope()
+
+    first = cached(retriever, scope, "v1").invoke("Revenue by region")
+    second = cached(retriever, scope, "v1").invoke("  Revenue  by\nregion ")
+
+    assert first == second
+    assert retriever.calls == ["Revenue by region"]
+
+
+def test_new_index_version_misses():
+    retriever = CountingRetriever(calls=[])
+    scope = new_scope()
+    cached(retriever, scope, "v1").invoke("revenue")
+
+    cached(retriever, scope, "v2").invoke("revenue")
+    cached(retriever, scope, "v1", parameters=("hybrid",)).invoke("revenue")
+
+    assert retriever.calls == ["revenue", "revenue", "revenue"]
+
+
+def test_invalidate_stale_results_drops_only_other_versions():
+    retriever = CountingRetriever(calls=[])
+    scope, other_scope = new_scope(), new_scope()
+    for index_version in ("v1", "v2"):
+        cached(retriever, scope, index_version).invoke("revenue")
+    cached(retriever, other_scope, "v1").invoke("revenue")
+
+    assert invalidate_stale_results(scope, "v2") == 1
+
+    cache = get_retrieval_cache()
+    assert (scope, "v1", "revenue") not in cache
+    assert (scope, "v2", "revenue") in cache
+    assert (other_scope, "v1", "revenue") in cache
+
+
+def test_returned_list_is_a_copy():
+    retriever = CountingRetriever(calls=[])
+    scope = new_scope()
+
+    documents = cached(retriever, scope, "v1").invoke("revenue")
+    documents.reverse()
+    documents.pop()
+
+    assert [d.page_content for d in cached(retriever, scope, "v1").invoke("revenue")] == ["revenue 0", "revenue 1"]
+
+
+def test_span_is_labeled_by_the_workspace():
+    tracer = get_tracer()
+    exporter = MemoryExporter()
+    tracer.configure([exporter])
+    try:
+        # The scope does not have to be a tuple
+        cached(CountingRetriever(calls=[]), "scope", "v1", workspace_id="demo").invoke(f"{new_scope()}")
+    finally:
+        tracer.shutdown()
+
+    retrieval = exporter.by_name("retrieval")
+    assert retrieval.attributes["workspace"] == "demo"
+    assert retrieval.attributes["cache_hit"] is False
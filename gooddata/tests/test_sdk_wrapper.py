@@ -0,0 +1,80 @@
+from types import SimpleNamespace
+
+from gooddata.agents import sdk_wrapper
+from gooddata.agents.sdk_wrapper import GoodDataSdkWrapper
+
+
+class StubCatalogContent:
+    """Catalog of workspaces counting calls of the GoodData API."""
+
+    def __init__(self) -> None:
+        self.metrics = {"ws1": ["revenue"], "ws2": ["orders"]}
+        self.calls: list[str] = []
+
+    def get_metrics_catalog(self, workspace_id: str) -> list[SimpleNamespace]:
+        self.calls.append(workspace_id)
+        return [SimpleNamespace(id=m, title=m.title()) for m in self.metrics[workspace_id]]
+
+
+def create_wrapper(content: StubCatalogContent, catalog_ttl: float, **kwargs) -> GoodDataSdkWrapper:
+    sdk = SimpleNamespace(
+        support=SimpleNamespace(wait_till_available=lambda timeout: None), catalog_workspace_content=content
+    )
+    # Each test uses its own TTL, wrappers with the same TTL share the process-wide cache
+    return GoodDataSdkWrapper(profile="test", sdk=sdk, pandas=SimpleNamespace(), catalog_ttl=catalog_ttl, **kwargs)
+
+
+def test_catalog_is_fetched_once():
+    content = StubCatalogContent()
+    wrapper = create_wrapper(content, catalog_ttl=101)
+
+    assert wrapper.metrics("ws1") == [("revenue", "Revenue")]
+    assert wrapper.metrics_string("ws1") == str([("revenue", "Revenue")])
+    # Streamlit creates a new wrapper on every rerun
+    create_wrapper(content, catalog_ttl=101).metrics("ws1")
+
+    assert content.calls == ["ws1"]
+
+
+def test_invalidate_catalog_of_one_workspace():
+    content = StubCatalogContent()
+    wrapper = create_wrapper(content, catalog_ttl=102)
+    wrapper.metrics("ws1")
+    wrapper.metrics("ws2")
+
+    # The model of ws1 was changed
+    content.metrics["ws1"] = ["revenue", "margin"]
+    wrapper.invalidate_catalog("ws1")
+
+    assert wrapper.metrics("ws1") == [("revenue", "Revenue"), ("margin", "Margin")]
+    wrapper.metrics("ws2")
+    assert content.calls == ["ws1", "ws2", "ws1"]
+
+
+def test_invalidate_catalog_of_all_workspaces():
+    content = StubCatalogContent()
+    wrapper = create_wrapper(content, catalog_ttl=103)
+    wrapper.metrics("ws1")
+    wrapper.metrics("ws2")
+
+    wrapper.invalidate_catalog()
+    wrapper.metrics("ws1")
+    wrapper.metrics("ws2")
+
+    assert content.calls == ["ws1", "ws2", "ws1", "ws2"]
+
+
+def test_persistent_caches_with_different_ttl_use_different_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(sdk_wrapper, "CATALOG_CACHE_DIR", tmp_path)
+    content = StubCatalogContent()
+    short = create_wrapper(content, catalog_ttl=104, persist_catalog=True)
+    long = create_wrapper(content, catalog_ttl=105, persist_catalog=True)
+
+    short.metrics("ws1")
+    long.metrics("ws2")
+
+    assert short.catalog_cache.persist_path != long.catalog_cache.persist_path
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "gooddata_catalog_persistent_ttl=104.pickle",
+        "gooddata_catalog_persistent_ttl=105.pickle",
+    ]
@@ -0,0 +1,59 @@
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from gooddata.agents.libs.index_manifest import SharedIndexManifest
+from gooddata.agents.libs.rag_langchain import GoodDataRAGSimple, VectorDB
+
+
+def create_rag(workspace_id: str, vector_db: VectorDB) -> GoodDataRAGSimple:
+    rag = GoodDataRAGSimple(
+        org_id="test",
+        workspace_id=workspace_id,
+        vector_db=vector_db,
+        openai_api_key="test",
+        openai_organization=None,
+        shared_store=True,
+        cache_results=False,
+    )
+    rag.openai_embedding = DeterministicFakeEmbedding(size=32)
+    return rag
+
+
+def documents(workspace_id: str, ids: list[str]) -> list[Document]:
+    return [
+        Document(page_content=f"metric {i}", metadata={"object_type": "metric", "id": i, "workspace_id": workspace_id})
+        for i in ids
+    ]
+
+
+def found_ids(rag: GoodDataRAGSimple, vector_store) -> set[str]:
+    result = rag.similarity_search(vector_store, "metric")
+    return {d.metadata.get("metadata", d.metadata)["id"] for d in result}
+
+
+@pytest.mark.parametrize("vector_db", list(VectorDB), ids=lambda db: db.name)
+def test_shared_store_scopes_and_resets_workspaces(tmp_path, monkeypatch, vector_db):
+    # Indexes and debug files are written to tmp/ of the working directory
+    (tmp_path / "tmp").mkdir()
+    monkeypatch.chdir(tmp_path)
+    rag_a = create_rag("a", vector_db)
+    rag_b = create_rag("b", vector_db)
+    rag_a.init_vector_store(documents("a", ["shared", "only_a"]))
+    store = rag_b.init_vector_store(documents("b", ["shared", "only_b"]))
+
+    assert found_ids(rag_a, store) == {"shared", "only_a"}
+    assert found_ids(rag_b, store) == {"shared", "only_b"}
+    assert all("workspaces" not in d.metadata for d in rag_b.similarity_search(store, "metric"))
+
+    # Workspace B stops referencing the shared document, A keeps it
+    store = rag_b.init_vector_store(documents("b", ["only_b"]))
+    assert found_ids(rag_a, store) == {"shared", "only_a"}
+    assert found_ids(rag_b, store) == {"only_b"}
+
+    rag_a.drop_table(rag_a.connect_to_db())
+    assert found_ids(rag_a, store) == set()
+    assert found_ids(rag_b, store) == {"only_b"}
+    manifest = SharedIndexManifest.load(rag_b.manifest_path)
+    assert set(manifest.memberships) == {"b"}
+    assert [k for k in manifest.keys if k is not None] == manifest.workspace_keys("b")
@@ -0,0 +1,134 @@
+import threading
+from typing import Optional
+
+from gooddata_sdk import CatalogDeclarativeColumn, CatalogDeclarativeTable, CatalogDeclarativeTables
+from gooddata_sdk.catalog.data_source.declarative_model.physical_model.pdm import CatalogScanResultPdm
+
+from gooddata.agents.any_to_star_agent import AnyToStarResultType, GoodDataAnyToStarAgent
+from gooddata.agents.libs.star_schema import DimensionMerger, TableChunk, cluster_tables, table_references
+
+
+def table(table_id: str, *columns: str, references: Optional[dict[str, str]] = None) -> CatalogDeclarativeTable:
+    references = references or {}
+    return CatalogDeclarativeTable(
+        id=table_id,
+        type="TABLE",
+        path=["public", table_id],
+        columns=[
+            CatalogDeclarativeColumn(name=c, data_type="STRING", referenced_table_id=references.get(c)) for c in columns
+        ],
+    )
+
+
+def ids(tables: list[CatalogDeclarativeTable]) -> list[str]:
+    return [t.id for t in tables]
+
+
+def shop_tables() -> list[CatalogDeclarativeTable]:
+    return [
+        table("customers", "customer_id", "name", "city"),
+        table("orders", "order_id", "customer_id", "amount"),
+        table("payments", "payment_id", "buyer", "amount", references={"buyer": "customers"}),
+        table("categories", "category_id", "name"),
+        table("products", "product_id", "category_id", "title"),
+        table("audit_log", "event", "created_at"),
+    ]
+
+
+def test_table_references():
+    references = table_references(shop_tables())
+
+    assert references["orders"] == {"customers"}
+    # Declared foreign key
+    assert references["payments"] == {"customers"}
+    # categories.category_id
+    assert references["products"] == {"categories"}
+    assert references["customers"] == set()
+    assert references["audit_log"] == set()
+
+
+def test_tables_fitting_the_budget_are_one_chunk():
+    chunks = cluster_tables(shop_tables(), max_columns=100)
+
+    assert len(chunks) == 1
+    assert sorted(ids(chunks[0].tables)) == sorted(ids(shop_tables()))
+    assert chunks[0].shared_tables == []
+    assert not chunks[0].is_shared
+
+
+def test_related_tables_stay_together():
+    chunks = cluster_tables(shop_tables(), max_columns=9)
+
+    chunk_of = {t.id: n for n, chunk in enumerate(chunks) for t in chunk.tables}
+    assert chunk_of["products"] == chunk_of["categories"]
+    assert chunk_of["orders"] == chunk_of["payments"] == chunk_of["customers"]
+    assert all(chunk.columns <= 9 for chunk in chunks)
+
+
+def test_dimensions_referenced_across_chunks_are_shared():
+    tables = shop_tables()
+    chunks = cluster_tables(tables, max_columns=6)
+
+    own = [chunk for chunk in chunks if not chunk.is_shared]
+    shared = [chunk for chunk in chunks if chunk.is_shared]
+    # Every table is generated exactly once
+    generated = [t for chunk in chunks for t in chunk.tables]
+    assert sorted(ids(generated)) == sorted(ids(tables))
+    assert len(shared) == 1
+    assert ids(shared[0].tables) == ["categories", "customers"]
+    # Fact tables only reference the shared dimensions
+    referencing = [chunk for chunk in own if "customers" in ids(chunk.shared_tables)]
+    assert sorted(t.id for chunk in referencing for t in chunk.tables) == ["orders", "payments"]
+    assert [ids(chunk.tables) for chunk in own if "categories" in ids(chunk.shared_tables)] == [["products"]]
+    assert all(chunk.columns <= 6 for chunk in chunks)
+
+
+def test_dimension_merger_drops_duplicates_of_other_sections():
+    merger = DimensionMerger()
+    first = (
+        "Customers\n```sql\nCREATE TABLE dim_customers (id INT);\n```\n```sql\nINSERT INTO dim_customers SELECT 1;\n```"
+    )
+    second = (
+        "```sql\nCREATE TABLE IF NOT EXISTS dim_customers (id INT);\n```\n"
+        "```sql\nCREATE TABLE dim_products (id INT);\n```\n"
+        "```sql\nCREATE TABLE fact_orders (id INT);\n```"
+    )
+
+    assert merger.merge(first) == first
+    merged = merger.merge(second)
+
+    assert "<!-- dim_customers is defined above -->" in merged
+    assert "dim_customers (id INT)" not in merged
+    assert "CREATE TABLE dim_products" in merged
+    assert "CREATE TABLE fact_orders" in merged
+    # Other kinds of statements of an emitted dimension are kept
+    assert merger.merge("```sql\nSELECT * FROM x INTO dim_products;\n```").startswith("```sql")
+
+
+def test_sections_are_streamed_as_chunks_finish(monkeypatch):
+    tables = [
+        table("customers", "customer_id", "name", "city"),
+        table("orders", "order_id", "customer_id", "amount"),
+        table("payments", "payment_id", "customer_id", "amount"),
+    ]
+    agent = GoodDataAnyToStarAgent(chunk_columns=6, openai_api_key="test", response_cache=False)
+    release = threading.Event()
+    slow_done = threading.Event()
+
+    def generate_chunk(chunk: TableChunk, result_type: AnyToStarResultType) -> str:
+        if ids(chunk.tables) == ["orders"]:
+            release.wait(timeout=5)
+            slow_done.set()
+        return f"```sql\nCREATE TABLE dim_{chunk.tables[0].id} (id INT);\n```"
+
+    monkeypatch.setattr(agent, "generate_chunk", generate_chunk)
+    pdm = CatalogScanResultPdm(pdm=CatalogDeclarativeTables(tables=tables))
+    sections = agent.iter_sections(pdm, AnyToStarResultType.SQL)
+
+    # Shared dimensions first, then finished chunks while the slow one is still running
+    assert next(sections).startswith("### Shared dimensions: customers")
+    assert next(sections).startswith("### Source tables: payments")
+    assert not slow_done.is_set()
+    release.set()
+    assert next(sections).startswith("### Source tables: orders")
+    assert next(sections, None) is None
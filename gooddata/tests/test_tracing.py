@@ -0,0 +1,240 @@
+import asyncio
+import threading
+
+import pytest
+
+from gooddata.agents.libs import tracing
+from gooddata.agents.libs.tracing import (
+    NOOP_SPAN,
+    SPAN_DURATION_METRIC,
+    Histogram,
+    MetricsRegistry,
+    OtlpSpanExporter,
+    Span,
+    SpanExporter,
+    configure_tracing,
+    current_span,
+    end_span,
+    get_tracer,
+    span,
+    start_span,
+    traced,
+)
+
+
+class MemoryExporter(SpanExporter):
+    def __init__(self) -> None:
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def by_name(self, name: str) -> Span:
+        return next(s for s in self.spans if s.name == name)
+
+
+@pytest.fixture
+def exporter():
+    tracer = get_tracer()
+    exporter = MemoryExporter()
+    tracer.configure([exporter])
+    tracer.metrics.clear()
+    yield exporter
+    tracer.shutdown()
+    tracer.metrics.clear()
+
+
+def test_nested_spans(exporter):
+    with span("outer", workspace="ws") as outer:
+        with span("inner") as inner:
+            assert current_span() is inner
+            inner.set_attributes(rows=3)
+        assert current_span() is outer
+
+    assert [s.name for s in exporter.spans] == ["inner", "outer"]
+    assert inner.parent_id == outer.span_id
+    assert inner.trace_id == outer.trace_id
+    assert outer.parent_id is None
+    assert outer.attributes == {"workspace": "ws"}
+    assert inner.attributes == {"rows": 3}
+    assert inner.end_ns <= outer.end_ns
+    assert get_tracer().metrics.get_histogram(SPAN_DURATION_METRIC, span="outer").count == 1
+
+
+def test_error_is_recorded(exporter):
+    with pytest.raises(ValueError):
+        with span("failing"):
+            raise ValueError("boom")
+
+    assert exporter.by_name("failing").error == "ValueError: boom"
+
+
+def test_spans_of_concurrent_threads_do_not_mix(exporter):
+    barrier = threading.Barrier(2)
+
+    def work(name: str) -> None:
+        with span(name):
+            # Both root spans are open at the same time
+            barrier.wait(timeout=5)
+            with span(f"{name}.child"):
+                barrier.wait(timeout=5)
+
+    threads = [threading.Thread(target=work, args=(name,)) for name in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for name in ("a", "b"):
+        root, child = exporter.by_name(name), exporter.by_name(f"{name}.child")
+        assert root.parent_id is None
+        assert child.parent_id == root.span_id
+        assert child.trace_id == root.trace_id
+    assert exporter.by_name("a").trace_id != exporter.by_name("b").trace_id
+
+
+def test_spans_of_asyncio_tasks_have_the_parent_of_their_creator(exporter):
+    async def task(name: str) -> None:
+        with span(name):
+            await asyncio.sleep(0)
+            with span(f"{name}.child"):
+                await asyncio.sleep(0)
+
+    def in_thread() -> None:
+        with span("in_thread"):
+            pass
+
+    async def main() -> None:
+        with span("request"):
+            await asyncio.gather(task("a"), task("b"))
+            # The context is copied to the worker thread
+            await asyncio.to_thread(in_thread)
+
+    asyncio.run(main())
+
+    request = exporter.by_name("request")
+    for name in ("a", "b"):
+        assert exporter.by_name(name).parent_id == request.span_id
+        assert exporter.by_name(f"{name}.child").parent_id == exporter.by_name(name).span_id
+    assert exporter.by_name("in_thread").parent_id == request.span_id
+
+
+def test_start_span_is_not_made_current(exporter):
+    with span("outer") as outer:
+        detached = start_span("stream", model="m")
+        assert current_span() is outer
+    end_span(detached)
+
+    assert detached.parent_id == outer.span_id
+    assert exporter.spans[-1] is detached
+
+
+def test_traced_sync_and_async_functions(exporter):
+    @traced
+    def add(a: int, b: int) -> int:
+        return a + b
+
+    @traced(name="llm.call")
+    async def ask(question: str) -> str:
+        await asyncio.sleep(0)
+        return question.upper()
+
+    @traced
+    def fail() -> None:
+        raise RuntimeError("failed")
+
+    assert add(1, 2) == 3
+    assert asyncio.run(ask("hi")) == "HI"
+    with pytest.raises(RuntimeError):
+        fail()
+
+    assert [s.name for s in exporter.spans] == [
+        "test_traced_sync_and_async_functions.<locals>.add",
+        "llm.call",
+        "test_traced_sync_and_async_functions.<locals>.fail",
+    ]
+    assert exporter.spans[2].error == "RuntimeError: failed"
+    assert add.__name__ == "add"
+
+
+def test_histogram_buckets():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 1.0, 5.0):
+        histogram.observe(value)
+
+    # Bounds are inclusive, the last count is the +Inf bucket
+    assert histogram.counts == [2, 2, 1]
+    assert histogram.count == 5
+    assert histogram.sum == pytest.approx(6.65)
+
+
+def test_prometheus_text_format():
+    metrics = MetricsRegistry()
+    metrics.observe("latency", 0.002, span="a")
+    metrics.observe("latency", 100, span="a")
+    metrics.observe("latency", 0.2, span="b")
+    metrics.increment("tokens", 3, model="gpt", kind="prompt")
+    metrics.increment("tokens", 2, model="gpt", kind="prompt")
+
+    lines = metrics.to_prometheus().splitlines()
+
+    assert lines.count("# TYPE latency histogram") == 1
+    assert 'latency_bucket{span="a",le="0.001"} 0' in lines
+    assert 'latency_bucket{span="a",le="0.005"} 1' in lines
+    assert 'latency_bucket{span="a",le="60.0"} 1' in lines
+    assert 'latency_bucket{span="a",le="+Inf"} 2' in lines
+    assert 'latency_sum{span="a"} 100.002' in lines
+    assert 'latency_count{span="a"} 2' in lines
+    assert 'latency_bucket{span="b",le="0.25"} 1' in lines
+    assert "# TYPE tokens counter" in lines
+    # Labels are sorted by name
+    assert 'tokens{kind="prompt",model="gpt"} 5' in lines
+    assert lines.index("# TYPE tokens counter") > lines.index('latency_count{span="b"} 1')
+
+
+def test_otlp_payload(exporter):
+    with span("parent") as parent:
+        with pytest.raises(KeyError):
+            with span("child", rows=3, ratio=0.5, cached=True, model="gpt"):
+                raise KeyError("x")
+    otlp = OtlpSpanExporter(endpoint="http://localhost:1/v1/traces", service_name="test")
+    try:
+        payload = otlp.payload([exporter.by_name("child"), parent])
+    finally:
+        otlp.shutdown()
+
+    resource_spans = payload["resourceSpans"][0]
+    assert resource_spans["resource"]["attributes"] == [{"key": "service.name", "value": {"stringValue": "test"}}]
+    child, root = resource_spans["scopeSpans"][0]["spans"]
+    assert child["traceId"] == root["traceId"] == parent.trace_id
+    assert child["parentSpanId"] == parent.span_id
+    assert "parentSpanId" not in root
+    assert child["startTimeUnixNano"].isdigit() and child["endTimeUnixNano"].isdigit()
+    assert child["attributes"] == [
+        {"key": "rows", "value": {"intValue": "3"}},
+        {"key": "ratio", "value": {"doubleValue": 0.5}},
+        {"key": "cached", "value": {"boolValue": True}},
+        {"key": "model", "value": {"stringValue": "gpt"}},
+    ]
+    assert child["status"] == {"code": 2, "message": "KeyError: 'x'"}
+    assert root["status"] == {"code": 0}
+
+
+def test_tracing_is_disabled_without_exporters(monkeypatch):
+    monkeypatch.delenv(tracing.TRACING_ENV, raising=False)
+    monkeypatch.setattr(tracing, "_configured", False)
+
+    tracer = configure_tracing()
+
+    assert not tracer.enabled
+    with span("ignored", rows=1) as noop:
+        assert noop is NOOP_SPAN
+        noop.set_attribute("rows", 2)
+    assert not noop.is_recording
+    assert current_span() is NOOP_SPAN
+    assert start_span("ignored") is NOOP_SPAN
+    end_span(start_span("ignored"))
+    assert traced(lambda: 42)() == 42
+    assert tracer.metrics.get_histogram(SPAN_DURATION_METRIC, span="ignored") is None
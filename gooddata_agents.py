@@ -4,10 +4,9 @@ import os
 import streamlit as st
 from dotenv import load_dotenv
 from openai import OpenAI
-from openapi_parser import parse
-from openapi_parser.specification import Specification
 
-from gooddata.agents.libs.utils import timeit
+from gooddata.agents.libs.api_spec import CompiledApiSpec, load_api_spec
+from gooddata.agents.libs.tracing import configure_tracing, traced
 from gooddata.agents.sdk_wrapper import GoodDataSdkWrapper
 from gooddata.tools import get_name_for_id
 from streamlit_apps.any_to_star import GoodDataAnyToStarApp
@@ -30,6 +29,8 @@ class GoodDataAgentsDemo:
     def __init__(self) -> None:
         self.args = self.parse_arguments()
         load_dotenv()
+        # Exporters are picked by GOODDATA_TRACING, tracing is disabled by default
+        configure_tracing()
         OpenAI.api_key = os.getenv("OPENAI_API_KEY")
         print(f"Profile={self.args.profile}")
         self.gd_sdk = GoodDataSdkWrapper(profile=self.args.profile)
@@ -101,7 +102,7 @@ class GoodDataAgentsDemo:
             label="OpenAI model:", options=models, key="openai_model", index=models.index(default_model)
         )
 
-    @timeit
+    @traced
     def main(self):
         # If OPENAI credentials are not set as env variables,
         # render corresponding input fields so users can set them manually
@@ -142,9 +143,9 @@ def get_supported_models() -> list[str]:
     return sorted([m.id for m in client.models.list().data])
 
 
-@st.cache_data
-def get_api_spec() -> Specification:
-    return parse("gooddata/open-api-spec.json", strict_enum=False)
+@st.cache_resource
+def get_api_spec() -> CompiledApiSpec:
+    return load_api_spec()
 
 
 if __name__ == "__main__":
@@ -10,8 +10,11 @@ import openai
 import streamlit as st
 from langchain_core.documents import Document
 
-from gooddata.agents.libs.rag_langchain import PRODUCT_NAME, GoodDataRAGSimple, VectorDB, timeit
-from gooddata.agents.libs.utils import debug_to_file, replace_in_string
+from gooddata.agents.libs.catalog import OBJECT_TYPES
+from gooddata.agents.libs.rag_langchain import PRODUCT_NAME, GoodDataRAGSimple, RetrievalMode, VectorDB
+from gooddata.agents.libs.tracing import traced
+from gooddata.agents.libs.utils import debug_to_file, iterate_sync, replace_in_string
+from gooddata.agents.libs.vector_stores.search_filter import SearchFilter
 from gooddata.agents.sdk_wrapper import GoodDataSdkWrapper
 from gooddata.tools import get_org_id_from_host
 from streamlit_apps.gooddata.catalog import GoodDataCatalog, get_gooddata_full_catalog
@@ -113,6 +116,9 @@ class GoodDataRAGApp:
             openai_organization=st.session_state.openai_organization,
             max_search_results=max_search_results,
             vector_db=VectorDB[st.session_state.vector_db],
+            shared_store=st.session_state.get("rag_shared_store", False),
+            retrieval_mode=RetrievalMode[st.session_state.get("rag_retrieval_mode", RetrievalMode.VECTOR.name)],
+            debug=True,
         )
 
     @staticmethod
@@ -166,6 +172,34 @@ class GoodDataRAGApp:
             key="vector_db",
         )
 
+    @staticmethod
+    def render_retrieval_mode_dropdown():
+        st.selectbox(
+            label="Retrieval:",
+            options=[mode.name for mode in RetrievalMode],
+            key="rag_retrieval_mode",
+        )
+
+    @staticmethod
+    def render_shared_store_checkbox():
+        st.checkbox(
+            label="Org-level shared vector store",
+            value=False,
+            key="rag_shared_store",
+        )
+
+    @staticmethod
+    def render_object_type_filter():
+        st.multiselect(
+            label="Object types (all if empty):",
+            options=OBJECT_TYPES,
+            key="rag_object_types",
+        )
+
+    @staticmethod
+    def get_search_filter() -> SearchFilter:
+        return SearchFilter(object_types=st.session_state.get("rag_object_types", []))
+
     @staticmethod
     def extract_json(text: str):
         # Regular expression pattern to find text enclosed in {}
@@ -239,11 +273,12 @@ class GoodDataRAGApp:
             # Fallback if response is not a valid JSON
             st.warning(f"Result is not a valid JSON:\n{result.raw_response}")
 
-    @timeit
+    @traced
     def render(self) -> None:
         try:
             self.init_session_state()
             catalog = get_gooddata_full_catalog(self.gd_sdk, self.workspace_id, DOCUMENT_DEBUG_PATH)
+            self.render_retrieval_mode_dropdown()
             columns = st.columns(4)
             with columns[0]:
                 self.render_use_case_dropdown()
@@ -251,9 +286,11 @@ class GoodDataRAGApp:
                 result_count = st.number_input("Max search results", min_value=1, max_value=100, value=10)
             with columns[2]:
                 self.render_vector_db_dropdown()
+                self.render_shared_store_checkbox()
                 agent = self._get_agent(result_count)
             with columns[3]:
                 self.render_reset_db_button(agent)
+            self.render_object_type_filter()
             self.render_header(catalog)
 
             if input := st.text_input("Search: ", type="default"):
@@ -281,10 +318,10 @@ class GoodDataRAGApp:
                     vector_store, vector_duration = self.init_vector_store(agent, catalog.documents)
                     if st.session_state.rag_use_case == RAGUseCase.VECTOR_SEARCH.value:
                         start_answer = time()
-                        response = agent.similarity_search(vector_store, input)
+                        response = agent.similarity_search(vector_store, input, self.get_search_filter())
                         # Vector stores in LangChain do not provide distance or score in an uniform way
-                        contains_distance = response[0].metadata.get(DISTANCE_KEY, None) is not None  # LanceDB
-                        contains_score = response[0].metadata.get(SCORE_KEY, None) is not None  # DuckDB
+                        contains_distance = bool(response) and DISTANCE_KEY in response[0].metadata  # LanceDB
+                        contains_score = bool(response) and SCORE_KEY in response[0].metadata  # DuckDB, NumPy
                         result = Result(
                             use_case=RAGUseCase.VECTOR_SEARCH,
                             raw_response=response,
@@ -297,10 +334,14 @@ class GoodDataRAGApp:
                     elif st.session_state.rag_use_case == RAGUseCase.RAG.value:
                         start_answer = time()
                         question = f"""Find {PRODUCT_NAME} objects in the above context related to "{input}"."""
-                        response = agent.rag_chain_invoke(
-                            rag_retriever=agent.get_rag_retriever(vector_store),
-                            question=question,
-                            answer_prompt=replace_in_string(SEARCH_TEMPLATE, {"PRODUCT_NAME": PRODUCT_NAME}),
+                        response = st.write_stream(
+                            iterate_sync(
+                                agent.rag_chain_astream(
+                                    rag_retriever=agent.get_rag_retriever(vector_store, self.get_search_filter()),
+                                    question=question,
+                                    answer_prompt=replace_in_string(SEARCH_TEMPLATE, {"PRODUCT_NAME": PRODUCT_NAME}),
+                                )
+                            )
                         )
                         result = Result(
                             use_case=RAGUseCase.RAG,
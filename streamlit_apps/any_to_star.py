@@ -2,6 +2,8 @@ import streamlit as st
 from gooddata_sdk import CatalogDataSource, GoodDataSdk
 
 from gooddata.agents.any_to_star_agent import AnyToStarResultType, GoodDataAnyToStarAgent
+from gooddata.agents.libs.pdm_cache import PDM_REFRESH_INTERVAL
+from gooddata.agents.libs.utils import iterate_sync
 from gooddata.agents.sdk_wrapper import GoodDataSdkWrapper
 from gooddata.tools import get_name_for_id
 
@@ -38,6 +40,20 @@ class GoodDataAnyToStarApp:
             key="result_type",
         )
 
+    def render_pdm_snapshot(self, data_source_id: str) -> None:
+        """Show the last scan immediately, a stale one is refreshed in the background for the next generation."""
+        scanner = self.gd_sdk.pdm_scanner()
+        snapshot = scanner.get_snapshot(data_source_id)
+        if snapshot is None:
+            st.caption("The data source has not been scanned yet, it is scanned on the first generation.")
+            return
+        if snapshot.age > PDM_REFRESH_INTERVAL:
+            scanner.refresh_in_background(data_source_id)
+        refreshing = " (refreshing in the background)" if scanner.is_refreshing(data_source_id) else ""
+        tables = snapshot.pdm.pdm.tables
+        with st.expander(f"Scanned tables: {len(tables)}, scanned {int(snapshot.age)}s ago{refreshing}"):
+            st.markdown("\n".join(f"- `{'.'.join(t.path)}` ({len(t.columns)} columns)" for t in tables))
+
     def render(self):
         columns = st.columns(2)
         with columns[0]:
@@ -45,14 +61,14 @@ class GoodDataAnyToStarApp:
         with columns[1]:
             self.render_result_type_picker()
 
-        st.info("This agent can be quite slow, please be patient.")
+        self.render_pdm_snapshot(st.session_state.data_source_id)
+        st.info("This agent can be quite slow, the result is displayed as it is generated.")
 
         if st.button("Generate", type="primary"):
             try:
                 data_source_id = st.session_state.data_source_id
                 result_type = AnyToStarResultType[st.session_state.result_type]
-                result = self.agent.process(data_source_id, result_type)
-                st.write(result)
+                st.write_stream(iterate_sync(self.agent.astream(data_source_id, result_type)))
             except Exception as e:
                 st.error(str(e))
 
@@ -1,8 +1,7 @@
 import streamlit as st
-from openapi_parser import parse
-from openapi_parser.specification import Specification
 
 from gooddata.agents.api_agent import ApiAgent
+from gooddata.agents.libs.api_spec import CompiledApiSpec, load_api_spec
 
 
 class GoodDataApiExecutorApp:
@@ -14,14 +13,23 @@ class GoodDataApiExecutorApp:
             workspace_id=st.session_state.workspace_id,
         )
 
+    @staticmethod
+    def render_routed_checkbox():
+        st.checkbox(
+            label="Offer only the most relevant APIs to the model",
+            value=True,
+            key="api_routed",
+        )
+
     def render(self):
+        self.render_routed_checkbox()
         query = st.text_area("Enter question:")
         if st.button("Submit Query", type="primary"):
             if query:
-                answer = self.agent.process(query, get_api_spec())
+                answer = self.agent.process(query, get_api_spec(), routed=st.session_state.api_routed)
                 st.dataframe(answer)
 
 
-@st.cache_data
-def get_api_spec() -> Specification:
-    return parse("gooddata/open-api-spec.json", strict_enum=False)
+@st.cache_resource
+def get_api_spec() -> CompiledApiSpec:
+    return load_api_spec()
@@ -1,14 +1,16 @@
 import asyncio
-from time import sleep
 
 import streamlit as st
 from gooddata_api_client.model.chat_history_result import ChatHistoryResult
 from gooddata_sdk import Attribute, ExecutionDefinition, ObjId, SimpleMetric, TableDimension
 from streamlit_chat import message
 
+from gooddata.agents.libs.chat_poller import ChatHistoryTracker, ChatInteractionDriver
 from gooddata.agents.sdk_wrapper import GoodDataSdkWrapper
 
 CHAT_HISTORY = "chat_history"
+# Larger results are truncated, rendering is the bottleneck, not reading
+MAX_RENDERED_ROWS = 10_000
 LAST_INTERACTION_ID = "last_interaction_id"
 
 
@@ -24,7 +26,7 @@ class GoodDataAiChatApp:
         if LAST_INTERACTION_ID not in st.session_state:
             st.session_state[LAST_INTERACTION_ID] = 0
 
-    async def ask_question(self, question: str):
+    def ask_question(self, question: str):
         return self.gd_sdk.sdk.compute.ai_chat(workspace_id=self.workspace_id, question=question)
 
     def get_chat_history(self, last_interaction_id: int = 0) -> ChatHistoryResult:
@@ -32,51 +34,46 @@ class GoodDataAiChatApp:
             workspace_id=self.workspace_id, chat_history_interaction_id=last_interaction_id
         )
 
-    @property
-    def interaction_finished(self) -> bool:
-        return st.session_state[CHAT_HISTORY] and st.session_state[CHAT_HISTORY][-1]["interactionFinished"]
-
-    @property
-    def last_interaction_id(self) -> bool:
-        return st.session_state[LAST_INTERACTION_ID]
-
-    def cache_chat_history(self) -> bool:
-        last_interaction_id = st.session_state[LAST_INTERACTION_ID]
-        chat_history = self.get_chat_history(last_interaction_id)
-        last_changed = True
-        for interaction in chat_history["interactions"]:
-            if self.interaction_finished:
-                st.session_state[CHAT_HISTORY].append(interaction)
-                st.session_state[LAST_INTERACTION_ID] = int(interaction["chatHistoryInteractionId"])
-            else:
-                if self.interaction_finished:
-                    st.session_state[CHAT_HISTORY].append(interaction)
-                else:
-                    # Replace last (unfinished) interaction with the new one
-                    if st.session_state[CHAT_HISTORY]:
-                        if st.session_state[CHAT_HISTORY][-1] == interaction:
-                            last_changed = False
-                        st.session_state[CHAT_HISTORY][-1] = interaction
-                    else:
-                        st.session_state[CHAT_HISTORY].append(interaction)
-        return last_changed
-
-    def poll_chat_history(self):
-        finished = False
-        while not finished:
-            if self.cache_chat_history():
-                self.render_chat_history()
-            finished = self.interaction_finished
-            sleep(1)
+    def get_tracker(self) -> ChatHistoryTracker:
+        return ChatHistoryTracker(st.session_state[CHAT_HISTORY], st.session_state[LAST_INTERACTION_ID])
+
+    def cache_chat_history(self) -> list[dict]:
+        tracker = self.get_tracker()
+        changed = tracker.apply(self.get_chat_history(tracker.last_interaction_id)["interactions"])
+        st.session_state[LAST_INTERACTION_ID] = tracker.last_interaction_id
+        return changed
+
+    async def apoll_question(self, question: str) -> None:
+        """Submit the question and render interactions created by it whenever they change."""
+        tracker = self.get_tracker()
+        driver = ChatInteractionDriver(self.ask_question, self.get_chat_history, tracker)
+        # New interactions are rendered above the existing history, which is rendered only once
+        live_placeholder = st.empty()
+        self.render_chat_history()
+        live_ids: list[str] = []
+        revision = 0
+        async for changed in driver.arun(question):
+            st.session_state[LAST_INTERACTION_ID] = tracker.last_interaction_id
+            for interaction in changed:
+                if interaction["chatHistoryInteractionId"] not in live_ids:
+                    live_ids.append(interaction["chatHistoryInteractionId"])
+            revision += 1
+            with live_placeholder.container():
+                live = [i for i in tracker.interactions if i["chatHistoryInteractionId"] in live_ids]
+                for i, interaction in enumerate(reversed(live)):
+                    self.render_interaction(f"live_{revision}_{i}", interaction)
+        st.session_state[LAST_INTERACTION_ID] = tracker.last_interaction_id
 
     @staticmethod
-    def render_text_response(index: int, interaction: dict, text_response: str, use_case: str) -> None:
+    def render_text_response(index: str, interaction: dict, text_response: str, use_case: str) -> None:
         chat_history_interaction_id = interaction["chatHistoryInteractionId"]
         message(text_response, key=f"{chat_history_interaction_id}_ai_{index}_{use_case}")
 
     def render_visualization(self, created_visualizations_response: dict) -> None:
         metrics = []
+        column_names = {}
         for metric in created_visualizations_response.get("metrics", []):
+            column_names[metric["id"]] = metric.get("title", metric["id"])
             if metric["type"] == "metric":
                 metrics.append(SimpleMetric(local_id=metric["id"], item=ObjId(id=metric["id"], type=metric["type"])))
             else:
@@ -93,6 +90,7 @@ class GoodDataAiChatApp:
         for ai_dimension in created_visualizations_response.get("dimensionality", []):
             dimension_ids.append(ai_dimension["id"])
             dimension_titles.append(ai_dimension["title"])
+            column_names[ai_dimension["id"]] = ai_dimension["title"]
             attributes.append(Attribute(local_id=ai_dimension["id"], label=ai_dimension["id"]))
         # TODO - pivoting
         dimensions = [TableDimension(item_ids=dimension_ids), TableDimension(item_ids=["measureGroup"])]
@@ -102,49 +100,58 @@ class GoodDataAiChatApp:
             filters=[],
             dimensions=dimensions,
         )
-        print(f"exec_def: {exec_def.as_api_model()}")
-        frames = self.gd_sdk.pandas.data_frames(self.workspace_id)
-        df, df_metadata = frames.for_exec_def(exec_def)
-        df_from_result_id, df_metadata_from_result_id = frames.for_exec_result_id(
-            result_id=df_metadata.execution_response.result_id,
-        )
-        df_from_result_id.columns = df_from_result_id.columns.map("".join)
+        reader = self.gd_sdk.execution_reader(self.workspace_id, exec_def, column_names=column_names)
         visualization_type = created_visualizations_response.get("visualizationType")
-        if visualization_type == "BAR":
-            df_from_result_id.reset_index(inplace=True)
-            df_from_result_id.set_index(dimension_titles[0], inplace=True)
-            st.bar_chart(df_from_result_id)
-        elif visualization_type == "LINE":
-            df_from_result_id.reset_index(inplace=True)
-            df_from_result_id.set_index(dimension_titles[0], inplace=True)
-            st.line_chart(df_from_result_id)
+        if visualization_type in ("BAR", "LINE"):
+            df = reader.read_all(MAX_RENDERED_ROWS).to_pandas()
+            df.set_index(dimension_titles[0], inplace=True)
+            if visualization_type == "BAR":
+                st.bar_chart(df)
+            else:
+                st.line_chart(df)
+            if reader.truncated:
+                st.info(f"Only the first {len(df)} of {reader.total_rows} rows are displayed.")
         else:
-            st.dataframe(df_from_result_id)
+            # Render the first page while the next ones are still being read
+            table = None
+            rows = 0
+            for batch in reader:
+                page = batch.to_pandas()
+                page.index += rows
+                if table is None:
+                    table = st.dataframe(page)
+                else:
+                    # Only the new page is sent to the browser
+                    table.add_rows(page)
+                rows += batch.num_rows
+                if rows >= MAX_RENDERED_ROWS and rows < reader.total_rows:
+                    st.info(f"Only the first {rows} of {reader.total_rows} rows are displayed.")
+                    break
+
+    def render_interaction(self, index: str, interaction: dict) -> None:
+        text_response = interaction.get("textResponse")
+        route_response = interaction.get("routing")
+        found_objects_response = interaction.get("foundObjects")
+        created_visualizations_response = interaction.get("createdVisualizations")
+        # Render all steps of the reasoning
+        if created_visualizations_response:
+            print(f"created_visualizations_response: {created_visualizations_response}")
+            self.render_text_response(index, interaction, created_visualizations_response["reasoning"], "visualization")
+            if "objects" in created_visualizations_response:
+                # TODO - display more than one visualization
+                self.render_visualization(created_visualizations_response["objects"][0])
+        if found_objects_response:
+            self.render_text_response(index, interaction, found_objects_response["reasoning"], "found objects")
+        if text_response:
+            self.render_text_response(index, interaction, text_response, "text response")
+        if route_response:
+            self.render_text_response(index, interaction, route_response["reasoning"], "routing")
+        chat_history_interaction_id = interaction["chatHistoryInteractionId"]
+        message(interaction["question"], is_user=True, key=f"{chat_history_interaction_id}_user_{index}")
 
     def render_chat_history(self):
-        if st.session_state[CHAT_HISTORY]:
-            for i, interaction in enumerate(reversed(st.session_state[CHAT_HISTORY])):
-                text_response = interaction.get("textResponse")
-                route_response = interaction.get("routing")
-                found_objects_response = interaction.get("foundObjects")
-                created_visualizations_response = interaction.get("createdVisualizations")
-                # Render all steps of the reasoning
-                if created_visualizations_response:
-                    print(f"created_visualizations_response: {created_visualizations_response}")
-                    self.render_text_response(
-                        i, interaction, created_visualizations_response["reasoning"], "visualization"
-                    )
-                    if "objects" in created_visualizations_response:
-                        # TODO - display more than one visualization
-                        self.render_visualization(created_visualizations_response["objects"][0])
-                if found_objects_response:
-                    self.render_text_response(i, interaction, found_objects_response["reasoning"], "found objects")
-                if text_response:
-                    self.render_text_response(i, interaction, text_response, "text response")
-                if route_response:
-                    self.render_text_response(i, interaction, route_response["reasoning"], "routing")
-                chat_history_interaction_id = interaction["chatHistoryInteractionId"]
-                message(interaction["question"], is_user=True, key=f"{chat_history_interaction_id}_user_{i}")
+        for i, interaction in enumerate(reversed(st.session_state[CHAT_HISTORY])):
+            self.render_interaction(str(i), interaction)
 
     def render(self) -> None:
         self.init_chat_history()
@@ -156,10 +163,10 @@ class GoodDataAiChatApp:
         with columns[1]:
             if st.button("Clear chat history", type="primary"):
                 st.session_state[CHAT_HISTORY] = []
+                st.session_state[LAST_INTERACTION_ID] = 0
                 self.gd_sdk.sdk.compute.ai_chat_history_reset(self.workspace_id)
 
         if submit:
-            asyncio.run(self.ask_question(user_input))
-            self.poll_chat_history()
+            asyncio.run(self.apoll_question(user_input))
         else:
             self.render_chat_history()
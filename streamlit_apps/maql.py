@@ -1,9 +1,14 @@
+from typing import Optional
+
 import openai
 import streamlit as st
 from streamlit_chat import message
 
+from gooddata.agents.libs.catalog_scope import CatalogRetriever
+from gooddata.agents.libs.utils import iterate_sync
 from gooddata.agents.maql_agent import MaqlAgent
 from gooddata.agents.sdk_wrapper import GoodDataSdkWrapper
+from gooddata.tools import get_org_id_from_host
 
 
 class GoodDataMaqlApp:
@@ -11,12 +16,33 @@ class GoodDataMaqlApp:
         self.gd_sdk = gd_sdk
         self.workspace_id = st.session_state.workspace_id
         self.agent = MaqlAgent(
+            gd_sdk=gd_sdk,
+            catalog_retriever=self.get_catalog_retriever(),
             openai_model=st.session_state.openai_model,
             openai_api_key=st.session_state.openai_api_key,
             openai_organization=st.session_state.openai_organization,
             workspace_id=st.session_state.workspace_id,
         )
 
+    def get_catalog_retriever(self) -> Optional[CatalogRetriever]:
+        if not st.session_state.get("maql_scoped_prompt", False):
+            return None
+        return CatalogRetriever(
+            gd_sdk=self.gd_sdk,
+            org_id=self.gd_sdk.profile or get_org_id_from_host(self.gd_sdk.host),
+            workspace_id=self.workspace_id,
+            openai_api_key=st.session_state.openai_api_key,
+            openai_organization=st.session_state.openai_organization,
+        )
+
+    @staticmethod
+    def render_scoped_prompt_checkbox():
+        st.checkbox(
+            label="Only relevant facts, attributes and metrics in the prompt",
+            value=False,
+            key="maql_scoped_prompt",
+        )
+
     def show_model_entities(self) -> None:
         catalog = self.gd_sdk.sdk.catalog_workspace_content.get_full_catalog(self.workspace_id)
         columns = st.columns(3)
@@ -51,12 +77,14 @@ class GoodDataMaqlApp:
             st.session_state["past"] = []
 
         try:
+            self.render_scoped_prompt_checkbox()
             user_input = st.text_area("Ask for GoodData MAQL metric:")
 
             columns = st.columns(2)
             with columns[0]:
                 if st.button("Submit Query", type="primary"):
-                    output = self.agent.process(user_input)
+                    # Tokens are rendered as they arrive, the whole answer is returned at the end
+                    output = st.write_stream(iterate_sync(self.agent.astream(user_input)))
                     st.session_state.past.append(user_input)
                     st.session_state.generated.append(output)
             with columns[1]:
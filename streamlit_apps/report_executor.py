@@ -1,9 +1,13 @@
+from typing import Optional
+
 import pandas as pd
 import streamlit as st
 
+from gooddata.agents.libs.catalog_scope import CatalogRetriever
 from gooddata.agents.libs.gd_openai import AIMethod
 from gooddata.agents.report_agent import ReportAgent
 from gooddata.agents.sdk_wrapper import GoodDataSdkWrapper
+from gooddata.tools import get_org_id_from_host
 from streamlit_apps.constants import ChartType
 
 
@@ -12,12 +16,33 @@ class GoodDataReportExecutorApp:
         self.gd_sdk = gd_sdk
         self.workspace_id = st.session_state.workspace_id
         self.agent = ReportAgent(
+            gd_sdk=gd_sdk,
+            catalog_retriever=self.get_catalog_retriever(),
             openai_model=st.session_state.openai_model,
             openai_api_key=st.session_state.openai_api_key,
             openai_organization=st.session_state.openai_organization,
             workspace_id=self.workspace_id,
         )
 
+    def get_catalog_retriever(self) -> Optional[CatalogRetriever]:
+        if not st.session_state.get("report_scoped_prompt", False):
+            return None
+        return CatalogRetriever(
+            gd_sdk=self.gd_sdk,
+            org_id=self.gd_sdk.profile or get_org_id_from_host(self.gd_sdk.host),
+            workspace_id=self.workspace_id,
+            openai_api_key=st.session_state.openai_api_key,
+            openai_organization=st.session_state.openai_organization,
+        )
+
+    @staticmethod
+    def render_scoped_prompt_checkbox():
+        st.checkbox(
+            label="Only relevant metrics and attributes in the prompt",
+            value=False,
+            key="report_scoped_prompt",
+        )
+
     @staticmethod
     def render_openai_model_methods_picker():
         if "openai_method" not in st.session_state:
@@ -59,17 +84,21 @@ class GoodDataReportExecutorApp:
             st.markdown(metrics_string)
 
     def render(self):
-        columns = st.columns(2)
+        columns = st.columns(3)
         with columns[0]:
             self.render_openai_model_methods_picker()
         with columns[1]:
             self.render_chart_type_picker()
+        with columns[2]:
+            self.render_scoped_prompt_checkbox()
         chart_type = ChartType[st.session_state.get("chart_type")]
         query = st.text_area("Enter question:")
         if st.button("Submit Query", type="primary"):
             if query:
                 method = AIMethod[st.session_state.openai_method]
-                df, attributes, metrics = agent_process(self.agent, method, query)
+                df, attributes, metrics = agent_process(
+                    self.agent, method, query, scoped=self.agent.catalog_retriever is not None
+                )
                 if chart_type == ChartType.TABLE:
                     st.dataframe(df)
                 else:
@@ -89,5 +118,8 @@ class GoodDataReportExecutorApp:
 
 
 @st.cache_data
-def agent_process(_agent: ReportAgent, openai_method: AIMethod, query: str) -> tuple[pd.DataFrame, list, list]:
+def agent_process(
+    _agent: ReportAgent, openai_method: AIMethod, query: str, scoped: bool
+) -> tuple[pd.DataFrame, list, list]:
+    # scoped is a part of the cache key only, the agent is excluded from it
     return _agent.process(openai_method, query)